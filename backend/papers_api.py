@@ -0,0 +1,171 @@
+"""
+Request parsing and response shaping shared by server.py and server_asgi.py.
+
+Everything here is independent of the web framework and the database
+driver, so both servers answer the paper routes with the same logic; they
+only differ in how they run queries and upstream requests.
+"""
+
+import json
+
+# Viewer units per embedding unit (annoying arbitrary scale factor)
+VIEWER_SCALE = 100
+
+# Largest number of MAG IDs accepted by /papers (the S2 batch API takes up to 500)
+PAPERS_BATCH_LIMIT = 300
+
+S2_PAPER_URL = 'https://api.semanticscholar.org/v1/paper/MAG:{}'
+S2_BATCH_URL = 'https://api.semanticscholar.org/graph/v1/paper/batch'
+S2_BATCH_FIELDS = 'abstract,authors,s2FieldsOfStudy'
+
+# MAG IDs are stored as bigint
+MAX_MAG_ID = 2**63 - 1
+
+class BadRequest(ValueError):
+    """Invalid request input, answered with status 400 and {'error': message}"""
+
+def located_papers(ids, coords, info):
+    """
+    Viewer-scale positions and info_json of spatial index hits, in the order given
+
+    Args:
+        ids: MAG IDs returned by the spatial index
+        coords: Their embedding coordinates
+        info: Dictionary mapping MAG ID to its info_json; papers without one are left out
+    """
+    return [
+        {'x': c[0]*VIEWER_SCALE, 'y': c[1]*VIEWER_SCALE, 'z': c[2]*VIEWER_SCALE, 'js': json.loads(info[i])}
+        for i, c in zip(ids.tolist(), coords.tolist())
+        if i in info
+    ]
+
+def s2info_extract(doc):
+    out_doc = {}
+    out_doc['abstract'] = doc.get('abstract', 'No abstract available')
+    out_doc['authors'] = [x['name'] for x in doc.get('authors', [])]
+    out_doc['fields'] = [x['category'] for x in doc.get('s2FieldsOfStudy', [])]
+    out_doc['fields'] = list(set(out_doc['fields']))
+    return out_doc
+
+def parse_json_body(data):
+    """Decoded JSON request body; BadRequest if it isn't valid JSON"""
+    try:
+        return json.loads(data)
+    except ValueError:
+        raise BadRequest('invalid JSON body')
+
+def _mag_id(x):
+    # Integers, or their decimal strings as in ?ids=1,2,3; not floats or booleans
+    if isinstance(x, bool) or not isinstance(x, (int, str)):
+        raise BadRequest(f'invalid id {x!r}')
+    try:
+        mag_id = int(x)
+    except ValueError:
+        raise BadRequest(f'invalid id {x!r}')
+    if not 0 <= mag_id <= MAX_MAG_ID:
+        raise BadRequest(f'invalid id {x!r}')
+    return mag_id
+
+def query_limit(value, default, maximum):
+    """
+    Number of results asked for by a query parameter such as ?limit= or ?k=
+
+    Args:
+        value: Parameter value, or None when the request has none
+        default: Count used when value is None
+        maximum: Largest count served; larger requests are clamped to it
+
+    Returns:
+        int between 1 and maximum
+
+    Raises:
+        BadRequest: If value isn't a positive integer
+    """
+    if value is None:
+        return min(default, maximum)
+    try:
+        limit = int(value)
+    except ValueError:
+        raise BadRequest(f'invalid limit {value!r}')
+    if limit <= 0:
+        raise BadRequest(f'limit must be positive, got {limit}')
+    return min(limit, maximum)
+
+def batch_ids(body=None, query=''):
+    """
+    MAG IDs of a /papers request: ?ids=1,2,3 or a JSON body {"ids": [...]}
+
+    Args:
+        body: Parsed JSON body, or None when the request has none
+        query: Value of the ids query parameter
+
+    Returns:
+        Deduplicated list of int IDs, in request order
+
+    Raises:
+        BadRequest: If the body isn't an object with a list of ids, an id
+            isn't an integer, or there are more than PAPERS_BATCH_LIMIT ids
+    """
+    if body is not None:
+        if not isinstance(body, dict):
+            raise BadRequest('JSON body must be an object like {"ids": [...]}')
+        ids = body.get('ids', [])
+        if not isinstance(ids, list):
+            raise BadRequest('ids must be a list')
+    else:
+        ids = [x for x in query.split(',') if x]
+
+    ids = list(dict.fromkeys(_mag_id(x) for x in ids))
+    if len(ids) > PAPERS_BATCH_LIMIT:
+        raise BadRequest(f'at most {PAPERS_BATCH_LIMIT} ids')
+    return ids
+
+def s2_batch_request(mag_ids):
+    """Keyword arguments of the S2 batch POST for these papers (url, params, json)"""
+    return {
+        'url': S2_BATCH_URL,
+        'params': {'fields': S2_BATCH_FIELDS},
+        'json': {'ids': [f'MAG:{i}' for i in mag_ids]},
+    }
+
+def s2info_from_batch(mag_ids, docs):
+    """S2 info by MAG ID from a batch response; papers S2 doesn't know are left out"""
+    return {
+        # The batch API returns null for unknown papers and for missing values
+        i: s2info_extract({k: v for k, v in doc.items() if v is not None})
+        for i, doc in zip(mag_ids, docs)
+        if doc
+    }
+
+def missing_s2(ids, rows):
+    """IDs found in the database whose S2 info was never fetched"""
+    return [i for i in ids if i in rows and not rows[i][1]]
+
+def papers_response(ids, rows, fetched):
+    """
+    Body of a /papers response
+
+    Args:
+        ids: Requested MAG IDs
+        rows: Dictionary mapping MAG ID to its (info_json, s2info_json) row
+        fetched: S2 info fetched for this request, by MAG ID
+
+    Returns:
+        Compact JSON string with 'papers' (by MAG ID, with S2 info merged in)
+        and 'missing' (IDs not in the database)
+    """
+    out = {}
+    for i in ids:
+        if i not in rows:
+            continue
+        info_json, s2info_json = rows[i]
+        paper_info = json.loads(info_json)
+        s2_info = json.loads(s2info_json) if s2info_json else fetched.get(i)
+        if s2_info:
+            paper_info.update(s2_info)
+        out[str(i)] = paper_info
+
+    return json.dumps({
+        'papers': out,
+        'missing': [i for i in ids if i not in rows],
+    }, separators=(',', ':'))
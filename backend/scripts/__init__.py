@@ -2,7 +2,9 @@
 
 from . import common
 from . import pointclouds
+from . import potree
 from . import mesh
+from . import spatial_index
 from . import fields
 from . import project_vectors
 from . import MAG
@@ -11,7 +13,9 @@ from . import params
 __all__ = [
     'common',
     'pointclouds',
+    'potree',
     'mesh',
+    'spatial_index',
     'fields',
     'project_vectors',
     'MAG',
@@ -12,6 +12,8 @@ def expose_field_data():
     subgs = fields.GetSubFields()
     colors, orders = pointclouds.ProduceFieldPointClouds()
     field_centers = mesh.GetFieldCenters()
+    mesh_lods = mesh.WriteMeshLODs()
+    mesh_bounds = {name: summary['bounds'] for name, summary in mesh.LoadMeshSummaries().items()}
     
     # Generate intersection mappings
     intersection_data = pointclouds.GenerateFieldIntersectionMapping()
@@ -30,13 +32,15 @@ def expose_field_data():
 
     # Create the data structure
     field_data = {
-        "fields": mesh.WriteFieldMeshes(), # just the fields for which we have a mesh
+        "fields": mesh.LoadMeshedFields(), # just the fields for which we have a mesh
         "subfield_colors": subfield_colors,  # We'll need to implement color generation
         "subfields": subgs,
         "top_level": top_level,
         "field_colors": colors,
         "field_orders": field_orders,
         "field_centers": field_centers,  # Add the field centers to the output
+        "mesh_lods": mesh_lods,  # GLB levels of detail per mesh, finest first
+        "mesh_bounds": mesh_bounds,  # Axis-aligned bounds of each mesh, from the mesh summaries
     }
 
     # Create static directory if it doesn't exist
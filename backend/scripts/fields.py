@@ -5,6 +5,10 @@ __all__ = [
     'GetFieldNames',
     'GetTopLevel',
     'GetSubFields',
+    'GetFieldHierarchy',
+    'FieldHierarchy',
+    'GetFieldMembership',
+    'FieldMembership',
     'PointIterator',
     'FieldNameToPoints',
     'PaperToFields',
@@ -135,32 +139,411 @@ def FieldToPapers(LIMIT=None):
 
     return field_to_papers
 
-def GetTopLevel():
-    subgs = GetSubFields()
-    return [x for x in subgs if not any(x in subgs[y] for y in subgs if y!=x)]
+class FieldHierarchy:
+    """
+    Indexed parent/child structure over the fields of study.
+
+    Parent fields are numbered in the order they first appear in
+    ``FieldOfStudyChildren.csv``, followed by the fields that only appear as
+    children, also in file order. Every relation is stored as a pair of
+    CSR-style arrays (``*_ptr`` offsets into ``*_idx``), so child, parent,
+    ancestor and descendant lookups are array slices rather than scans over
+    every other field.
+
+    Attributes:
+        field_ids: List of field IDs, indexed by field index
+        index: Dictionary mapping field ID to field index
+        child_ptr, child_idx: Direct children of each field
+        parent_ptr, parent_idx: Direct parents of each field
+        ancestor_ptr, ancestor_idx: Transitive closure of parent_idx
+        descendant_ptr, descendant_idx: Transitive closure of child_idx
+        levels: Depth below the top level (0 for top-level fields, -1 if unreachable)
+        paper_counts: Number of embedded papers assigned directly to each field
+        top_level: List of top-level field IDs
+    """
+
+    def __init__(self, edges, paper_counts):
+        """
+        Build the hierarchy from (parent, child) pairs.
+
+        Args:
+            edges: Iterable of (parent_id, child_id) tuples, in file order
+            paper_counts: Dictionary mapping field ID to its number of papers
+        """
+        self.field_ids = []
+        self.index = {}
+
+        def _field_index(field_id):
+            if field_id not in self.index:
+                self.index[field_id] = len(self.field_ids)
+                self.field_ids.append(field_id)
+            return self.index[field_id]
+
+        # Drop duplicates and self-loops, keeping file order
+        edges = list(dict.fromkeys(edges))
+        for p, c in edges:
+            _field_index(p)
+        edges = [(p, c) for p, c in edges if p != c]
+        src = np.array([_field_index(p) for p, c in edges], dtype=np.int32)
+        dst = np.array([_field_index(c) for p, c in edges], dtype=np.int32)
+        n = len(self.field_ids)
+
+        self.child_ptr, self.child_idx = self._csr(n, src, dst)
+        self.parent_ptr, self.parent_idx = self._csr(n, dst, src)
+
+        # Ancestor closure: walk up the parents of every field (safe on cycles)
+        anc_src, anc_dst = [], []
+        for i in range(n):
+            seen = set()
+            stack = list(self.parent_idx[self.parent_ptr[i]:self.parent_ptr[i+1]])
+            while stack:
+                p = stack.pop()
+                if p in seen or p == i:
+                    continue
+                seen.add(p)
+                stack.extend(self.parent_idx[self.parent_ptr[p]:self.parent_ptr[p+1]])
+            anc_src.extend([i] * len(seen))
+            anc_dst.extend(sorted(seen))
+        anc_src = np.array(anc_src, dtype=np.int32)
+        anc_dst = np.array(anc_dst, dtype=np.int32)
+        self.ancestor_ptr, self.ancestor_idx = self._csr(n, anc_src, anc_dst)
+        self.descendant_ptr, self.descendant_idx = self._csr(n, anc_dst, anc_src)
+
+        # Levels: breadth-first from the fields without parents
+        roots = np.flatnonzero(np.diff(self.parent_ptr) == 0)
+        self.levels = np.full(n, -1, dtype=np.int16)
+        self.levels[roots] = 0
+        frontier = roots
+        depth = 0
+        while len(frontier):
+            depth += 1
+            children = np.unique(np.concatenate(
+                [self.child_idx[self.child_ptr[i]:self.child_ptr[i+1]] for i in frontier]
+            ))
+            frontier = children[self.levels[children] < 0]
+            self.levels[frontier] = depth
+
+        self.paper_counts = np.array(
+            [paper_counts.get(fid, 0) for fid in self.field_ids], dtype=np.int64
+        )
+        self.top_level = [self.field_ids[i] for i in roots]
+
+    @staticmethod
+    def _csr(n, src, dst):
+        """Group dst by src into (ptr, idx) arrays, keeping the input order within each group"""
+        order = np.argsort(src, kind='stable')
+        ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=ptr[1:])
+        return ptr, dst[order].astype(np.int32)
+
+    def _slice(self, ptr, idx, field_id):
+        i = self.index.get(field_id)
+        if i is None:
+            return []
+        return [self.field_ids[j] for j in idx[ptr[i]:ptr[i+1]]]
+
+    def __len__(self):
+        return len(self.field_ids)
+
+    def __contains__(self, field_id):
+        return field_id in self.index
+
+    def children(self, field_id):
+        """Direct subfields of a field"""
+        return self._slice(self.child_ptr, self.child_idx, field_id)
+
+    def parents(self, field_id):
+        """Direct parent fields of a field"""
+        return self._slice(self.parent_ptr, self.parent_idx, field_id)
+
+    def ancestors(self, field_id):
+        """All fields above a field in the hierarchy"""
+        return self._slice(self.ancestor_ptr, self.ancestor_idx, field_id)
+
+    def descendants(self, field_id):
+        """All fields below a field in the hierarchy"""
+        return self._slice(self.descendant_ptr, self.descendant_idx, field_id)
+
+    def is_top_level(self, field_id):
+        i = self.index.get(field_id)
+        return i is not None and self.parent_ptr[i] == self.parent_ptr[i+1]
+
+    def level(self, field_id):
+        """Depth below the top level, or -1 if the field is unknown or unreachable"""
+        i = self.index.get(field_id)
+        return -1 if i is None else int(self.levels[i])
+
+    def paper_count(self, field_id):
+        i = self.index.get(field_id)
+        return 0 if i is None else int(self.paper_counts[i])
+
+    def subfields(self):
+        """Parent to children mapping, in the format returned by GetSubFields"""
+        subgs = defaultdict(list)
+        for i in np.flatnonzero(np.diff(self.child_ptr)):
+            subgs[self.field_ids[i]] = self.children(self.field_ids[i])
+        return subgs
 
 @cache
-def GetSubFields(
+def GetFieldHierarchy(
     MIN_PAPERS=1000
 ):
-    
+    """
+    Build the FieldHierarchy once from FieldOfStudyChildren.csv.
+
+    Only child fields with at least MIN_PAPERS embedded papers are kept,
+    matching the historical behaviour of GetSubFields.
+
+    Args:
+        MIN_PAPERS: Minimum number of papers for a child field to be included
+
+    Returns:
+        FieldHierarchy
+    """
     points_per_subfield = FieldNameToPoints()
-    to_focus = set(filter(lambda x:len(points_per_subfield[x])>=MIN_PAPERS,
-        points_per_subfield
-    ))
+    paper_counts = {fid: len(points) for fid, points in points_per_subfield.items()}
+    del points_per_subfield
 
-    subgs = defaultdict(list)
-    top_level = []
-    skipped=0
-    
+    to_focus = {fid for fid, n in paper_counts.items() if n >= MIN_PAPERS}
+
+    edges = []
     fn = DATA_FOLDER / 'MAG' / '13.FieldOfStudyChildren.csv.zip'
     with zipfile.ZipFile(fn) as zp:
         with TextIOWrapper(zp.open('FieldOfStudyChildren.csv'), encoding='utf8') as inf:
             for l in DictReader(inf):
                 if l['entity_id'] not in to_focus:continue
-                subgs[l['hasParent']].append(l['entity_id'])
+                edges.append((l['hasParent'], l['entity_id']))
+
+    hierarchy = FieldHierarchy(edges, paper_counts)
+    print('Number of Top Level Fields:', len(hierarchy.top_level))
+
+    return hierarchy
+
+def GetTopLevel(MIN_PAPERS=1000):
+    return GetFieldHierarchy(MIN_PAPERS=MIN_PAPERS).top_level
+
+def GetSubFields(
+    MIN_PAPERS=1000
+):
+    return GetFieldHierarchy(MIN_PAPERS=MIN_PAPERS).subfields()
+
+
+class FieldMembership:
+    """
+    Sparse paper x field membership, with a per-field roll-up over the hierarchy.
+
+    Rows are papers, stored as a sorted array of MAG IDs so that any other
+    paper-indexed array can be joined with ``np.searchsorted`` (see
+    ``lookup``). Direct assignments from ``PaperFieldsOfStudy`` are kept both
+    by paper and by field. The roll-up adds, for every field, the papers of
+    all of its descendants in the FieldHierarchy, stored as one sorted row
+    index array per field (CSR by ancestor), so unions and intersections of
+    whole subtrees are plain sorted-array operations.
+
+    Attributes:
+        paper_ids: Sorted int64 array of MAG paper IDs
+        field_ids: List of field IDs, indexed by column
+        field_index: Dictionary mapping field ID to column
+        paper_ptr, paper_fields: Direct field columns of each paper
+        field_ptr, field_papers: Direct paper rows of each field
+        rollup_ptr, rollup_papers: Paper rows of each field including descendants
+    """
+
+    def __init__(self, subfield_per_paper, hierarchy):
+        """
+        Args:
+            subfield_per_paper: Dictionary mapping paper ID to its field IDs (PaperToFields)
+            hierarchy: FieldHierarchy used for the roll-up
+        """
+        n_papers = len(subfield_per_paper)
+        self.field_ids = []
+        self.field_index = {}
+
+        def _column(field_id):
+            if field_id not in self.field_index:
+                self.field_index[field_id] = len(self.field_ids)
+                self.field_ids.append(field_id)
+            return self.field_index[field_id]
+
+        ids = np.fromiter((int(p) for p in subfield_per_paper), dtype=np.int64, count=n_papers)
+        counts = np.fromiter((len(fs) for fs in subfield_per_paper.values()), dtype=np.int64, count=n_papers)
+        cols = np.fromiter(
+            (_column(f) for fs in subfield_per_paper.values() for f in fs),
+            dtype=np.int32, count=int(counts.sum())
+        )
+        for field_id in hierarchy.field_ids:
+            _column(field_id)
+        n_fields = len(self.field_ids)
+
+        # Renumber rows so that paper_ids is sorted
+        order = np.argsort(ids, kind='stable')
+        self.paper_ids = ids[order]
+        new_row = np.empty(n_papers, dtype=np.int32)
+        new_row[order] = np.arange(n_papers, dtype=np.int32)
+        rows = np.repeat(new_row, counts)
+        del ids, counts, new_row, order
+
+        # Deduplicate (paper, field) pairs
+        keys = np.unique(rows.astype(np.int64) * n_fields + cols)
+        rows = (keys // n_fields).astype(np.int32)
+        cols = (keys % n_fields).astype(np.int32)
+        del keys
+
+        self.paper_ptr, self.paper_fields = FieldHierarchy._csr(n_papers, rows, cols)
+        self.field_ptr, self.field_papers = FieldHierarchy._csr(n_fields, cols, rows)
+        del rows, cols
+
+        # Roll-up: each field's own papers plus those of all of its descendants
+        rollup_lengths = np.zeros(n_fields, dtype=np.int64)
+        rollup_parts = []
+        for c, field_id in enumerate(self.field_ids):
+            members = [self.field_papers[self.field_ptr[c]:self.field_ptr[c+1]]]
+            for d in hierarchy.descendants(field_id):
+                dc = self.field_index[d]
+                members.append(self.field_papers[self.field_ptr[dc]:self.field_ptr[dc+1]])
+            members = np.unique(np.concatenate(members)) if len(members) > 1 else members[0]
+            rollup_parts.append(members)
+            rollup_lengths[c] = len(members)
+
+        self.rollup_ptr = np.zeros(n_fields + 1, dtype=np.int64)
+        np.cumsum(rollup_lengths, out=self.rollup_ptr[1:])
+        self.rollup_papers = (
+            np.concatenate(rollup_parts).astype(np.int32) if rollup_parts
+            else np.array([], dtype=np.int32)
+        )
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+    def lookup(self, paper_ids):
+        """
+        Map MAG IDs to rows.
+
+        Args:
+            paper_ids: Array-like of MAG IDs (ints or numeric strings)
+
+        Returns:
+            int64 array of row indices, -1 where the paper has no fields
+        """
+        paper_ids = np.asarray(paper_ids).astype(np.int64)
+        if not len(self.paper_ids):
+            return np.full(paper_ids.shape, -1, dtype=np.int64)
+        rows = np.searchsorted(self.paper_ids, paper_ids)
+        rows = np.minimum(rows, len(self.paper_ids) - 1)
+        return np.where(self.paper_ids[rows] == paper_ids, rows, -1)
+
+    def papers(self, field_id, include_descendants=False):
+        """
+        Sorted paper rows belonging to a field.
+
+        Args:
+            field_id: Field ID
+            include_descendants: If True, use the roll-up over all subfields
+        """
+        c = self.field_index.get(field_id)
+        if c is None:
+            return np.array([], dtype=np.int32)
+        if include_descendants:
+            return self.rollup_papers[self.rollup_ptr[c]:self.rollup_ptr[c+1]]
+        return self.field_papers[self.field_ptr[c]:self.field_ptr[c+1]]
+
+    def paper_ids_of(self, field_id, include_descendants=False):
+        """MAG IDs of the papers belonging to a field"""
+        return self.paper_ids[self.papers(field_id, include_descendants)]
+
+    def fields_of(self, paper_id):
+        """Field IDs directly assigned to a paper"""
+        row = self.lookup([paper_id])[0]
+        if row < 0:
+            return []
+        return [self.field_ids[c] for c in self.paper_fields[self.paper_ptr[row]:self.paper_ptr[row+1]]]
+
+    def union(self, field_ids, include_descendants=True):
+        """Sorted paper rows in any of the given fields"""
+        parts = [self.papers(f, include_descendants) for f in field_ids]
+        if not parts:
+            return np.array([], dtype=np.int32)
+        return np.unique(np.concatenate(parts))
+
+    def intersection(self, field_ids, include_descendants=True):
+        """Sorted paper rows in all of the given fields"""
+        parts = sorted((self.papers(f, include_descendants) for f in field_ids), key=len)
+        if not parts:
+            return np.array([], dtype=np.int32)
+        result = parts[0]
+        for part in parts[1:]:
+            result = np.intersect1d(result, part, assume_unique=True)
+        return result
+
+    def mask(self, field_id, include_descendants=True):
+        """Boolean array over all papers, True for members of the field"""
+        mask = np.zeros(len(self.paper_ids), dtype=bool)
+        mask[self.papers(field_id, include_descendants)] = True
+        return mask
+
+    def submatrix(self, rows, field_ids):
+        """
+        Direct membership of selected papers in selected fields.
+
+        Args:
+            rows: Paper rows (as returned by lookup); rows < 0 give empty rows
+            field_ids: Field IDs giving the column order
+
+        Returns:
+            scipy.sparse CSR bool matrix of shape (len(rows), len(field_ids))
+        """
+        from scipy import sparse
+
+        rows = np.asarray(rows, dtype=np.int64)
+        valid = rows >= 0
+        starts = np.where(valid, self.paper_ptr[np.where(valid, rows, 0)], 0)
+        lengths = np.where(valid, self.paper_ptr[np.where(valid, rows, 0) + 1], 0) - starts
+
+        # Flat positions of every selected (paper, field) entry
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        out_rows = np.repeat(np.arange(len(rows)), lengths)
+
+        remap = np.full(len(self.field_ids), -1, dtype=np.int64)
+        for i, field_id in enumerate(field_ids):
+            if field_id in self.field_index:
+                remap[self.field_index[field_id]] = i
+        out_cols = remap[self.paper_fields[positions]]
+        keep = out_cols >= 0
+
+        return sparse.csr_matrix(
+            (np.ones(keep.sum(), dtype=bool), (out_rows[keep], out_cols[keep])),
+            shape=(len(rows), len(field_ids))
+        )
+
+    def matrix(self, include_descendants=False):
+        """
+        Membership as a scipy.sparse CSR matrix of shape (papers, fields).
+
+        Args:
+            include_descendants: If True, use the roll-up over all subfields
+        """
+        from scipy import sparse
+
+        shape = (len(self.paper_ids), len(self.field_ids))
+        if include_descendants:
+            data = np.ones(len(self.rollup_papers), dtype=bool)
+            return sparse.csc_matrix((data, self.rollup_papers, self.rollup_ptr), shape=shape).tocsr()
+        data = np.ones(len(self.paper_fields), dtype=bool)
+        return sparse.csr_matrix((data, self.paper_fields, self.paper_ptr), shape=shape)
+
+@cache
+def GetFieldMembership(
+    MIN_PAPERS=1000
+):
+    """
+    Build the FieldMembership index once from PaperToFields and GetFieldHierarchy.
 
-    print('Number of Top Level Fields:', len(top_level))
-    print('Skipped:', skipped)
+    Args:
+        MIN_PAPERS: Passed to GetFieldHierarchy for the roll-up
 
-    return subgs
\ No newline at end of file
+    Returns:
+        FieldMembership
+    """
+    hierarchy = GetFieldHierarchy(MIN_PAPERS=MIN_PAPERS)
+    return FieldMembership(PaperToFields(), hierarchy)
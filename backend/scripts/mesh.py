@@ -1,54 +1,96 @@
 from .common import *
-from .fields import GetFieldNames, FieldNameToPoints, PaperToFields
+from .fields import GetFieldNames, FieldNameToPoints
 from tqdm import tqdm
 
 __all__ = [
     'WriteFieldMeshes',
+    'LoadMeshedFields',
     'GetFieldCenters',
-    'WriteFullMesh'
+    'WriteFullMesh',
+    'AlphaShape',
+    'GetAlphaShape',
+    'voxel_mesh',
+    'WriteMeshLODs',
+    'decimate_mesh',
+    'mesh_to_glb',
+    'points_inside_mesh',
+    'adjust_centers_if_outside',
+    'mesh_summary',
+    'LoadMeshSummaries'
 ]
 
 import alphashape
-from random import sample
 import trimesh
 import numpy as np
-from trimesh.ray.ray_triangle import ray_triangle_id
 import math
+import json
 from scipy.spatial import cKDTree
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
-import gc
 
-def calculate_grid_density(points, grid_size=32):
+def adaptive_grid_size(n_points, points_per_cell=8, min_size=8, max_size=256):
+    """Grid cells per dimension giving about points_per_cell points per cell on average.
+    
+    Args:
+        n_points: Number of points to grid
+        points_per_cell: Target average occupancy of a cell
+        min_size: Smallest grid size returned
+        max_size: Largest grid size returned
+        
+    Returns:
+        int: Number of grid cells per dimension
+    """
+    size = round((n_points / points_per_cell) ** (1 / 3))
+    return int(np.clip(size, min_size, max_size))
+
+def calculate_grid_density(points, grid_size=32, chunk_size=1_000_000):
     """Calculate point density using a grid-based approach.
     
+    Cell counts are accumulated with np.bincount over raveled cell indices and
+    read back with a single gather. Points are processed chunk_size at a time,
+    so memory-mapped point sets are never loaded whole.
+    
     Args:
-        points: Nx3 array of point coordinates
-        grid_size: Number of grid cells per dimension
+        points: Nx3 array of point coordinates (may be memory-mapped)
+        grid_size: Number of grid cells per dimension, or None to pick it
+            from the number of points with adaptive_grid_size
+        chunk_size: Number of points processed at a time
         
     Returns:
         densities: Array of density values for each point
     """
-    # Get bounds
-    min_coords = np.min(points, axis=0)
-    max_coords = np.max(points, axis=0)
+    n_points = len(points)
+    if grid_size is None:
+        grid_size = adaptive_grid_size(n_points)
+    if not n_points:
+        return np.zeros(0)
     
-    # Create grid
-    grid = np.zeros((grid_size, grid_size, grid_size))
+    # Get bounds
+    min_coords = np.full(3, np.inf)
+    max_coords = np.full(3, -np.inf)
+    for start in range(0, n_points, chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+        min_coords = np.minimum(min_coords, chunk.min(axis=0))
+        max_coords = np.maximum(max_coords, chunk.max(axis=0))
     
-    # Calculate cell size
+    # Calculate cell size (flat dimensions get a single cell)
     cell_size = (max_coords - min_coords) / grid_size
+    cell_size[cell_size == 0] = 1.0
     
-    # Assign points to grid cells
-    indices = np.floor((points - min_coords) / cell_size).astype(int)
-    indices = np.clip(indices, 0, grid_size-1)
+    def cell_indices(chunk):
+        indices = np.floor((np.asarray(chunk, dtype=np.float64) - min_coords) / cell_size).astype(np.int64)
+        indices = np.clip(indices, 0, grid_size - 1)
+        return np.ravel_multi_index(indices.T, (grid_size,) * 3)
     
     # Count points in each cell
-    for idx in indices:
-        grid[idx[0], idx[1], idx[2]] += 1
+    grid = np.zeros(grid_size ** 3, dtype=np.int64)
+    for start in range(0, n_points, chunk_size):
+        grid += np.bincount(cell_indices(points[start:start + chunk_size]), minlength=grid_size ** 3)
     
     # Get density for each point based on its grid cell
-    densities = np.array([grid[idx[0], idx[1], idx[2]] for idx in indices])
+    densities = np.empty(n_points, dtype=np.float64)
+    for start in range(0, n_points, chunk_size):
+        densities[start:start + chunk_size] = grid[cell_indices(points[start:start + chunk_size])]
     
     return densities
 
@@ -83,7 +125,7 @@ def calculate_point_density(points, radius=0.1, num_threads=4):
     tree = cKDTree(points)
     
     # Split points into chunks for parallel processing
-    chunk_size = len(points) // num_threads
+    chunk_size = max(1, len(points) // num_threads)
     chunks = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
     
     # Calculate accurate densities in parallel
@@ -99,15 +141,573 @@ def calculate_point_density(points, radius=0.1, num_threads=4):
     
     return combined_densities
 
-@cache(ignore=['NUM_THREADS', 'overwrite'])
+def tetrahedron_circumradii(points, simplices):
+    """Circumradius of each tetrahedron, vectorized.
+    
+    Args:
+        points: Nx3 array of point coordinates
+        simplices: Mx4 array of vertex indices
+        
+    Returns:
+        radii: Array of M circumradii (inf for degenerate tetrahedra)
+    """
+    a = points[simplices[:, 0]]
+    u = points[simplices[:, 1]] - a
+    v = points[simplices[:, 2]] - a
+    w = points[simplices[:, 3]] - a
+    
+    vw, wu, uv = np.cross(v, w), np.cross(w, u), np.cross(u, v)
+    denominator = 2 * np.einsum('ij,ij->i', u, vw)
+    numerator = (
+        np.einsum('ij,ij->i', u, u)[:, None] * vw
+        + np.einsum('ij,ij->i', v, v)[:, None] * wu
+        + np.einsum('ij,ij->i', w, w)[:, None] * uv
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        radii = np.linalg.norm(numerator, axis=1) / np.abs(denominator)
+    radii[~np.isfinite(radii)] = np.inf
+    return radii
+
+# Vertex positions of the 4 faces of a tetrahedron, and the vertex opposite each face
+TETRAHEDRON_FACES = np.array([[1, 2, 3], [0, 3, 2], [0, 1, 3], [0, 2, 1]])
+TETRAHEDRON_OPPOSITE = np.array([0, 1, 2, 3])
+
+class AlphaShape:
+    """Alpha shapes of a 3D point set from a single Delaunay tetrahedralization.
+    
+    The tetrahedralization and the circumradius of every tetrahedron are
+    computed once. A mesh for any alpha then only filters tetrahedra with
+    circumradius < 1 / alpha (the alphashape package's criterion) and keeps
+    the faces used by exactly one remaining tetrahedron, so sweeping ALPHA
+    costs a sort over the faces rather than a new triangulation.
+    
+    Attributes:
+        points: Nx3 array of point coordinates
+        simplices: Mx4 array of tetrahedron vertex indices
+        radii: Circumradius of each tetrahedron
+    """
+    
+    def __init__(self, points, simplices=None, radii=None):
+        from scipy.spatial import Delaunay
+        
+        self.points = np.asarray(points, dtype=np.float64)
+        if simplices is None:
+            simplices = Delaunay(self.points).simplices
+        self.simplices = np.asarray(simplices, dtype=np.int64)
+        self.radii = tetrahedron_circumradii(self.points, self.simplices) if radii is None else radii
+    
+    def boundary_faces(self, alpha):
+        """Boundary triangles of the alpha shape, oriented outward.
+        
+        Args:
+            alpha: Alpha value (higher = tighter fit); 0 or less keeps every
+                tetrahedron, giving the convex hull as alphashape does
+            
+        Returns:
+            Kx3 array of vertex indices
+        """
+        kept = self.simplices if alpha <= 0 else self.simplices[self.radii < 1.0 / alpha]
+        if not len(kept):
+            return np.zeros((0, 3), dtype=np.int64)
+        
+        faces = kept[:, TETRAHEDRON_FACES].reshape(-1, 3)
+        opposite = kept[:, TETRAHEDRON_OPPOSITE].reshape(-1)
+        
+        # Faces used by exactly one kept tetrahedron are on the boundary
+        _, inverse, counts = np.unique(np.sort(faces, axis=1), axis=0, return_inverse=True, return_counts=True)
+        boundary = counts[inverse.ravel()] == 1
+        faces, opposite = faces[boundary], opposite[boundary]
+        
+        # Point each normal away from the tetrahedron's opposite vertex
+        a, b, c = (self.points[faces[:, i]] for i in range(3))
+        normals = np.cross(b - a, c - a)
+        inward = np.einsum('ij,ij->i', normals, self.points[opposite] - a) > 0
+        faces[inward] = faces[inward][:, [0, 2, 1]]
+        return faces
+    
+    def mesh(self, alpha):
+        """Alpha shape as a trimesh.Trimesh (unreferenced points removed)."""
+        result = trimesh.Trimesh(vertices=self.points, faces=self.boundary_faces(alpha), process=False)
+        result.remove_unreferenced_vertices()
+        return result
+    
+    def sweep(self, alphas):
+        """Alpha shapes for several alpha values from the same tetrahedralization.
+        
+        Returns:
+            Dictionary mapping each alpha to its mesh
+        """
+        return {alpha: self.mesh(alpha) for alpha in alphas}
+    
+    def optimal_alpha(self, coverage=1.0):
+        """Largest alpha whose shape still includes the given fraction of the points.
+        
+        A point is included while at least one of its tetrahedra passes the
+        radius filter, so the answer follows from each point's smallest
+        incident circumradius without any search.
+        
+        Args:
+            coverage: Fraction of points that must be vertices of the shape
+            
+        Returns:
+            float: Alpha value
+        """
+        smallest = np.full(len(self.points), np.inf)
+        np.minimum.at(smallest, self.simplices.ravel(), np.repeat(self.radii, 4))
+        radius = np.quantile(smallest[np.isfinite(smallest)], coverage)
+        return float(1.0 / np.nextafter(radius, np.inf))
+
+_ALPHA_SHAPES = {}
+
+# Size of the on-disk tetrahedralization cache; least recently used files go first
+DELAUNAY_CACHE_BYTES = 2 * 1024 ** 3
+
+def _prune_delaunay_cache(directory, max_bytes):
+    """Delete the least recently used .npz files until the directory fits in max_bytes."""
+    files = []
+    for path in Path(directory).glob('*.npz'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files, key=lambda f: f[0]):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+def GetAlphaShape(points, max_cached=4, max_disk_bytes=DELAUNAY_CACHE_BYTES):
+    """AlphaShape for a point set, reusing earlier tetrahedralizations.
+    
+    Tetrahedralizations are keyed on a hash of the point coordinates and kept
+    in memory (the max_cached most recent) and on disk in
+    DATA_FOLDER/cache/delaunay, so re-meshing the same points with another
+    ALPHA skips the Delaunay step, also across runs. Reading a file marks it
+    as used; once the directory grows past max_disk_bytes, the least recently
+    used files are deleted.
+    
+    Args:
+        points: Nx3 array of point coordinates
+        max_cached: Number of tetrahedralizations kept in memory
+        max_disk_bytes: Size limit of DATA_FOLDER/cache/delaunay
+        
+    Returns:
+        AlphaShape
+    """
+    import hashlib
+    
+    points = np.ascontiguousarray(points, dtype=np.float64)
+    key = hashlib.blake2b(points.tobytes(), digest_size=16).hexdigest()
+    if key in _ALPHA_SHAPES:
+        return _ALPHA_SHAPES[key]
+    
+    cache_file = cache_dir / 'delaunay' / f"{key}.npz"
+    if cache_file.exists():
+        with np.load(cache_file) as cached:
+            shape = AlphaShape(points, cached['simplices'], cached['radii'])
+        os.utime(cache_file)
+    else:
+        shape = AlphaShape(points)
+        cache_file.parent.mkdir(exist_ok=True)
+        np.savez(cache_file, simplices=shape.simplices.astype(np.int32), radii=shape.radii)
+        _prune_delaunay_cache(cache_file.parent, max_disk_bytes)
+    
+    _ALPHA_SHAPES[key] = shape
+    while len(_ALPHA_SHAPES) > max_cached:
+        _ALPHA_SHAPES.pop(next(iter(_ALPHA_SHAPES)))
+    return shape
+
+def _alpha_shape_mesh(points, alpha, engine='delaunay'):
+    """Alpha shape of points with the chosen engine ('delaunay' or 'alphashape').
+    
+    alpha=None picks the largest alpha that keeps every point in the shape.
+    """
+    if engine == 'alphashape':
+        return alphashape.alphashape(np.asarray(points).tolist(), alpha)
+    shape = GetAlphaShape(points)
+    return shape.mesh(shape.optimal_alpha() if alpha is None else alpha)
+
+# Voxel meshing defaults: voxels along the largest extent, Gaussian blur in voxels,
+# and the fraction of points the isosurface encloses when no iso-level is given
+VOXEL_RESOLUTION = 96
+VOXEL_SIGMA = 1.0
+VOXEL_COVERAGE = 0.95
+
+def voxel_density(points, resolution=VOXEL_RESOLUTION, sigma=VOXEL_SIGMA, padding=3, chunk_size=1_000_000):
+    """Rasterize points into a blurred 3D density volume.
+    
+    Voxels are cubic, with resolution voxels along the largest extent, and
+    the volume is padded so the isosurface closes at the borders. Points
+    are histogrammed chunk_size at a time, so memory-mapped point sets work.
+    
+    Args:
+        points: Nx3 array of point coordinates (may be memory-mapped)
+        resolution: Number of voxels along the largest extent
+        sigma: Standard deviation of the Gaussian blur, in voxels
+        padding: Empty voxels added on every side
+        chunk_size: Number of points histogrammed at a time
+        
+    Returns:
+        (volume, origin, voxel_size): density in points per voxel, the
+        coordinates of the corner of voxel (0, 0, 0), and the voxel edge length
+    """
+    from scipy.ndimage import gaussian_filter
+    
+    min_coords = np.full(3, np.inf)
+    max_coords = np.full(3, -np.inf)
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+        min_coords = np.minimum(min_coords, chunk.min(axis=0))
+        max_coords = np.maximum(max_coords, chunk.max(axis=0))
+    
+    voxel_size = float(np.max(max_coords - min_coords)) / resolution or 1.0
+    shape = np.ceil((max_coords - min_coords) / voxel_size).astype(int) + 1 + 2 * padding
+    origin = min_coords - padding * voxel_size
+    edges = [origin[i] + voxel_size * np.arange(shape[i] + 1) for i in range(3)]
+    
+    volume = np.zeros(shape, dtype=np.float64)
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+        volume += np.histogramdd(chunk, bins=edges)[0]
+    
+    if sigma:
+        volume = gaussian_filter(volume, sigma)
+    return volume, origin, voxel_size
+
+def voxel_mesh(points, resolution=VOXEL_RESOLUTION, sigma=VOXEL_SIGMA, iso_level=None,
+               coverage=VOXEL_COVERAGE, chunk_size=1_000_000):
+    """Isosurface of the blurred point density, extracted with marching cubes.
+    
+    Uses every point, unlike the alpha shapes, and gives smooth, compact meshes.
+    
+    Args:
+        points: Nx3 array of point coordinates (may be memory-mapped)
+        resolution: Number of voxels along the largest extent
+        sigma: Standard deviation of the Gaussian blur, in voxels
+        iso_level: Density (points per voxel) of the surface; if None, the
+            level that encloses the given fraction of the points
+        coverage: Fraction of points inside the surface when iso_level is None
+        chunk_size: Number of points processed at a time
+        
+    Returns:
+        trimesh.Trimesh with outward-facing normals
+    """
+    from skimage.measure import marching_cubes
+    
+    volume, origin, voxel_size = voxel_density(points, resolution, sigma, chunk_size=chunk_size)
+    
+    if iso_level is None:
+        # Density at each point's voxel; the surface keeps `coverage` of them inside
+        point_density = np.empty(len(points))
+        for start in range(0, len(points), chunk_size):
+            chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+            index = np.floor((chunk - origin) / voxel_size).astype(int)
+            point_density[start:start + chunk_size] = volume[tuple(index.T)]
+        iso_level = float(np.quantile(point_density, 1 - coverage))
+    iso_level = float(np.clip(iso_level, volume.min() + 1e-9, volume.max() - 1e-9))
+    
+    vertices, faces, _, _ = marching_cubes(volume, iso_level, spacing=(voxel_size,) * 3)
+    
+    # For a density volume the raw marching_cubes winding faces inward (negative
+    # volume); reversing each face turns the normals outward, toward lower density
+    result = trimesh.Trimesh(vertices=vertices + origin, faces=faces[:, ::-1])
+    if result.is_volume and result.volume < 0:
+        result.invert()
+    return result
+
+MESH_ENGINES = ('delaunay', 'alphashape', 'voxel')
+
+def mesh_summaries(meshes):
+    """Compact geometry summaries, enough to place cameras without the mesh.
+    
+    Centers are checked against their meshes in one batch
+    (adjust_centers_if_outside). A mesh whose center cannot be computed
+    (no vertices, or a degenerate volume) gets None instead of a summary,
+    and does not affect the others.
+    
+    Args:
+        meshes: List of trimesh.Trimesh objects
+        
+    Returns:
+        One dictionary (or None) per mesh: vertex_count, vertex_sum, bounds,
+        volume, center_mass and center (the center of mass, moved to the
+        closest vertex if it lies outside the mesh)
+    """
+    centers_mass = []
+    for m in meshes:
+        try:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                center_mass = np.asarray(m.center_mass, dtype=np.float64)
+            valid = len(m.vertices) > 0 and center_mass.shape == (3,) and np.all(np.isfinite(center_mass))
+        except Exception as e:
+            logger.debug(f"No center of mass: {e}")
+            valid = False
+        centers_mass.append(center_mass if valid else None)
+    
+    valid = [i for i, c in enumerate(centers_mass) if c is not None]
+    centers = [None] * len(meshes)
+    try:
+        adjusted = adjust_centers_if_outside([meshes[i] for i in valid], [centers_mass[i] for i in valid])
+        for i, center in zip(valid, adjusted):
+            centers[i] = center
+    except Exception:
+        # One mesh breaks the batch; adjust the rest one by one
+        for i in valid:
+            try:
+                centers[i] = adjust_center_if_outside(meshes[i], centers_mass[i])
+            except Exception as e:
+                logger.debug(f"Error adjusting center: {e}")
+    
+    return [None if center is None else {
+        'vertex_count': len(m.vertices),
+        'vertex_sum': m.vertices.sum(axis=0).tolist(),
+        'bounds': m.bounds.tolist(),
+        'volume': float(m.volume),
+        'center_mass': center_mass.tolist(),
+        'center': center.tolist(),
+    } for m, center_mass, center in zip(meshes, centers_mass, centers)]
+
+def mesh_summary(mesh):
+    """Geometry summary of one mesh, see mesh_summaries."""
+    return mesh_summaries([mesh])[0]
+
+def _summary_path(name):
+    return DATA_FOLDER / 'static' / 'field_meshes' / f"{name}.summary.json"
+
+def _write_mesh_summary(name, summary):
+    if summary is None:
+        # Degenerate mesh: keep the STL, leave it out of the centers
+        logger.warning(f"No summary for mesh {name}, skipping its center")
+        _summary_path(name).unlink(missing_ok=True)
+        return
+    with open(_summary_path(name), 'w') as f:
+        json.dump(summary, f)
+
+def LoadMeshSummaries():
+    """Summaries of every STL in static/field_meshes, keyed by mesh name.
+    
+    Summaries are written next to each STL by WriteFieldMeshes and
+    WriteFullMesh. Meshes written before summaries existed, or rewritten
+    since, are loaded once and summarized in one batch.
+    
+    Returns:
+        Dictionary mapping mesh names to mesh_summary dictionaries
+    """
+    mesh_dir = DATA_FOLDER / 'static' / 'field_meshes'
+    summaries = {}
+    stale = []
+    for stl_file in sorted(mesh_dir.glob('*.stl')):
+        summary_file = _summary_path(stl_file.stem)
+        if summary_file.exists() and summary_file.stat().st_mtime >= stl_file.stat().st_mtime:
+            with open(summary_file) as f:
+                summaries[stl_file.stem] = json.load(f)
+        else:
+            stale.append(stl_file)
+    
+    if stale:
+        logger.info(f"Summarizing {len(stale)} meshes without summaries")
+        meshes = {}
+        for stl_file in tqdm(stale, desc="Loading meshes"):
+            mesh = trimesh.load(stl_file)
+            if isinstance(mesh, trimesh.Trimesh) and len(mesh.vertices):
+                meshes[stl_file.stem] = mesh
+        for name, summary in zip(meshes, mesh_summaries(list(meshes.values()))):
+            _write_mesh_summary(name, summary)
+            if summary is not None:
+                summaries[name] = summary
+    
+    return summaries
+
+def _mesh_field(points_array, ALPHA, MIN_DENSITY, MIN_POINTS_MESH, num_threads, engine='delaunay', seed=0,
+                voxel_resolution=VOXEL_RESOLUTION, iso_level=None):
+    """Density-filter, sample and alpha-shape one field's points.
+    
+    The 'voxel' engine instead meshes every point with voxel_mesh.
+    
+    Args:
+        points_array: Nx3 array of the field's points
+        ALPHA: Alpha value for the alpha shape (None for the automatic choice)
+        MIN_DENSITY: Minimum combined density for a point to be kept
+        MIN_POINTS_MESH: Maximum number of points passed to the alpha shape
+        num_threads: Threads for the KD-tree density query
+        engine: One of MESH_ENGINES
+        seed: Seed of the point sample, so reruns reuse cached tetrahedralizations
+        voxel_resolution: Voxels along the largest extent ('voxel' engine)
+        iso_level: Surface density in points per voxel, None for automatic ('voxel' engine)
+        
+    Returns:
+        (STL file contents, mesh_summary), or None if too few dense points remain
+    """
+    if engine == 'voxel':
+        if len(points_array) < 100:
+            return None
+        hull = voxel_mesh(points_array, resolution=voxel_resolution, iso_level=iso_level)
+        return trimesh.exchange.export.export_stl(hull), mesh_summary(hull)
+
+    # Calculate point densities with parallel processing
+    densities = calculate_point_density(points_array, num_threads=num_threads)
+    
+    # Keep only points in dense regions using absolute threshold
+    dense_points = points_array[densities >= MIN_DENSITY]
+    
+    # If we still have too many points, randomly sample
+    if len(dense_points) > MIN_POINTS_MESH:
+        keep = np.sort(np.random.default_rng(seed).choice(len(dense_points), MIN_POINTS_MESH, replace=False))
+        dense_points = dense_points[keep]
+
+    if len(dense_points) < 100:
+        return None
+        
+    # Generate mesh from dense points
+    hull = _alpha_shape_mesh(dense_points, ALPHA, engine)
+    return trimesh.exchange.export.export_stl(hull), mesh_summary(hull)
+
+def _mesh_field_shared(shm_name, shape, start, stop, options):
+    """Worker entry point: mesh rows start:stop of the shared point array.
+    
+    Returns:
+        (_mesh_field result, seconds taken)
+    """
+    from multiprocessing import shared_memory
+
+    s = time()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        points_array = np.array(np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[start:stop])
+    finally:
+        shm.close()
+    return _mesh_field(points_array, **options), time() - s
+
+# Grid step of the coordinates hashed into point-set fingerprints
+FINGERPRINT_PRECISION = 1e-4
+
+def point_set_fingerprint(points, precision=FINGERPRINT_PRECISION):
+    """Fingerprint of a point set: count plus a hash of its quantized coordinates.
+    
+    Coordinates are rounded to multiples of precision and sorted, so the
+    fingerprint ignores point order and sub-precision noise.
+    
+    Args:
+        points: Nx3 array of point coordinates
+        precision: Quantization step
+        
+    Returns:
+        Dictionary with 'count' and 'hash'
+    """
+    import hashlib
+    
+    quantized = np.round(np.asarray(points, dtype=np.float64).reshape(-1, 3) / precision).astype(np.int64)
+    quantized = quantized[np.lexsort(quantized.T[::-1])]
+    return {
+        'count': len(quantized),
+        'hash': hashlib.blake2b(quantized.tobytes(), digest_size=20).hexdigest(),
+    }
+
+def _manifest_path():
+    return DATA_FOLDER / 'static' / 'field_meshes' / 'manifest.json'
+
+def _load_mesh_manifest():
+    """Per-field fingerprints and parameters of the meshes on disk."""
+    try:
+        with open(_manifest_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_mesh_manifest(manifest):
+    path = _manifest_path()
+    tmp = path.with_suffix('.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def LoadMeshedFields():
+    """Names of the fields WriteFieldMeshes left a mesh for, read from its manifest.
+    
+    Nothing is fingerprinted or meshed, so this is cheap enough for deploy.
+    
+    Returns:
+        Sorted list of field names whose STL is on disk
+    """
+    mesh_dir = DATA_FOLDER / 'static' / 'field_meshes'
+    return sorted(
+        name for name, entry in _load_mesh_manifest().items()
+        if entry.get('meshed') and (mesh_dir / f"{name}.stl").exists()
+    )
+
+def _remove_mesh_lods(name, lod_dir):
+    """Delete the GLB levels of one mesh."""
+    for lod_file in lod_dir.glob('*.glb'):
+        stem, _, level = lod_file.stem.rpartition('_')
+        if stem == name and level.isdigit():
+            lod_file.unlink(missing_ok=True)
+
+def _remove_field_mesh(name):
+    """Delete a field's STL, summary and LOD files."""
+    mesh_dir = DATA_FOLDER / 'static' / 'field_meshes'
+    (mesh_dir / f"{name}.stl").unlink(missing_ok=True)
+    _summary_path(name).unlink(missing_ok=True)
+    _remove_mesh_lods(name, mesh_dir / 'lod')
+
+def _pack_points(points_per_field, field_ids):
+    """Concatenate the fields' points into one array.
+    
+    Returns:
+        (Nx3 float64 array, dict mapping field id to its (start, stop) rows)
+    """
+    counts = [len(points_per_field[fid]) for fid in field_ids]
+    packed = np.empty((sum(counts), 3), dtype=np.float64)
+    rows = {}
+    start = 0
+    for fid, count in zip(field_ids, counts):
+        if count:
+            packed[start:start + count] = np.asarray(points_per_field[fid], dtype=np.float64).reshape(count, 3)
+        rows[fid] = (start, start + count)
+        start += count
+    return packed, rows
+
 def WriteFieldMeshes(
     MIN_POINTS_MESH = 40_000,
     ALPHA = 3,
     MIN_DENSITY = 50,  # Minimum number of points that must be within radius for a point to be included
     NUM_THREADS = 4,  # Number of threads for parallel processing
-    overwrite = True
+    NUM_WORKERS = 1,  # Number of processes meshing fields in parallel
+    MESH_ENGINE = 'delaunay',  # 'delaunay' (cached tetrahedralization), 'alphashape' or 'voxel'
+    VOXEL_RESOLUTION = VOXEL_RESOLUTION,  # 'voxel' engine: voxels along the largest extent
+    ISO_LEVEL = None,  # 'voxel' engine: surface density, None to enclose VOXEL_COVERAGE of the points
+    overwrite = False
 ):
+    """Generate an alpha-shape STL mesh for each large or point-cloud field.
+    
+    With NUM_WORKERS > 1, whole fields are dispatched to a process pool. The
+    field points are packed once into a shared memory block that workers read
+    their rows from, and the STL files are written by this process as results
+    come back. The time taken per field is logged and written to
+    DATA_FOLDER/logs/field_meshes.json.
+    
+    The 'delaunay' engine caches each field's tetrahedralization (see
+    GetAlphaShape), so rerunning with another ALPHA only re-filters it;
+    ALPHA=None picks the largest alpha that keeps every point. The 'voxel'
+    engine skips the density filter and sampling and meshes the isosurface
+    of all the field's points (see voxel_mesh).
+    
+    Meshing is incremental: static/field_meshes/manifest.json records, per
+    field, the fingerprint of its point set (point_set_fingerprint) and the
+    mesh parameters. A field is remeshed only when either changed or its
+    STL is missing; overwrite=True remeshes every field. Fields that are no
+    longer meshed lose their STL, summary, LODs and manifest entry. The
+    manifest takes the place of @cache here, so every call checks the
+    fingerprints and returns quickly when nothing changed.
+    
+    Returns:
+        List of field IDs considered for meshing
+    """
     from . import pointclouds
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from multiprocessing import shared_memory
 
     fnames = GetFieldNames()
     points_per_subfield = FieldNameToPoints()
@@ -124,40 +724,102 @@ def WriteFieldMeshes(
 
     to_mesh = sorted( set(above_threshold) | set(pointcloud_fields) )
 
-    with tqdm(total=len(to_mesh), desc="Generating field meshes") as pbar:
-        for fid in to_mesh:
-            points = points_per_subfield[fid]
+    options = dict(
+        ALPHA=ALPHA, MIN_DENSITY=MIN_DENSITY, MIN_POINTS_MESH=MIN_POINTS_MESH,
+        num_threads=NUM_THREADS, engine=MESH_ENGINE,
+        voxel_resolution=VOXEL_RESOLUTION, iso_level=ISO_LEVEL
+    )
+    mesh_params = {k: v for k, v in options.items() if k != 'num_threads'}
 
-            outfn = outd / f"{fnames[fid]}.stl"
-            if not overwrite and outfn.exists():
-                continue                
+    # Only fields whose points or mesh parameters changed since the last run
+    manifest = _load_mesh_manifest()
+    fingerprints = {}
+    pending = []
+    for fid in to_mesh:
+        name = fnames[fid]
+        fingerprints[fid] = point_set_fingerprint(points_per_subfield[fid])
+        entry = manifest.get(name, {})
+        up_to_date = (
+            entry.get('fingerprint') == fingerprints[fid]
+            and entry.get('params') == mesh_params
+            and (not entry.get('meshed') or (outd / f"{name}.stl").exists())
+        )
+        if overwrite or not up_to_date:
+            pending.append(fid)
+    logger.info(f"Meshing {len(pending)} of {len(to_mesh)} fields, the rest are unchanged")
 
-            pbar.set_postfix_str(f"processing {fnames[fid]}")
-            
-            # Convert points to numpy array
-            points_array = np.array(points)
-            
-            # Calculate point densities with parallel processing
-            densities = calculate_point_density(points_array, num_threads=NUM_THREADS)
-            
-            # Keep only points in dense regions using absolute threshold
-            dense_points = points_array[densities >= MIN_DENSITY]
-            
-            # If we still have too many points, randomly sample
-            if len(dense_points) > MIN_POINTS_MESH:
-                dense_points = sample(dense_points.tolist(), MIN_POINTS_MESH)
+    # Drop the meshes of fields that left to_mesh
+    current = {fnames[fid] for fid in to_mesh}
+    removed = [name for name in manifest if name not in current]
+    for name in removed:
+        _remove_field_mesh(name)
+        del manifest[name]
+    if removed:
+        logger.info(f"Removed the meshes of {len(removed)} fields no longer meshed")
+        _save_mesh_manifest(manifest)
 
-            if len(dense_points) < 100:
-                pbar.update(1)
-                continue
-                
-            # Generate mesh from dense points
-            hull = alphashape.alphashape(dense_points, ALPHA)
+    # Largest fields first, so the pool drains evenly
+    pending.sort(key=lambda fid: -len(points_per_subfield[fid]))
+
+    timings = {}
 
-            with open(outfn, 'wb') as outf:
-                outf.write(trimesh.exchange.export.export_stl(hull))
+    def write_result(fid, result, seconds):
+        name = fnames[fid]
+        timings[name] = seconds
+        logger.debug(f"Meshed {name} in {seconds:.1f}s")
+        if result is not None:
+            stl, summary = result
+            with open(outd / f"{name}.stl", 'wb') as outf:
+                outf.write(stl)
+            _write_mesh_summary(name, summary)
+        else:
+            # Too few points now; drop a mesh left over from earlier points
+            _remove_field_mesh(name)
+        manifest[name] = {
+            'fingerprint': fingerprints[fid],
+            'params': mesh_params,
+            'meshed': result is not None,
+        }
+        _save_mesh_manifest(manifest)
 
-            pbar.update(1)
+    with tqdm(total=len(pending), desc="Generating field meshes") as pbar:
+        if NUM_WORKERS > 1 and len(pending) > 1:
+            packed, rows = _pack_points(points_per_subfield, pending)
+            shape = packed.shape
+            shm = shared_memory.SharedMemory(create=True, size=max(packed.nbytes, 1))
+            try:
+                np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[:] = packed
+                del packed
+
+                with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor:
+                    futures = {
+                        executor.submit(_mesh_field_shared, shm.name, shape, *rows[fid], options): fid
+                        for fid in pending
+                    }
+                    for future in as_completed(futures):
+                        fid = futures[future]
+                        pbar.set_postfix_str(f"finished {fnames[fid]}")
+                        write_result(fid, *future.result())
+                        pbar.update(1)
+            finally:
+                shm.close()
+                shm.unlink()
+        else:
+            for fid in pending:
+                pbar.set_postfix_str(f"processing {fnames[fid]}")
+                s = time()
+                result = _mesh_field(np.array(points_per_subfield[fid]), **options)
+                write_result(fid, result, time() - s)
+                pbar.update(1)
+
+    # Report per-field timing
+    slowest = sorted(timings.items(), key=lambda x: -x[1])
+    if slowest:
+        logger.info("Slowest field meshes: " + ", ".join(f"{name} {t:.1f}s" for name, t in slowest[:5]))
+    log_dir = DATA_FOLDER / 'logs'
+    log_dir.mkdir(exist_ok=True)
+    with open(log_dir / 'field_meshes.json', 'w') as f:
+        json.dump(dict(slowest), f, indent=2)
 
     return to_mesh
 
@@ -171,8 +833,12 @@ def calculate_camera_position(mesh, center, global_center, fov_degrees=60, scale
         fov_degrees: Field of view in degrees
         scale: Scale factor for distance
     """
+    return _camera_from_bounds(mesh.bounds, center, global_center, fov_degrees, scale)
+
+def _camera_from_bounds(bounds, center, global_center, fov_degrees=60, scale=100):
+    """calculate_camera_position from the mesh bounds alone."""
     # Get bounding sphere
-    bounds = mesh.bounds
+    bounds = np.asarray(bounds)
     radius = np.linalg.norm(bounds[1] - bounds[0]) / 2
     
     # Calculate required distance using FOV
@@ -193,6 +859,124 @@ def calculate_camera_position(mesh, center, global_center, fov_degrees=60, scale
     
     return camera_pos.tolist()
 
+def _cross2(u, v):
+    """z component of the cross product of 2D vectors."""
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+def _x_ray_crossings(vertices, faces, origins, face_owner=None, ray_owner=None, chunk_size=200_000):
+    """All crossings of rays cast from origins along +x with a triangle soup.
+    
+    Replaces a BVH for axis-aligned rays: rays are binned on a grid in the
+    y-z plane, every triangle is paired with the rays in the cells its y-z
+    bounding box covers, and the pairs are tested exactly, all vectorized.
+    Points on an edge shared by two triangles count once (top-left rule),
+    so parity tests stay exact on grid-aligned rays.
+    
+    Args:
+        vertices: Vx3 vertex coordinates
+        faces: Fx3 vertex indices
+        origins: Rx3 ray origins
+        face_owner: Optional per-face label; a face only counts for rays with the same ray_owner
+        ray_owner: Optional per-ray label, required with face_owner
+        chunk_size: Number of triangles processed at a time
+        
+    Returns:
+        (ray index, x coordinate) of every crossing in front of its origin
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    faces = np.asarray(faces)
+    if not len(origins) or not len(faces):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    
+    # Bin the rays on a y-z grid with about one ray per cell
+    grid = max(1, int(np.sqrt(len(origins))))
+    low = origins[:, 1:].min(axis=0)
+    high = origins[:, 1:].max(axis=0)
+    cell = np.maximum(high - low, 1e-12) / grid
+    def cells(yz):
+        return np.clip(np.floor((yz - low) / cell), 0, grid - 1).astype(np.int64)
+    ray_cells = cells(origins[:, 1:])
+    ray_key = ray_cells[:, 0] * grid + ray_cells[:, 1]
+    ray_order = np.argsort(ray_key, kind='stable')
+    cell_start = np.searchsorted(ray_key[ray_order], np.arange(grid * grid + 1))
+    
+    hit_rays, hit_xs = [], []
+    for start in range(0, len(faces), chunk_size):
+        tri = vertices[faces[start:start + chunk_size]]
+        yz_min = tri[:, :, 1:].min(axis=1)
+        yz_max = tri[:, :, 1:].max(axis=1)
+        overlap = np.all((yz_max >= low) & (yz_min <= high), axis=1)
+        tri_index = np.flatnonzero(overlap)
+        if not len(tri_index):
+            continue
+        
+        # Triangle x grid cell pairs
+        c0 = cells(yz_min[tri_index])
+        c1 = cells(yz_max[tri_index])
+        span = c1 - c0 + 1
+        n_cells = span[:, 0] * span[:, 1]
+        pair_tri = np.repeat(np.arange(len(tri_index)), n_cells)
+        local = np.arange(len(pair_tri)) - np.repeat(np.cumsum(n_cells) - n_cells, n_cells)
+        key = ((c0[pair_tri, 0] + local // span[pair_tri, 1]) * grid
+               + c0[pair_tri, 1] + local % span[pair_tri, 1])
+        
+        # Triangle x ray pairs
+        n_rays = cell_start[key + 1] - cell_start[key]
+        pair_tri = np.repeat(pair_tri, n_rays)
+        local = np.arange(len(pair_tri)) - np.repeat(np.cumsum(n_rays) - n_rays, n_rays)
+        pair_ray = ray_order[np.repeat(cell_start[key], n_rays) + local]
+        pair_face = tri_index[pair_tri]
+        if face_owner is not None:
+            same = face_owner[start + pair_face] == ray_owner[pair_ray]
+            pair_face, pair_ray = pair_face[same], pair_ray[same]
+        
+        # Exact test in the y-z plane, with every triangle turned counterclockwise
+        v = tri[pair_face]
+        area = _cross2(v[:, 1, 1:] - v[:, 0, 1:], v[:, 2, 1:] - v[:, 0, 1:])
+        flip = area < 0
+        v[flip] = v[flip][:, [0, 2, 1]]
+        area = np.abs(area)
+        point = origins[pair_ray, 1:]
+        
+        inside = area > 0
+        weights = []
+        for i in range(3):
+            a, b = v[:, i, 1:], v[:, (i + 1) % 3, 1:]
+            edge = b - a
+            # Written as (a - p) x (b - p) so that an edge shared by two triangles
+            # gets exactly opposite values, whatever the rounding
+            e = _cross2(a - point, b - point)
+            top_left = (edge[:, 1] < 0) | ((edge[:, 1] == 0) & (edge[:, 0] > 0))
+            inside &= (e > 0) | ((e == 0) & top_left)
+            weights.append(e)
+        
+        # Barycentric weight of a vertex is the edge function of the opposite edge
+        x = (weights[1] * v[:, 0, 0] + weights[2] * v[:, 1, 0] + weights[0] * v[:, 2, 0])
+        x = x[inside] / area[inside]
+        rays = pair_ray[inside]
+        ahead = x > origins[rays, 0]
+        hit_rays.append(rays[ahead])
+        hit_xs.append(x[ahead])
+    
+    if not hit_rays:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(hit_rays), np.concatenate(hit_xs)
+
+def points_inside_mesh(mesh, points):
+    """Containment test for many points at once (ray parity along +x).
+    
+    Args:
+        mesh: trimesh.Trimesh object
+        points: Nx3 array of point coordinates
+        
+    Returns:
+        Boolean array, True for points inside the mesh
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    rays, _ = _x_ray_crossings(mesh.vertices, mesh.faces, points)
+    return np.bincount(rays, minlength=len(points)) % 2 == 1
+
 def adjust_center_if_outside(mesh, center):
     """If center is outside mesh, move it to closest vertex.
     
@@ -203,13 +987,37 @@ def adjust_center_if_outside(mesh, center):
     Returns:
         (3,) numpy array of adjusted center coordinates
     """
-    center = np.array(center)
-    if not is_point_inside_mesh(mesh, center):
-        # Find closest vertex
-        distances = np.linalg.norm(mesh.vertices - center, axis=1)
-        closest_vertex_idx = np.argmin(distances)
-        return mesh.vertices[closest_vertex_idx]
-    return center
+    return adjust_centers_if_outside([mesh], [center])[0]
+
+def adjust_centers_if_outside(meshes, centers):
+    """Move every center that lies outside its mesh to the mesh's closest vertex.
+    
+    All meshes are tested together: their faces are stacked, tagged with the
+    mesh they belong to, and one ray per center is cast against the stack.
+    
+    Args:
+        meshes: List of trimesh.Trimesh objects
+        centers: One (3,) center per mesh
+        
+    Returns:
+        Mx3 numpy array of adjusted centers
+    """
+    centers = np.array(centers, dtype=np.float64).reshape(-1, 3)
+    if not len(meshes):
+        return centers
+    
+    vertex_offsets = np.cumsum([0] + [len(m.vertices) for m in meshes])
+    vertices = np.concatenate([m.vertices for m in meshes])
+    faces = np.concatenate([m.faces + offset for m, offset in zip(meshes, vertex_offsets)])
+    face_owner = np.repeat(np.arange(len(meshes)), [len(m.faces) for m in meshes])
+    
+    rays, _ = _x_ray_crossings(vertices, faces, centers, face_owner, np.arange(len(meshes)))
+    inside = np.bincount(rays, minlength=len(meshes)) % 2 == 1
+    
+    for i in np.flatnonzero(~inside):
+        distances = np.linalg.norm(meshes[i].vertices - centers[i], axis=1)
+        centers[i] = meshes[i].vertices[np.argmin(distances)]
+    return centers
 
 def is_point_inside_mesh(mesh, point):
     """Check if a point is inside a mesh using ray casting.
@@ -221,24 +1029,16 @@ def is_point_inside_mesh(mesh, point):
     Returns:
         bool: True if point is inside mesh, False otherwise
     """
-    # Cast ray in positive x direction
-    ray_origins = np.array([point])
-    ray_directions = np.array([[1.0, 0.0, 0.0]])
-    
-    # Get intersections
-    locations, index_ray, index_tri = mesh.ray.intersects_location(
-        ray_origins=ray_origins,
-        ray_directions=ray_directions
-    )
-    
-    # Even number of intersections means outside
-    return len(locations) % 2 == 1
+    return bool(points_inside_mesh(mesh, [point])[0])
 
 def calculate_true_center(mesh, num_samples=25):
     """Calculate center of mass by sampling points throughout the mesh volume.
     Turns out this is essentially the same as using the center_mass attribute,
         and much slower.
     
+    One ray per y-z grid point is cast along the x-axis, all in one batch,
+    and three points are sampled inside every segment between crossings.
+    
     Args:
         mesh: trimesh.Trimesh object
         num_samples: Number of samples along each axis
@@ -254,175 +1054,472 @@ def calculate_true_center(mesh, num_samples=25):
     min_bound = bounds[0]
     max_bound = bounds[1]
     
-    # Create evenly spaced points along each axis
-    x = np.linspace(min_bound[0], max_bound[0], num_samples)
+    # One ray per point of a y-z grid, starting below the minimum x bound
     y = np.linspace(min_bound[1], max_bound[1], num_samples)
     z = np.linspace(min_bound[2], max_bound[2], num_samples)
-    
-    # Create a 2D grid for y-z plane
     yy, zz = np.meshgrid(y, z)
-    yz_points = np.column_stack((yy.flatten(), zz.flatten()))
+    origins = np.column_stack((
+        np.full(yy.size, min_bound[0] - 0.1), yy.ravel(), zz.ravel()
+    ))
     
-    interior_points = []
-    
-    # For each y-z point, cast a ray along the x-axis and find all intersections
-    for yz in tqdm(yz_points, desc="Sampling interior points", leave=False):
-        # Start from minimum x bound
-        start_point = np.array([min_bound[0] - 0.1, yz[0], yz[1]])
-        
-        # Cast ray in positive x direction
-        ray_origins = np.array([start_point])
-        ray_directions = np.array([[1.0, 0.0, 0.0]])
-        
-        # Get all intersections
-        locations, index_ray, index_tri = mesh.ray.intersects_location(
-            ray_origins=ray_origins,
-            ray_directions=ray_directions
-        )
-        
-        # Sort intersections by x coordinate
-        if len(locations) > 0:
-            sorted_indices = np.argsort(locations[:, 0])
-            locations = locations[sorted_indices]
-            
-            # Start outside the mesh
-            inside = False
-            
-            # For each intersection, flip inside/outside state
-            for i in range(len(locations)):
-                inside = not inside
-                
-                # If we're inside after this intersection, add sample points
-                # between this intersection and the next one (or max_bound)
-                if inside:
-                    start_x = locations[i][0]
-                    end_x = locations[i+1][0] if i+1 < len(locations) else max_bound[0]
-                    
-                    # Sample points along this inside segment
-                    sample_xs = np.linspace(start_x, end_x, num=5)[1:-1]  # exclude boundaries
-                    for sample_x in sample_xs:
-                        interior_points.append([sample_x, yz[0], yz[1]])
-    
-    if not interior_points:
+    rays, xs = _x_ray_crossings(mesh.vertices, mesh.faces, origins)
+    if not len(rays):
         # Fallback to center of mass if no interior points found
         return mesh.center_mass
-        
+    
+    # Crossings sorted along each ray; even crossings enter the mesh
+    order = np.lexsort((xs, rays))
+    rays, xs = rays[order], xs[order]
+    first = np.searchsorted(rays, rays)
+    entering = (np.arange(len(rays)) - first) % 2 == 0
+    next_x = np.append(xs[1:], max_bound[0])
+    same_ray = np.append(rays[1:] == rays[:-1], False)
+    
+    start_x = xs[entering]
+    end_x = np.where(same_ray, next_x, max_bound[0])[entering]
+    segment_rays = rays[entering]
+    
+    # Sample points along each inside segment, excluding its boundaries
+    fractions = np.array([0.25, 0.5, 0.75])
+    sample_x = (start_x[:, None] + (end_x - start_x)[:, None] * fractions).ravel()
+    sample_yz = np.repeat(origins[segment_rays, 1:], len(fractions), axis=0)
+    
     # Calculate center as mean of interior points
-    return np.mean(interior_points, axis=0)
+    return np.column_stack((sample_x, sample_yz)).mean(axis=0)
 
 @cache
 def GetFieldCenters():
     """Returns a dictionary mapping field names to their centers and camera positions.
-    Centers are calculated by sampling interior points of each mesh.
-    If a center is outside its mesh, it's moved to the closest vertex.
+    Centers are the centers of mass of each mesh; if a center is outside its
+    mesh, it's moved to the closest vertex.
     Camera positions are calculated to always look inward toward the global center.
-    Global center is calculated as average of all vertices for efficiency."""
+    Global center is the average of all vertices.
     
-    mesh_dir = DATA_FOLDER / 'static' / 'field_meshes'
-    field_data = {}
+    Everything is read from the per-mesh summaries (LoadMeshSummaries), so
+    the STL files are only parsed for meshes that have none."""
     
     SCALE = 100  # Match the scale used in the frontend
     
-    # First pass: load meshes and calculate global center from vertices
-    meshes = {}
-    all_vertices = []
-    
-    # Create progress bar for loading meshes
-    stl_files = list(mesh_dir.glob('*.stl'))
-    with tqdm(total=len(stl_files), desc="Loading meshes") as pbar:
-        for stl_file in stl_files:
-            mesh = trimesh.load(stl_file)
-            field_name = stl_file.stem
-            meshes[field_name] = mesh
-            if not hasattr(mesh, 'vertices'):
-                pbar.update(1)
-                continue
-
-            all_vertices.extend(mesh.vertices)
-            pbar.set_postfix_str(f"loading {field_name}")
-            pbar.update(1)
+    summaries = LoadMeshSummaries()
+    if not summaries:
+        return {}
     
-    # Calculate global center as mean of all vertices
-    global_center = np.mean(all_vertices, axis=0) * SCALE
-    global_center = global_center.tolist()
+    # Global center as mean of all vertices, from per-mesh vertex sums
+    vertex_sum = np.sum([s['vertex_sum'] for s in summaries.values()], axis=0)
+    vertex_count = sum(s['vertex_count'] for s in summaries.values())
+    global_center = (vertex_sum / vertex_count * SCALE).tolist()
     
-    # Calculate centers for each mesh
-    with tqdm(total=len(meshes), desc="Calculating Field Centers") as pbar:
-        for field_name, mesh in meshes.items():
-            pbar.set_postfix_str(field_name)
-            
-            # Get the true center and adjust if somehow outside
-            center = mesh.center_mass
-            if center is None:
-                pbar.update(1)
-                continue
-            
-            try:
-                center = adjust_center_if_outside(mesh, center)
-            except Exception as e:
-                print(f"Error adjusting center for {field_name}: {e}")
-                continue
-
-            center = (center * SCALE).tolist()
+    field_data = {}
+    for field_name, summary in summaries.items():
+        try:
+            center = (np.array(summary['center']) * SCALE).tolist()
             
             # Calculate camera position
-            camera_pos = calculate_camera_position(mesh, center, global_center)
-            
-            field_data[field_name] = {
-                'center': center,
-                'camera_position': camera_pos
-            }
-            
-            pbar.update(1)
+            camera_pos = _camera_from_bounds(summary['bounds'], center, global_center)
+        except Exception as e:
+            logger.warning(f"Error placing camera for {field_name}: {e}")
+            continue
+        
+        field_data[field_name] = {
+            'center': center,
+            'camera_position': camera_pos
+        }
     
     return field_data
 
+def reservoir_sample_rows(n_rows, n_sample, seed=0, chunk_size=1_000_000):
+    """Uniform sample of row indices without replacement, in bounded memory.
+    
+    Every row draws a random key, chunk by chunk, and the n_sample smallest
+    keys seen so far are kept, so memory is O(n_sample + chunk_size) however
+    many rows there are.
+    
+    Args:
+        n_rows: Number of rows to sample from
+        n_sample: Number of rows to keep
+        seed: Seed of the random keys
+        chunk_size: Number of keys drawn at a time
+        
+    Returns:
+        Sorted array of sampled row indices
+    """
+    if n_sample >= n_rows:
+        return np.arange(n_rows)
+    
+    rng = np.random.default_rng(seed)
+    rows = np.empty(0, dtype=np.int64)
+    keys = np.empty(0)
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        rows = np.concatenate([rows, np.arange(start, stop)])
+        keys = np.concatenate([keys, rng.random(stop - start)])
+        if len(rows) > n_sample:
+            keep = np.argpartition(keys, n_sample)[:n_sample]
+            rows, keys = rows[keep], keys[keep]
+    return np.sort(rows)
+
+def voxel_downsample(points, n_target, chunk_size=1_000_000):
+    """Replace points by the centroid of each occupied voxel.
+    
+    The grid has about n_target cells, so at most n_target centroids are
+    returned. Points are read chunk_size at a time and the per-voxel sums
+    are merged as they come, so memory is bounded by the occupied voxels.
+    
+    Args:
+        points: Nx3 array of point coordinates (may be memory-mapped)
+        n_target: Upper bound on the number of representative points
+        chunk_size: Number of points processed at a time
+        
+    Returns:
+        Mx3 array of voxel centroids, M <= n_target
+    """
+    min_coords = np.full(3, np.inf)
+    max_coords = np.full(3, -np.inf)
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+        min_coords = np.minimum(min_coords, chunk.min(axis=0))
+        max_coords = np.maximum(max_coords, chunk.max(axis=0))
+    
+    grid_size = max(1, int(n_target ** (1 / 3)))
+    cell_size = (max_coords - min_coords) / grid_size
+    cell_size[cell_size == 0] = 1.0
+    
+    keys = np.empty(0, dtype=np.int64)
+    sums = np.empty((0, 3))
+    counts = np.empty(0, dtype=np.int64)
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+        cells = np.clip(np.floor((chunk - min_coords) / cell_size).astype(np.int64), 0, grid_size - 1)
+        chunk_keys = np.ravel_multi_index(cells.T, (grid_size,) * 3)
+        
+        # Merge this chunk's voxels into the running sums
+        keys, inverse = np.unique(np.concatenate([keys, chunk_keys]), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        merged_sums = np.zeros((len(keys), 3))
+        merged_counts = np.zeros(len(keys), dtype=np.int64)
+        old, new = inverse[:len(sums)], inverse[len(sums):]
+        merged_sums[old] += sums
+        merged_counts[old] += counts
+        np.add.at(merged_sums, new, chunk)
+        merged_counts += np.bincount(new, minlength=len(keys))
+        sums, counts = merged_sums, merged_counts
+    
+    return sums / counts[:, None]
+
+FULL_MESH_SAMPLING = ('reservoir', 'voxel')
+
 @cache
 def WriteFullMesh(
     ALPHA = 3,
-    SAMPLE_PERCENT = 5  # Percentage of points to sample (1 = 1%)
+    SAMPLE_PERCENT = 5,  # Percentage of points to sample (1 = 1%)
+    MESH_ENGINE = 'delaunay',
+    SAMPLING = 'reservoir',  # 'reservoir' (uniform sample) or 'voxel' (one centroid per occupied voxel)
+    SEED = 0
 ):
     """Generate a mesh for the entire point cloud.
     
+    Points are read from the memory-mapped embedding coordinates, never from
+    the embedding dictionary, so memory is bounded by the sample size: a
+    uniform reservoir sample of the rows, or the centroids of a voxel grid
+    with as many cells as the sample would have points.
+    
     Args:
         ALPHA: Alpha value for alphashape algorithm (higher = looser fit)
         SAMPLE_PERCENT: Percentage of points to randomly sample (1 = 1%)
+        MESH_ENGINE: One of MESH_ENGINES ('voxel' uses every point and ignores ALPHA and SAMPLE_PERCENT)
+        SAMPLING: One of FULL_MESH_SAMPLING
+        SEED: Seed of the reservoir sample
     """
     from . import project_vectors
-    import shapely
     
-    # Get embedding and valid paper IDs
-    embedding = project_vectors.GetUmapEmbedding()
-    paper_ids = sorted(embedding)
-
-    print('Total points:', len(paper_ids))
+    if SAMPLING not in FULL_MESH_SAMPLING:
+        raise ValueError(f"Unknown sampling {SAMPLING!r}, expected one of {FULL_MESH_SAMPLING}")
+    
+    outd = DATA_FOLDER / 'static' / 'field_meshes'
+    outd.mkdir(exist_ok=True)
     
-    # Sample paper IDs first
-    n_sample = int(len(paper_ids) * SAMPLE_PERCENT / 100)
-    sampled_ids = sample(paper_ids, n_sample)
-    print(f'Sampling {n_sample} points ({SAMPLE_PERCENT}%)')
+    _, coords = project_vectors.LoadUmapEmbeddingArrays()
     
-    # Only create points array for sampled IDs
-    points = [embedding[pid] for pid in sampled_ids]
-
-    # Remove variables that are no longer needed
-    del embedding, paper_ids, sampled_ids
-    gc.collect()
+    if MESH_ENGINE == 'voxel':
+        # Every point, streamed from the memory-mapped embedding
+        hull = voxel_mesh(coords)
+        with open(outd / "full.stl", 'wb') as outf:
+            outf.write(trimesh.exchange.export.export_stl(hull))
+        _write_mesh_summary("full", mesh_summary(hull))
+        return "full"
+    
+    print('Total points:', len(coords))
+    
+    n_sample = int(len(coords) * SAMPLE_PERCENT / 100)
+    if SAMPLING == 'voxel':
+        points = voxel_downsample(coords, n_sample)
+        print(f'Downsampled to {len(points)} voxel centroids (at most {SAMPLE_PERCENT}%)')
+    else:
+        # Rows are gathered in ascending order, so the memmap is read sequentially
+        points = np.asarray(coords[reservoir_sample_rows(len(coords), n_sample, SEED)], dtype=np.float64)
+        print(f'Sampling {n_sample} points ({SAMPLE_PERCENT}%)')
     
     # Generate mesh from points
-    hull = alphashape.alphashape(points, ALPHA)
+    hull = _alpha_shape_mesh(points, ALPHA, MESH_ENGINE)
     
     print('Hull type:', type(hull))
     
-    outd = DATA_FOLDER / 'static' / 'field_meshes'
-    outd.mkdir(exist_ok=True)
-    
     with open(outd / "full.stl", 'wb') as outf:
         outf.write(trimesh.exchange.export.export_stl(hull))
+    _write_mesh_summary("full", mesh_summary(hull))
     
     return "full"
 
+# Level-of-detail export: fraction of the faces kept at each level (level 0 is
+# the full mesh), the smallest face count worth a level, and position bits
+MESH_LOD_RATIOS = (1.0, 0.25, 0.05)
+MESH_LOD_MIN_FACES = 500
+MESH_QUANTIZE_BITS = 16
+
+# glTF constants
+_GLB_MAGIC = 0x46546C67
+_GLB_JSON = 0x4E4F534A
+_GLB_BIN = 0x004E4942
+_GL_BYTE = 5120
+_GL_UNSIGNED_SHORT = 5123
+_GL_UNSIGNED_INT = 5125
+_GL_ARRAY_BUFFER = 34962
+_GL_ELEMENT_ARRAY_BUFFER = 34963
+
+def _cluster_decimate(mesh, face_count):
+    """Vertex-clustering decimation, used when quadric decimation is unavailable.
+    
+    Vertices are merged on a grid whose cell size is searched so that the
+    result has at most face_count faces.
+    """
+    extent = float(np.max(mesh.extents)) or 1.0
+    low, high = 1, 1024
+    best = mesh
+    while low <= high:
+        cells = (low + high) // 2
+        keys = np.floor((mesh.vertices - mesh.bounds[0]) / (extent / cells)).astype(np.int64)
+        _, cluster, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        cluster = cluster.reshape(-1)
+        vertices = np.zeros((len(counts), 3))
+        np.add.at(vertices, cluster, mesh.vertices)
+        vertices /= counts[:, None]
+        faces = cluster[mesh.faces]
+        faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+        if len(faces) <= face_count:
+            best = trimesh.Trimesh(vertices=vertices, faces=faces)
+            low = cells + 1
+        else:
+            high = cells - 1
+    return best
+
+def decimate_mesh(mesh, face_count):
+    """Reduce a mesh to about face_count faces.
+    
+    Uses quadric error decimation (trimesh with fast_simplification), or
+    vertex clustering if that is not installed.
+    
+    Args:
+        mesh: trimesh.Trimesh to decimate
+        face_count: Target number of faces
+        
+    Returns:
+        Decimated trimesh.Trimesh
+    """
+    if face_count >= len(mesh.faces):
+        return mesh
+    try:
+        return mesh.simplify_quadric_decimation(face_count=face_count)
+    except ImportError:
+        logger.warning("fast_simplification is not installed, decimating by vertex clustering")
+        return _cluster_decimate(mesh, face_count)
+
+def mesh_to_glb(mesh, quantize_bits=MESH_QUANTIZE_BITS):
+    """Encode a mesh as indexed, quantized binary glTF.
+    
+    Positions are stored as unsigned integers on a uniform grid over the
+    mesh bounds (KHR_mesh_quantization); the node's scale and translation map
+    them back to embedding coordinates. Normals are stored as normalized
+    bytes, indices as 16-bit integers when the vertex count allows.
+    
+    Args:
+        mesh: trimesh.Trimesh to encode
+        quantize_bits: Bits per position component, at most 16
+        
+    Returns:
+        GLB file contents
+    """
+    import struct
+    
+    origin = mesh.bounds[0]
+    step = (float(np.max(mesh.extents)) or 1.0) / (2 ** quantize_bits - 1)
+    
+    # Vertex attributes are padded to 4-byte strides
+    positions = np.zeros((len(mesh.vertices), 4), dtype=np.uint16)
+    positions[:, :3] = np.round((mesh.vertices - origin) / step)
+    normals = np.zeros((len(mesh.vertices), 4), dtype=np.int8)
+    normals[:, :3] = np.round(np.clip(mesh.vertex_normals, -1, 1) * 127)
+    index_type = np.uint16 if len(mesh.vertices) < 2 ** 16 else np.uint32
+    indices = mesh.faces.astype(index_type).reshape(-1)
+    
+    views = []
+    blob = b''
+    for data, stride, target in [
+        (positions, 8, _GL_ARRAY_BUFFER),
+        (normals, 4, _GL_ARRAY_BUFFER),
+        (indices, None, _GL_ELEMENT_ARRAY_BUFFER),
+    ]:
+        view = {'buffer': 0, 'byteOffset': len(blob), 'byteLength': data.nbytes, 'target': target}
+        if stride:
+            view['byteStride'] = stride
+        views.append(view)
+        blob += data.tobytes()
+        blob += b'\0' * (-len(blob) % 4)
+    
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'KnowledgeCosmos'},
+        'extensionsUsed': ['KHR_mesh_quantization'],
+        'extensionsRequired': ['KHR_mesh_quantization'],
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0, 'scale': [step] * 3, 'translation': origin.tolist()}],
+        'meshes': [{'primitives': [{'attributes': {'POSITION': 0, 'NORMAL': 1}, 'indices': 2}]}],
+        'buffers': [{'byteLength': len(blob)}],
+        'bufferViews': views,
+        'accessors': [
+            {'bufferView': 0, 'componentType': _GL_UNSIGNED_SHORT, 'count': len(positions), 'type': 'VEC3',
+             'min': positions[:, :3].min(axis=0).tolist(), 'max': positions[:, :3].max(axis=0).tolist()},
+            {'bufferView': 1, 'componentType': _GL_BYTE, 'normalized': True, 'count': len(normals), 'type': 'VEC3'},
+            {'bufferView': 2, 'componentType': _GL_UNSIGNED_SHORT if index_type == np.uint16 else _GL_UNSIGNED_INT,
+             'count': len(indices), 'type': 'SCALAR'},
+        ],
+    }
+    header = json.dumps(gltf, separators=(',', ':')).encode()
+    header += b' ' * (-len(header) % 4)
+    
+    length = 12 + 8 + len(header) + 8 + len(blob)
+    return b''.join([
+        struct.pack('<III', _GLB_MAGIC, 2, length),
+        struct.pack('<II', len(header), _GLB_JSON), header,
+        struct.pack('<II', len(blob), _GLB_BIN), blob,
+    ])
+
+def _lod_manifest_path():
+    return DATA_FOLDER / 'static' / 'field_meshes' / 'lod' / 'manifest.json'
+
+def WriteMeshLODs(
+    LOD_RATIOS = MESH_LOD_RATIOS,
+    MIN_FACES = MESH_LOD_MIN_FACES,
+    QUANTIZE_BITS = MESH_QUANTIZE_BITS
+):
+    """Decimate every STL in static/field_meshes and export each level as GLB.
+    
+    Run after WriteFieldMeshes and WriteFullMesh. Level i keeps LOD_RATIOS[i]
+    of the faces; levels that would fall below MIN_FACES, or not shrink the
+    previous level, are dropped. Files are written to
+    static/field_meshes/lod/<name>_<level>.glb.
+    
+    Like WriteFieldMeshes, this is incremental rather than cached:
+    static/field_meshes/lod/manifest.json records, per mesh, the STL's
+    modification time and size, its field mesh fingerprint and the LOD
+    parameters. A mesh's levels are rewritten only when one of these changed
+    or a GLB is missing, and the levels of meshes whose STL is gone are
+    deleted.
+    
+    Args:
+        LOD_RATIOS: Fraction of the original faces kept at each level, decreasing
+        MIN_FACES: Smallest face count of a decimated level
+        QUANTIZE_BITS: Bits per quantized position component
+        
+    Returns:
+        Dictionary mapping mesh names to their levels: url, faces, vertices and bytes
+    """
+    mesh_dir = DATA_FOLDER / 'static' / 'field_meshes'
+    lod_dir = mesh_dir / 'lod'
+    lod_dir.mkdir(parents=True, exist_ok=True)
+    
+    lod_params = {'LOD_RATIOS': list(LOD_RATIOS), 'MIN_FACES': MIN_FACES, 'QUANTIZE_BITS': QUANTIZE_BITS}
+    mesh_manifest = _load_mesh_manifest()
+    try:
+        with open(_lod_manifest_path()) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    
+    def save_manifest():
+        tmp = _lod_manifest_path().with_suffix('.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, _lod_manifest_path())
+    
+    stl_files = sorted(mesh_dir.glob('*.stl'))
+    
+    # Drop the levels of meshes whose STL is gone
+    current = {stl_file.stem for stl_file in stl_files}
+    removed = [name for name in manifest if name not in current]
+    for name in removed:
+        _remove_mesh_lods(name, lod_dir)
+        del manifest[name]
+    if removed:
+        save_manifest()
+    
+    lods = {}
+    stl_bytes = glb_bytes = 0
+    written = 0
+    for stl_file in tqdm(stl_files, desc="Writing mesh LODs"):
+        name = stl_file.stem
+        stat = stl_file.stat()
+        source_info = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'fingerprint': mesh_manifest.get(name, {}).get('fingerprint'),
+        }
+        entry = manifest.get(name, {})
+        up_to_date = (
+            entry.get('source') == source_info
+            and entry.get('params') == lod_params
+            and all((lod_dir / f"{name}_{i}.glb").exists() for i in range(len(entry.get('levels') or [])))
+        )
+        
+        if not up_to_date:
+            _remove_mesh_lods(name, lod_dir)
+            source = trimesh.load(stl_file)
+            levels = None
+            if isinstance(source, trimesh.Trimesh) and len(source.faces):
+                levels = []
+                for ratio in LOD_RATIOS:
+                    face_count = int(len(source.faces) * ratio)
+                    if levels and (face_count < MIN_FACES or face_count >= levels[-1]['faces']):
+                        continue
+                    lod = decimate_mesh(source, face_count)
+                    
+                    glb = mesh_to_glb(lod, QUANTIZE_BITS)
+                    glb_name = f"{name}_{len(levels)}.glb"
+                    with open(lod_dir / glb_name, 'wb') as outf:
+                        outf.write(glb)
+                    
+                    levels.append({
+                        'url': f"field_meshes/lod/{glb_name}",
+                        'faces': len(lod.faces),
+                        'vertices': len(lod.vertices),
+                        'bytes': len(glb),
+                    })
+            entry = {'source': source_info, 'params': lod_params, 'levels': levels}
+            manifest[name] = entry
+            save_manifest()
+            written += 1
+        
+        # Meshes that are empty or not a single Trimesh have no levels
+        if entry['levels'] is None:
+            continue
+        stl_bytes += stat.st_size
+        glb_bytes += sum(level['bytes'] for level in entry['levels'])
+        lods[name] = entry['levels']
+    
+    logger.info(f"Wrote LODs for {written} of {len(lods)} meshes: {stl_bytes / 1e6:.1f} MB of STL, "
+                f"{glb_bytes / 1e6:.1f} MB of GLB over all levels")
+    return lods
+
 if __name__ == '__main__':
-    #WriteFieldMeshes.make(force=True, overwrite=False)
+    #WriteFieldMeshes(overwrite=False)
     #GetFieldCenters.make(force=True)
     WriteFullMesh.make(force=True)
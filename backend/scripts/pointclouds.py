@@ -8,22 +8,221 @@ import numpy as np
 __all__ = [
     'ConvertPotree',
     'ConvertPotreeAll',
+    'ExportProfileSizes',
+    'EXPORT_PROFILES',
     'ProduceTopLevelPointCloud',
-    'ProduceFieldPointClouds'
+    'ProduceFieldPointClouds',
+    'ProduceYearPartitionedPointClouds',
+    'GetPointAttributes',
+    'LoadPointAttributes'
 ]
 
-def ConvertPotree(input_las_path):
-    """Convert LAS file to Potree format for web visualization"""
+# Number of points written per batch by the streaming LAS writer
+LAS_CHUNK_SIZE = 1_000_000
+
+# Embedding units to LAS units
+COORDINATE_SCALE = 100
+
+# Attributes the viewer reads: position, color, classification (field filters),
+# point source id (year slider), mag_id (paper picking) and field_code (field
+# intersection filters)
+VIEWER_ATTRIBUTES = ('position', 'rgb', 'classification', 'point source id', 'mag_id', 'field_code')
+
+# Extra dimensions only some LAS files have: field_code is written to the
+# intersections cloud alone, since its codes overflow the 5-bit classification
+OPTIONAL_ATTRIBUTES = ('field_code',)
+
+# Export profiles: LAS point format, coordinate quantization (LAS units are
+# embedding units x COORDINATE_SCALE) and the Potree attributes kept
+EXPORT_PROFILES = {
+    # Every LAS dimension at 0.001 precision, as written before export profiles existed
+    'full': {
+        'point_format': 3,
+        'coordinate_scale': 0.001,
+        'attributes': None,
+    },
+    # Only what the viewer reads. Not a compact encoding: positions are still
+    # int32 (0.01 is precision, it saves no bytes) and years full uint16; the
+    # savings over 'full' come from dropping GPS time and unused attributes
+    'viewer': {
+        'point_format': 2,
+        'coordinate_scale': 0.01,
+        'attributes': VIEWER_ATTRIBUTES,
+    },
+}
+DEFAULT_EXPORT_PROFILE = 'viewer'
+
+# LAS VLR recording the export profile a file was written with
+PROFILE_VLR_USER_ID = 'KnowledgeCosmos'
+PROFILE_VLR_RECORD_ID = 1
+
+# Potree attribute sizes in bytes
+POTREE_ATTRIBUTE_SIZES = {
+    'position': 12,
+    'rgb': 6,
+    'classification': 1,
+    'point source id': 2,
+    'user data': 1,
+    'mag_id': 4,
+    'field_code': 2,
+}
+
+# Limits for the PotreeConverter job pool
+POTREE_TIMEOUT = 2 * 60 * 60  # seconds per conversion
+POTREE_JOB_MEMORY = 4 * 2**30  # bytes reserved per concurrent conversion
+POTREE_JOB_THREADS = 4  # cores each PotreeConverter process keeps busy
+
+# Potree backends: 'potreeconverter' runs the external POTREE_CONVERTER binary,
+# 'native' builds the octree in-process with potree.BuildPotreeOctree
+POTREE_BACKENDS = ('potreeconverter', 'native')
+DEFAULT_POTREE_BACKEND = 'potreeconverter' if POTREE_CONVERTER else 'native'
+
+# LAS input directory -> static Potree output directory
+POTREE_OUTPUT_DIRS = {
+    'potrees': 'pointclouds',
+    'potrees_independent': 'pointclouds_independent',
+    'potrees_years': 'pointclouds_years',
+}
+
+def _potree_output_path(input_las_path):
+    """Potree output directory of a LAS file"""
+    input_las_path = Path(input_las_path)
+    output_dir = DATA_FOLDER / 'static' / POTREE_OUTPUT_DIRS.get(input_las_path.parent.name, 'pointclouds')
+    return output_dir / input_las_path.stem
+
+def _directory_size(path):
+    """Total size in bytes of the files below path"""
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+
+def _las_fingerprint(las_path, chunk_size=LAS_CHUNK_SIZE):
+    """
+    Content fingerprint of a LAS file: point count, bounds and a hash of the point records
+
+    The header timestamp and software fields are left out, so rewriting
+    identical points gives an identical fingerprint.
+    """
+    import hashlib
+
+    digest = hashlib.blake2b(digest_size=20)
+    with laspy.open(las_path) as reader:
+        header = reader.header
+        for points in reader.chunk_iterator(chunk_size):
+            digest.update(points.array.tobytes())
+
+        return {
+            'point_count': int(header.point_count),
+            'point_format': int(header.point_format.id),
+            'mins': [float(v) for v in header.mins],
+            'maxs': [float(v) for v in header.maxs],
+            'scales': [float(v) for v in header.scales],
+            'offsets': [float(v) for v in header.offsets],
+            'extra_dims': list(header.point_format.extra_dimension_names),
+            'records': digest.hexdigest(),
+        }
+
+def _las_export_profile(las_path):
+    """Name of the export profile a LAS file was written with ('full' if it predates profiles)"""
+    with laspy.open(las_path) as reader:
+        for vlr in reader.header.vlrs:
+            if vlr.user_id == PROFILE_VLR_USER_ID and vlr.record_id == PROFILE_VLR_RECORD_ID:
+                return vlr.record_data.decode().strip('\x00')
+    return 'full'
+
+def ExportProfileSizes():
+    """
+    Bytes per point of each export profile
+
+    Returns:
+        Dictionary mapping profile names to the LAS record size and the Potree
+        record size in bytes (the 'full' Potree size counts every LAS dimension;
+        OPTIONAL_ATTRIBUTES are not counted)
+    """
+    sizes = {}
+    for name, profile in EXPORT_PROFILES.items():
+        las_bytes = laspy.PointFormat(profile['point_format']).size + POTREE_ATTRIBUTE_SIZES['mag_id']
+        if profile['attributes'] is None:
+            potree_bytes = las_bytes
+        else:
+            potree_bytes = sum(
+                POTREE_ATTRIBUTE_SIZES[a] for a in profile['attributes'] if a not in OPTIONAL_ATTRIBUTES
+            )
+        sizes[name] = {'las_bytes_per_point': las_bytes, 'potree_bytes_per_point': potree_bytes}
+    return sizes
+
+def _fingerprint_path(output_path):
+    """Fingerprint file stored next to a Potree output directory"""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + '.fingerprint.json')
+
+def _potree_up_to_date(output_path, fingerprint):
+    """Whether output_path holds a conversion of a LAS file with this fingerprint"""
+    import json
+
+    fingerprint_path = _fingerprint_path(output_path)
+    if not fingerprint_path.exists() or not (Path(output_path) / 'metadata.json').exists():
+        return False
+    try:
+        with open(fingerprint_path) as f:
+            return json.load(f) == fingerprint
+    except (OSError, ValueError):
+        return False
+
+def ConvertPotree(input_las_path, timeout=POTREE_TIMEOUT, skip_unchanged=True, backend=None, sampling='poisson'):
+    """
+    Convert LAS file to Potree format for web visualization
+
+    The converter's stdout and stderr are kept in DATA_FOLDER/logs/potree.
+    A fingerprint of the LAS contents is stored next to the output as
+    <name>.fingerprint.json, and the conversion is skipped when the LAS file
+    still matches it.
+
+    Only the attributes of the export profile the LAS file was written with
+    are kept.
+
+    Args:
+        input_las_path: LAS file to convert
+        timeout: Seconds after which the converter is killed (external converter only)
+        skip_unchanged: If False, convert even when the fingerprint matches
+        backend: One of POTREE_BACKENDS (defaults to DEFAULT_POTREE_BACKEND)
+        sampling: LOD sampling of the native backend, 'poisson' or 'random'
+
+    Returns:
+        Dictionary with the output path, log path, conversion time in seconds,
+        output size in bytes, bytes per point, export profile and whether the
+        conversion was skipped
+
+    Raises:
+        subprocess.CalledProcessError: If the converter fails
+        subprocess.TimeoutExpired: If the converter runs past the timeout
+    """
+    import subprocess
+
+    backend = backend or DEFAULT_POTREE_BACKEND
+    if backend not in POTREE_BACKENDS:
+        raise ValueError(f"Unknown Potree backend {backend!r}, expected one of {POTREE_BACKENDS}")
+
     input_las_path = Path(input_las_path)
 
     # Create output directory
-    if input_las_path.parent.name == 'potrees_independent':
-        output_dir = DATA_FOLDER / 'static' / 'pointclouds_independent'
-    else:
-        output_dir = DATA_FOLDER / 'static' / 'pointclouds'
-    
-    output_dir.mkdir(exist_ok=True)
-    output_path = output_dir / input_las_path.stem
+    output_path = _potree_output_path(input_las_path)
+    output_path.parent.mkdir(exist_ok=True)
+
+    log_dir = DATA_FOLDER / 'logs' / 'potree'
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_path = log_dir / f"{input_las_path.parent.name}_{input_las_path.stem}.log"
+
+    profile_name = _las_export_profile(input_las_path)
+    profile = EXPORT_PROFILES[profile_name]
+
+    start = time()
+    fingerprint = _las_fingerprint(input_las_path)
+
+    # Optional attributes are only requested from files that have them
+    attributes = profile['attributes']
+    if attributes is not None:
+        attributes = tuple(
+            a for a in attributes if a not in OPTIONAL_ATTRIBUTES or a in fingerprint['extra_dims']
+        )
 
     # Potree converter command
     args = (
@@ -32,9 +231,105 @@ def ConvertPotree(input_las_path):
         '-o', 
         str(output_path),
     )
+    if attributes is not None:
+        args += ('--attributes',) + attributes
+    fingerprint['backend'] = backend if backend != 'native' else f"native:{sampling}"
+    fingerprint['profile'] = profile_name
+    skipped = skip_unchanged and _potree_up_to_date(output_path, fingerprint)
+
+    if skipped:
+        logger.debug(f"{input_las_path} unchanged since last conversion, skipping")
+    else:
+        import json
+
+        # Drop the stale fingerprint first, so a failed run is never mistaken for current output
+        _fingerprint_path(output_path).unlink(missing_ok=True)
+        with open(log_path, 'w') as log:
+            if backend == 'native':
+                from . import potree
+                stats = potree.BuildPotreeOctree(
+                    input_las_path, output_path, sampling=sampling,
+                    attributes=attributes
+                )
+                log.write(f"Built {stats['nodes']} nodes, {stats['points']} points, depth {stats['depth']}\n")
+            else:
+                subprocess.run(args, check=True, stdout=log, stderr=subprocess.STDOUT, timeout=timeout)
+        with open(_fingerprint_path(output_path), 'w') as f:
+            json.dump(fingerprint, f, indent=2)
 
-    import subprocess
-    subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    octree_file = output_path / 'octree.bin'
+    octree_bytes = octree_file.stat().st_size if octree_file.exists() else 0
+    return {
+        'output': str(output_path),
+        'log': str(log_path),
+        'seconds': time() - start,
+        'bytes': _directory_size(output_path),
+        'bytes_per_point': octree_bytes / max(fingerprint['point_count'], 1),
+        'profile': profile_name,
+        'skipped': skipped,
+    }
+
+def _potree_job_limit(max_jobs=None, job_memory=POTREE_JOB_MEMORY, job_threads=POTREE_JOB_THREADS):
+    """
+    Number of PotreeConverter processes to run at once
+
+    Bounded by the available cores (each converter is itself multi-threaded)
+    and by the available physical memory.
+    """
+    limit = max(1, (os.cpu_count() or 1) // job_threads)
+    try:
+        available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        limit = min(limit, max(1, available // job_memory))
+    except (ValueError, OSError, AttributeError):
+        pass  # sysconf is unavailable on this platform
+
+    if max_jobs is not None:
+        limit = min(limit, max_jobs)
+    return max(1, int(limit))
+
+def _run_potree_jobs(las_files, max_jobs=None, timeout=POTREE_TIMEOUT, backend=None):
+    """
+    Convert LAS files concurrently with a bounded pool of PotreeConverter processes
+
+    Every file is attempted; failures are reported together once all jobs finished.
+    The native backend converts one file at a time, since it already spreads
+    each octree over all cores.
+
+    Returns:
+        Dictionary mapping LAS paths to the ConvertPotree statistics of each job
+
+    Raises:
+        RuntimeError: If any conversion failed or timed out
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    # Start the largest files first so the pool drains evenly
+    las_files = sorted(las_files, key=lambda f: -Path(f).stat().st_size)
+    backend = backend or DEFAULT_POTREE_BACKEND
+    n_jobs = 1 if backend == 'native' else _potree_job_limit(max_jobs)
+    logger.info(f"Converting {len(las_files)} LAS files with {n_jobs} concurrent jobs")
+
+    results, failures = {}, {}
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        futures = {executor.submit(ConvertPotree, f, timeout=timeout, backend=backend): f for f in las_files}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Converting Potrees..."):
+            las_file = str(futures[future])
+            try:
+                results[las_file] = future.result()
+                logger.debug(
+                    f"Converted {las_file} in {results[las_file]['seconds']:.1f}s "
+                    f"({results[las_file]['bytes'] / 2**20:.1f} MiB)"
+                )
+            except Exception as e:
+                failures[las_file] = e
+                logger.error(f"Potree conversion of {las_file} failed: {e}")
+
+    if failures:
+        raise RuntimeError(
+            f"{len(failures)} Potree conversions failed (logs in {DATA_FOLDER / 'logs' / 'potree'}): "
+            + ", ".join(failures)
+        )
+    return results
 
 # Color options for visualization
 COLOR_OPTIONS = [
@@ -64,8 +359,24 @@ def _convert_color_channel(values):
     return np.clip(values * 255, 0, 255).astype(np.uint8)
 
 @cache
-def ConvertPotreeAll():
-    """Convert all LAS files in potrees directory to Potree format (top-level fields only)"""
+def ConvertPotreeAll(MAX_JOBS=None, TIMEOUT=POTREE_TIMEOUT, BACKEND=None):
+    """
+    Convert all LAS files in potrees directory to Potree format (top-level fields only)
+
+    Conversions run concurrently, limited by available cores and memory.
+    Files whose contents match the fingerprint of their last conversion are
+    skipped, so only the point clouds that changed are reconverted.
+
+    Args:
+        MAX_JOBS: Upper bound on concurrent PotreeConverter processes
+        TIMEOUT: Seconds after which a single conversion is killed
+        BACKEND: One of POTREE_BACKENDS (defaults to DEFAULT_POTREE_BACKEND)
+
+    Returns:
+        Dictionary with the per-file conversion statistics ('jobs': time,
+        output size, log path and whether it was skipped), the total output
+        size and the number of skipped files
+    """
     from . import fields
     
     # Get field information
@@ -76,117 +387,339 @@ def ConvertPotreeAll():
     input_dir_1 = DATA_FOLDER / 'potrees'
     input_dir_2 = DATA_FOLDER / 'potrees_independent'
 
-    # Helper to safely convert a file
-    def _convert_safe(filename):
-        if Path(filename).exists():
-            ConvertPotree(filename)
-
-    # Process each top-level field
-    for field_id in tqdm(top_level, desc="Converting Potrees..."):
+    # Each top-level field, then the full point clouds
+    candidates = []
+    for field_id in top_level:
         if field_id not in field_names:
             continue
         
         field_name = field_names[field_id]
-        _convert_safe(input_dir_1 / f"{field_name}.las")
-        _convert_safe(input_dir_2 / f"{field_name}.las")
+        candidates.append(input_dir_1 / f"{field_name}.las")
+        candidates.append(input_dir_2 / f"{field_name}.las")
         
-    # Convert the full point clouds
-    _convert_safe(input_dir_1 / 'full.las')
-    _convert_safe(input_dir_1 / 'full_with_intersections.las')
+    candidates.append(input_dir_1 / 'full.las')
+    candidates.append(input_dir_1 / 'full_with_intersections.las')
+
+    jobs = _run_potree_jobs(
+        [f for f in candidates if f.exists()],
+        max_jobs=MAX_JOBS,
+        timeout=TIMEOUT,
+        backend=BACKEND
+    )
 
-    return "Success"
+    return {
+        'jobs': jobs,
+        'total_bytes': sum(job['bytes'] for job in jobs.values()),
+        'total_seconds': sum(job['seconds'] for job in jobs.values()),
+        'skipped': sum(job['skipped'] for job in jobs.values()),
+    }
 
-@cache
-def ProduceTopLevelPointCloud():
-    """Generate point cloud of all papers in top-level embedding, colored by position"""
-    from . import project_vectors, MAG
+def _coordinate_bounds(coords, chunk_size=LAS_CHUNK_SIZE):
+    """Per-axis min and max of a (possibly memory-mapped) Nx3 array, one chunk at a time"""
+    mins = np.full(3, np.inf)
+    maxs = np.full(3, -np.inf)
+    for start in range(0, len(coords), chunk_size):
+        chunk = np.asarray(coords[start:start+chunk_size], dtype=np.float64)
+        mins = np.minimum(mins, chunk.min(axis=0))
+        maxs = np.maximum(maxs, chunk.max(axis=0))
+    return mins, maxs
+
+def _year_table(paper_years):
+    """Sorted (MAG IDs, years) arrays for vectorized year lookups"""
+    ids = np.fromiter(paper_years.keys(), dtype=np.int64, count=len(paper_years))
+    years = np.fromiter(paper_years.values(), dtype=np.int64, count=len(paper_years))
+    order = np.argsort(ids)
+    return ids[order], years[order].astype(np.uint16)
+
+def _lookup_years(year_table, paper_ids):
+    """Years of the given MAG IDs, 0 where unknown"""
+    ids, years = year_table
+    if not len(ids):
+        return np.zeros(len(paper_ids), dtype=np.uint16)
+    paper_ids = np.asarray(paper_ids, dtype=np.int64)
+    idx = np.minimum(np.searchsorted(ids, paper_ids), len(ids) - 1)
+    return np.where(ids[idx] == paper_ids, years[idx], 0).astype(np.uint16)
+
+def _position_colors(point_coordinates, mins, maxs, rng):
+    """
+    Color channels from position, with noise for visual distinction
 
-    # Get embedding and valid paper IDs
-    embedding = project_vectors.GetUmapEmbedding()
-    paper_years = MAG.GetYears()
+    Each axis is normalized to 0-255 against the global bounds, shifted by
+    uniform noise in [-25, 25) and renormalized over that known range, then
+    compressed into the upper half of the range.
 
-    # Setup output directory
-    output_dir = DATA_FOLDER / 'potrees'
-    output_dir.mkdir(exist_ok=True)
-    
-    # Filter papers in both MAG and embedding
-    paper_ids = set(embedding)
+    Returns: (N, 3) array of channel values derived from x, y and z
+    """
+    span = np.where(maxs > mins, maxs - mins, 1)
+    normalized = 255 * (point_coordinates - mins) / span
+    noisy = normalized - 25 + 50 * rng.random(point_coordinates.shape)
+    noisy = 255 * (noisy + 25) / 305
+    return 255/2 + noisy/2
 
-    # Extract 3D coordinates
-    x_coords, y_coords, z_coords = (
-        np.array([embedding[paper_id][i]*100 for paper_id in paper_ids])
-        for i in range(3)
-    )
-    
-    # Convert to integers
-    paper_ids_int = [int(x) for x in paper_ids]
-
-    # Combine coordinates
-    point_coordinates = np.hstack((
-        x_coords.reshape((-1, 1)), 
-        y_coords.reshape((-1, 1)), 
-        z_coords.reshape((-1, 1))
-    ))
+def _write_las_chunked(output_path, header, n_points, fill_chunk, chunk_size=LAS_CHUNK_SIZE):
+    """
+    Stream points to a LAS file in fixed-size batches
 
-    del x_coords, y_coords, z_coords
+    The header must already carry the point format, scales, offsets and any
+    extra dimensions; bounds and point counts are filled in by laspy as
+    batches are written.
 
-    # Create LAS header
-    header = laspy.LasHeader(point_format=3, version="1.2")
-    header.offsets = np.min(point_coordinates, axis=0)
-    header.scales = np.array([0.001, 0.001, 0.001])
+    Args:
+        output_path: Destination LAS file
+        header: laspy.LasHeader for the file
+        n_points: Total number of points
+        fill_chunk: Callable (points, start, stop) that sets the dimensions of
+            a ScaleAwarePointRecord holding points start..stop
+        chunk_size: Number of points per batch
+    """
+    with laspy.open(output_path, mode='w', header=header) as writer:
+        for start in range(0, n_points, chunk_size):
+            stop = min(start + chunk_size, n_points)
+            points = laspy.ScaleAwarePointRecord.zeros(stop - start, header=header)
+            fill_chunk(points, start, stop)
+            writer.write_points(points)
+
+# Space-filling curves the LAS writer can order points along (None keeps the input order)
+POINT_ORDERS = {
+    'none': None,
+    'morton': 'morton_keys',
+    'hilbert': 'hilbert_keys',
+}
+DEFAULT_POINT_ORDER = 'morton'
+
+def _spatial_order(coords, point_order=DEFAULT_POINT_ORDER, chunk_size=LAS_CHUNK_SIZE):
+    """
+    Permutation sorting points along a space-filling curve through their bounding cube
 
-    las = laspy.LasData(header)
+    Keys are computed chunk by chunk on a 2**21 grid per axis, but the sort
+    itself is in memory: an N-length uint64 key array plus the int64
+    permutation, about 16 bytes per point (roughly 300 MB for 17M points,
+    more while argsort runs).
 
-    # Set coordinates
-    las.x = point_coordinates[:, 0]
-    las.y = point_coordinates[:, 1]
-    las.z = point_coordinates[:, 2]
+    Returns:
+        int64 permutation, or None for 'none'
+    """
+    if POINT_ORDERS[point_order] is None:
+        return None
+    from . import potree
+
+    key_of = getattr(potree, POINT_ORDERS[point_order])
+    mins, maxs = _coordinate_bounds(coords, chunk_size)
+    cube_min, cube_max = potree.cube_bounds(mins, maxs)
+
+    keys = np.empty(len(coords), dtype=np.uint64)
+    for start in range(0, len(coords), chunk_size):
+        chunk = np.asarray(coords[start:start+chunk_size], dtype=np.float64)
+        keys[start:start+chunk_size] = key_of(potree.grid_coordinates(chunk, cube_min, cube_max))
+    return np.argsort(keys, kind='stable')
+
+def _gather(column, rows):
+    """column[rows] for a (memory-mapped) column, reading the rows in ascending order"""
+    sorted_rows = np.sort(rows)
+    values = np.asarray(column[sorted_rows])
+    return values[np.searchsorted(sorted_rows, rows)]
+
+def _write_points_las(output_path, columns, mins=None, chunk_size=LAS_CHUNK_SIZE, profile=DEFAULT_EXPORT_PROFILE,
+                      point_order=DEFAULT_POINT_ORDER):
+    """
+    Write columnar point attributes to a LAS file in chunks
+
+    Args:
+        output_path: Destination LAS file
+        columns: Dictionary of equal-length arrays, in memory or memory-mapped:
+            coords (Nx3, embedding units), mag_id, year, rgb (Nx3) and
+            optionally classification, user_data and field_code (written to a
+            uint16 extra dimension)
+        mins: Scaled per-axis minimum used as header offsets (computed if None)
+        chunk_size: Number of points per batch
+        profile: Key of EXPORT_PROFILES, recorded in a VLR for ConvertPotree
+        point_order: Key of POINT_ORDERS; spatially close points are written
+            close together in the file
+
+    Only point_order='none' keeps peak memory at one chunk. A space-filling
+    curve order costs O(N) memory for the keys and permutation (see
+    _spatial_order), and each chunk is gathered from scattered rows of the
+    memory-mapped columns. That is the price of the better Potree locality;
+    pass 'none' where memory matters more.
+    """
+    export_profile = EXPORT_PROFILES[profile]
+    coords = columns['coords']
+    if mins is None:
+        mins, _ = _coordinate_bounds(coords, chunk_size)
+        mins = mins * COORDINATE_SCALE
+
+    # Create LAS header
+    header = laspy.LasHeader(point_format=export_profile['point_format'], version="1.2")
+    header.offsets = mins
+    header.scales = np.full(3, export_profile['coordinate_scale'])
+    header.vlrs.append(laspy.VLR(
+        user_id=PROFILE_VLR_USER_ID,
+        record_id=PROFILE_VLR_RECORD_ID,
+        description="Export profile",
+        record_data=profile.encode()
+    ))
 
     # Add paper ID dimension
-    las.add_extra_dim(laspy.ExtraBytesParams(
+    header.add_extra_dim(laspy.ExtraBytesParams(
         name="mag_id",
         type=np.uint32,
         description="MAG paper ID"
     ))
-    las.mag_id = paper_ids_int
-    
-    # Store year for filtering
-    las.point_source_id = [paper_years.get(pid, 0) for pid in paper_ids_int]
-    
-    # Color points by their position for better visualization
-    def normalize_to_255(x):
-        """Normalize to 0-255 range"""
-        return 255 * (x - x.min())/ (x.max()-x.min())
-    
-    # Add noise for visual distinction
-    noise = np.random.rand(len(paper_ids_int)+3)
-    
-    def add_noise_to_channel(x, channel_index):
-        """Add noise to color channel for better visualization"""
-        noisy_values = normalize_to_255(normalize_to_255(x) - 25 + 50*noise[channel_index:channel_index+len(x)])
-        return 255/2 + noisy_values/2
-
-    # Set RGB colors with noise for visual clarity
-    las.blue = add_noise_to_channel(point_coordinates[:, 0], 0)
-    las.red = add_noise_to_channel(point_coordinates[:, 1], 1)
-    las.green = add_noise_to_channel(point_coordinates[:, 2], 2)
-    
+    if 'field_code' in columns:
+        header.add_extra_dim(laspy.ExtraBytesParams(
+            name="field_code",
+            type=np.uint16,
+            description="Field / intersection"
+        ))
+
+    order = _spatial_order(coords, point_order, chunk_size)
+
+    def fill_chunk(points, start, stop):
+        if order is None:
+            chunk = lambda name: np.asarray(columns[name][start:stop])
+        else:
+            rows = order[start:stop]
+            chunk = lambda name: _gather(columns[name], rows)
+
+        point_coordinates = np.asarray(chunk('coords'), dtype=np.float64) * COORDINATE_SCALE
+        points.x = point_coordinates[:, 0]
+        points.y = point_coordinates[:, 1]
+        points.z = point_coordinates[:, 2]
+
+        points.mag_id = chunk('mag_id')
+
+        # Store year for filtering
+        points.point_source_id = chunk('year')
+
+        rgb = chunk('rgb')
+        points.red = rgb[:, 0]
+        points.green = rgb[:, 1]
+        points.blue = rgb[:, 2]
+
+        if 'classification' in columns:
+            points.classification = chunk('classification')
+        if 'user_data' in columns:
+            points.user_data = chunk('user_data')
+        if 'field_code' in columns:
+            points.field_code = chunk('field_code')
+
+    _write_las_chunked(output_path, header, len(coords), fill_chunk, chunk_size)
+
+@cache
+def ProduceTopLevelPointCloud(EXPORT_PROFILE=DEFAULT_EXPORT_PROFILE):
+    """
+    Generate point cloud of all papers in top-level embedding, colored by position
+
+    Points are streamed from the memory-mapped point attribute table in
+    LAS_CHUNK_SIZE batches. The default spatial point order still holds an
+    O(N) sort permutation (see _write_points_las).
+
+    Args:
+        EXPORT_PROFILE: Key of EXPORT_PROFILES
+    """
+    table = LoadPointAttributes()
+
+    # Setup output directory
+    output_dir = DATA_FOLDER / 'potrees'
+    output_dir.mkdir(exist_ok=True)
+
+    columns = {k: table[k] for k in ('coords', 'mag_id', 'year', 'rgb')}
+
     # Save and convert
     output_file = output_dir / f"full.las"
-    las.write(output_file)
+    _write_points_las(output_file, columns, mins=table['mins'], profile=EXPORT_PROFILE)
     ConvertPotree(output_file)
 
     return output_file
 
 DEFAULT_COLOR = (0.2, 0.2, 0.2, 0.5)
 
+def _order_subfields_greedy(similarity_matrix):
+    """
+    Chain subfields by always stepping to the most similar unvisited one
+
+    Args:
+        similarity_matrix: (k, k) row-normalized co-occurrence matrix
+
+    Returns: List of column indices, starting at 0
+    """
+    k = len(similarity_matrix)
+    order = [0]
+    processed = {0}
+    while len(order) < k:
+        similar_indices = np.argsort(similarity_matrix[order[-1]])[::-1]
+
+        # Find next most similar subfield not yet processed
+        for idx in similar_indices:
+            if idx not in processed:
+                order.append(int(idx))
+                processed.add(idx)
+                break
+    return order
+
+def _order_subfields_tsp(similarity_matrix, max_iterations=1000):
+    """
+    Open-path TSP ordering that keeps co-occurring subfields apart in the palette
+
+    Consecutive entries get neighbouring palette colors, so the path minimizes the
+    total similarity between consecutive subfields: subfields that share papers end
+    up on contrasting colors. Starts from a greedy least-similar chain and improves
+    it with vectorized 2-opt moves. The first subfield (the largest) stays first.
+
+    Args:
+        similarity_matrix: (k, k) row-normalized co-occurrence matrix
+        max_iterations: Maximum number of 2-opt moves
+
+    Returns: List of column indices, starting at 0
+    """
+    k = len(similarity_matrix)
+    if k < 3:
+        return list(range(k))
+
+    cost = (similarity_matrix + similarity_matrix.T) / 2
+
+    # Greedy initial path: step to the least similar unvisited subfield
+    path = [0]
+    visited = np.zeros(k, dtype=bool)
+    visited[0] = True
+    for _ in range(k - 1):
+        candidates = np.where(visited, np.inf, cost[path[-1]])
+        nxt = int(np.argmin(candidates))
+        path.append(nxt)
+        visited[nxt] = True
+    path = np.array(path)
+
+    # 2-opt: reversing path[i..j] replaces edges (i-1, i) and (j, j+1)
+    i_idx, j_idx = np.triu_indices(k, 1)
+    keep = i_idx >= 1
+    i_idx, j_idx = i_idx[keep], j_idx[keep]
+    for _ in range(max_iterations):
+        before, first, last = path[i_idx - 1], path[i_idx], path[j_idx]
+        has_after = j_idx + 1 < k
+        after = path[np.where(has_after, j_idx + 1, 0)]
+        delta = cost[before, last] - cost[before, first]
+        delta = delta + np.where(has_after, cost[first, after] - cost[last, after], 0)
+        best = int(np.argmin(delta))
+        if delta[best] >= -1e-12:
+            break
+        i, j = i_idx[best], j_idx[best]
+        path[i:j+1] = path[i:j+1][::-1]
+
+    return path.tolist()
+
+SUBFIELD_ORDERINGS = {
+    'greedy': _order_subfields_greedy,
+    'tsp': _order_subfields_tsp,
+}
+
 def _prepare_subfield_coloring(
     field_id,
     field_subfields_all,
     valid_paper_ids_in_field,
-    paper_to_fields_map,
-    field_to_papers_map,
-    use_similarity_ordering=False
+    membership,
+    use_similarity_ordering=False,
+    ordering='greedy',
+    palette=None
 ):
     """
     Process subfields for coloring and classification
@@ -195,84 +728,54 @@ def _prepare_subfield_coloring(
         field_id: Current top-level field ID
         field_subfields_all: All subfield IDs for this field
         valid_paper_ids_in_field: Paper IDs to include
-        paper_to_fields_map: Map {paper_id: set(subfield_ids)}
-        field_to_papers_map: Map {field_id: set(paper_ids)}
+        membership: FieldMembership index, used for the paper x subfield matrix
         use_similarity_ordering: If True, order by similarity, else by size
+        ordering: Similarity ordering to use, a key of SUBFIELD_ORDERINGS
+        palette: List of RGBA colors to label subfields with (defaults to COLOR_OPTIONS)
         
     Returns: Dict of coloring data or None if no valid subfields
     """
-    # Map papers to subfields
-    valid_subfield_papers = {sf: set() for sf in field_subfields_all}
-    valid_paper_to_subfields = {pid: set() for pid in valid_paper_ids_in_field}
-    
-    # Build paper-subfield relationships
-    for pid in valid_paper_ids_in_field:
-        pid_str = str(pid) 
-        if pid_str in paper_to_fields_map:
-            for sf in paper_to_fields_map[pid_str]:
-                if sf in valid_subfield_papers:
-                    valid_subfield_papers[sf].add(pid_str)
-                    valid_paper_to_subfields[pid_str].add(sf)
+    palette = COLOR_OPTIONS if palette is None else palette
+
+    # Sparse (papers x subfields) matrix, rows in valid_paper_ids_in_field order
+    rows = membership.lookup(valid_paper_ids_in_field)
+    all_subfields = list(dict.fromkeys(field_subfields_all))
+    sizes = np.asarray(membership.submatrix(rows, all_subfields).sum(axis=0)).ravel()
 
     # Filter subfields with papers
-    current_field_subfields = [sf for sf, pids in valid_subfield_papers.items() if pids]
+    current_field_subfields = [sf for sf, n in zip(all_subfields, sizes) if n]
     if not current_field_subfields:
         logger.warning(f"No subfields with valid papers for field {field_id}. Skipping.")
         return None
 
+    subfield_size = dict(zip(all_subfields, sizes))
+    paper_subfield_matrix = membership.submatrix(rows, current_field_subfields)
+
     # Sort by size and select top N
-    N_to_choose = len(COLOR_OPTIONS)
-    sorted_subfields_by_size = sorted(current_field_subfields, key=lambda sf: -len(valid_subfield_papers[sf]))
+    N_to_choose = len(palette)
+    sorted_subfields_by_size = sorted(current_field_subfields, key=lambda sf: -subfield_size[sf])
     
     # Determine ordering of subfields
     if use_similarity_ordering and len(sorted_subfields_by_size) > 1:
         # Use size for initial selection
         temp_labeled_subfields = sorted_subfields_by_size[:N_to_choose]
-        temp_labeled_subfield_set = set(temp_labeled_subfields)
-        
-        # Calculate similarity matrix
-        similarity_matrix = np.zeros((len(temp_labeled_subfields), len(temp_labeled_subfields)))
-        for pid in valid_paper_ids_in_field:
-            pid_str = str(pid)
-            paper_subs = valid_paper_to_subfields.get(pid_str, set())
-            subs_in_set = [sf for sf in paper_subs if sf in temp_labeled_subfield_set]
-            if len(subs_in_set) < 2: continue
-            
-            for i, subfield1 in enumerate(temp_labeled_subfields):
-                if subfield1 not in subs_in_set: continue
-                for j, subfield2 in enumerate(temp_labeled_subfields):
-                    if subfield2 not in subs_in_set: continue
-                    similarity_matrix[i, j] += 1
-                    if i != j: similarity_matrix[j, i] += 1
+        column = {sf: i for i, sf in enumerate(current_field_subfields)}
+        labeled = paper_subfield_matrix[:, [column[sf] for sf in temp_labeled_subfields]].astype(np.int64)
+
+        # Co-occurrence over papers with at least two labeled subfields. Off-diagonal pairs
+        # are counted from both sides, so they weigh double relative to the diagonal.
+        multi = np.flatnonzero(np.asarray(labeled.sum(axis=1)).ravel() >= 2)
+        labeled = labeled[multi]
+        co_occurrence = (labeled.T @ labeled).toarray().astype(float)
+        similarity_matrix = 2 * co_occurrence - np.diag(np.diag(co_occurrence))
         
         # Normalize similarity
         row_sums = similarity_matrix.sum(axis=1, keepdims=True)
         similarity_matrix = np.divide(similarity_matrix, row_sums, out=np.zeros_like(similarity_matrix), where=row_sums!=0)
         
         # Order by similarity
-        ordered_subfields = []
-        if temp_labeled_subfields:
-            ordered_subfields = [temp_labeled_subfields[0]]
-            processed = {temp_labeled_subfields[0]}
-            
-            while len(ordered_subfields) < len(temp_labeled_subfields):
-                last_subfield_id = ordered_subfields[-1]
-                last_subfield_idx = temp_labeled_subfields.index(last_subfield_id)
-                similar_subfield_indices = np.argsort(similarity_matrix[last_subfield_idx])[::-1]
-                
-                # Find next most similar subfield not yet processed
-                for idx in similar_subfield_indices:
-                    next_subfield = temp_labeled_subfields[idx]
-                    if next_subfield not in processed:
-                        ordered_subfields.append(next_subfield)
-                        processed.add(next_subfield)
-                        break
-                
-                # If we couldn't find next similar field, add remaining ones
-                if len(ordered_subfields) == len(processed):
-                    remaining = [sf for sf in temp_labeled_subfields if sf not in processed]
-                    ordered_subfields.extend(remaining)
-                    break
+        order = SUBFIELD_ORDERINGS[ordering](similarity_matrix)
+        ordered_subfields = [temp_labeled_subfields[i] for i in order]
         
         unlabeled_subfields = sorted_subfields_by_size[N_to_choose:]
     else:
@@ -285,8 +788,8 @@ def _prepare_subfield_coloring(
     # Assign colors - space colors evenly across the palette
     field_colors_for_field = {}
     for i, subfield in enumerate(ordered_subfields):
-        color_idx = int(i * len(COLOR_OPTIONS) / len(ordered_subfields)) if ordered_subfields else 0
-        field_colors_for_field[subfield] = COLOR_OPTIONS[color_idx]
+        color_idx = int(i * len(palette) / len(ordered_subfields)) if ordered_subfields else 0
+        field_colors_for_field[subfield] = palette[color_idx]
     
     # Default color for unlabeled
     for subfield in unlabeled_subfields:
@@ -299,8 +802,8 @@ def _prepare_subfield_coloring(
         subfield_classifications[subfield] = other_classification_code
 
     return {
-        'valid_subfield_papers': valid_subfield_papers,
-        'valid_paper_to_subfields': valid_paper_to_subfields,
+        'paper_subfield_matrix': paper_subfield_matrix,
+        'subfield_ids': current_field_subfields,
         'labeled_subfield_set': labeled_subfield_set,
         'ordered_subfields': ordered_subfields,
         'unlabeled_subfields': unlabeled_subfields,
@@ -365,97 +868,66 @@ def GenerateFieldIntersectionMapping():
 def _create_field_las(
     output_path,
     field_name,
-    valid_paper_ids_in_field,
-    embedding_map,
-    paper_years_map,
-    paper_coloring_data
+    field_points,
+    paper_coloring_data,
+    profile=DEFAULT_EXPORT_PROFILE
 ):
-    """Create and save LAS file for a field"""
-    
-    paper_ids_str = valid_paper_ids_in_field
-    paper_ids_int = [int(pid) for pid in paper_ids_str]
-
-    if not paper_ids_int:
-        logger.warning(f"No integer paper IDs for field {field_name}. Skipping.")
-        return False
+    """
+    Create and save LAS file for a field
 
-    # Extract coordinates
-    try:
-        point_coordinates = np.array([embedding_map[pid]*100 for pid in paper_ids_str])
-    except KeyError as e:
-        logger.error(f"KeyError accessing embedding for ID {e} in field {field_name}. Skipping.")
-        return False
-         
-    if point_coordinates.size == 0:
+    Args:
+        output_path: Destination LAS file
+        field_name: Name of the field
+        field_points: Point attribute columns (coords, mag_id, year) of the field's
+            papers, in the row order used for paper_coloring_data
+        paper_coloring_data: Output of _prepare_subfield_coloring
+        profile: Key of EXPORT_PROFILES
+    """
+    n_points = len(field_points['mag_id'])
+    if not n_points:
         logger.warning(f"Empty coordinates for field {field_name}. Skipping.")
         return False
 
-    # Create LAS header and data
-    header = laspy.LasHeader(point_format=3, version="1.2")
-    header.offsets = np.min(point_coordinates, axis=0)
-    header.scales = np.maximum(np.array([0.001, 0.001, 0.001]), 1e-9)
-    las = laspy.LasData(header)
-    
-    # Set coordinates
-    las.x = point_coordinates[:, 0]
-    las.y = point_coordinates[:, 1]
-    las.z = point_coordinates[:, 2]
-
-    # Add MAG ID
-    las.add_extra_dim(laspy.ExtraBytesParams(name="mag_id", type=np.uint32, description="MAG paper ID"))
-    las.mag_id = paper_ids_int
-
-    # Add year
-    las.point_source_id = [paper_years_map.get(pid_int, 0) for pid_int in paper_ids_int]
-
     # Get coloring data
-    labeled_subfield_set = paper_coloring_data['labeled_subfield_set']
     unlabeled_subfields = paper_coloring_data['unlabeled_subfields']
     field_colors = paper_coloring_data['field_colors_for_field']
     subfield_classifications = paper_coloring_data['subfield_classifications']
-    valid_paper_to_subfields = paper_coloring_data['valid_paper_to_subfields']
     ordered_subfields = paper_coloring_data['ordered_subfields']
     other_classification_code = paper_coloring_data['other_classification_code']
+    paper_subfield_matrix = paper_coloring_data['paper_subfield_matrix']
+    subfield_ids = paper_coloring_data['subfield_ids']
+
+    # Rank codes: 0..n-1 for labeled subfields in order, n for "other", n+1 for none
+    n_labeled = len(ordered_subfields)
+    other_rank, none_rank = n_labeled, n_labeled + 1
+    rank_of = {sf: i for i, sf in enumerate(ordered_subfields)}
+    unlabeled_set = set(unlabeled_subfields)
+    column_rank = np.array(
+        [rank_of.get(sf, other_rank if sf in unlabeled_set else none_rank) for sf in subfield_ids],
+        dtype=np.int64
+    )
 
-    # Prepare colors and classifications
-    colors_list = []
-    classifications_list = []
-
-    for paper_id_str in paper_ids_str:
-        # Get subfields for this paper
-        paper_subfields = valid_paper_to_subfields.get(paper_id_str, set())
-        paper_labeled_subfields = {sf for sf in paper_subfields if sf in labeled_subfield_set}
-        
-        # Default values
-        color = DEFAULT_COLOR
-        classification = 0
-
-        if paper_labeled_subfields:
-            # Choose earliest subfield in order
-            chosen_sf = min(paper_labeled_subfields, 
-                           key=lambda sf: ordered_subfields.index(sf) if sf in ordered_subfields else float('inf'))
-            color = field_colors[chosen_sf]
-            classification = subfield_classifications[chosen_sf]
-        elif paper_subfields & set(unlabeled_subfields):  # More efficient intersection
-            classification = other_classification_code
-        
-        colors_list.append(color)
-        classifications_list.append(classification)
+    # Each paper takes its minimum rank over its subfields (sparse-row reduction)
+    paper_rank = np.full(paper_subfield_matrix.shape[0], none_rank, dtype=np.int64)
+    indptr = paper_subfield_matrix.indptr
+    nonempty = np.diff(indptr) > 0
+    if nonempty.any():
+        paper_rank[nonempty] = np.minimum.reduceat(
+            column_rank[paper_subfield_matrix.indices], indptr[:-1][nonempty]
+        )
 
-    colors = np.array(colors_list)
-    classifications = np.array(classifications_list)
+    # Lookup tables indexed by rank
+    color_lut = np.array(
+        [field_colors[sf][:3] for sf in ordered_subfields] + [DEFAULT_COLOR[:3]] * 2
+    ).reshape(-1, 3)
+    color_lut = _convert_color_channel(color_lut)
+    classification_lut = np.array(
+        [subfield_classifications[sf] for sf in ordered_subfields] + [other_classification_code, 0],
+        dtype=np.uint8
+    )
 
-    # Set RGB colors
-    if colors.ndim == 2 and colors.shape[1] >= 3:
-        las.red = _convert_color_channel(colors[:, 0])
-        las.green = _convert_color_channel(colors[:, 1])
-        las.blue = _convert_color_channel(colors[:, 2])
-    else:
-        logger.warning(f"Unexpected color shape {colors.shape} for {field_name}. Using defaults.")
-        default_rgb = _convert_color_channel(np.array(DEFAULT_COLOR[:3]))
-        las.red = np.full(len(paper_ids_int), default_rgb[0], dtype=np.uint8)
-        las.green = np.full(len(paper_ids_int), default_rgb[1], dtype=np.uint8)
-        las.blue = np.full(len(paper_ids_int), default_rgb[2], dtype=np.uint8)
+    colors = color_lut[paper_rank]
+    classifications = classification_lut[paper_rank]
 
     # Add custom field to indicate field membership for intersection filtering
     # This will be the field's index in the top-level fields list (1-indexed)
@@ -468,16 +940,16 @@ def _create_field_las(
         field_index = top_fields.index(field_name) + 1  # 1-indexed
     except ValueError:
         field_index = 0  # Not a top-level field
-    
-    # We use user_data to store the field's classification code
-    las.user_data = np.full(len(paper_ids_int), field_index, dtype=np.uint8)
 
-    # Set classifications
-    las.classification = classifications
+    columns = dict(field_points)
+    columns['rgb'] = colors
+    columns['classification'] = classifications
+    # We use user_data to store the field's classification code
+    columns['user_data'] = np.full(n_points, field_index, dtype=np.uint8)
 
     # Save file
     try:
-        las.write(output_path)
+        _write_points_las(output_path, columns, profile=profile)
         logger.debug(f"Saved LAS file: {output_path}")
         return True
     except Exception as e:
@@ -485,26 +957,30 @@ def _create_field_las(
         return False
 
 @cache(ignore=['debug'])
-def ProduceFieldPointClouds(debug=False):
+def ProduceFieldPointClouds(debug=False, SUBFIELD_ORDERING='greedy', EXPORT_PROFILE=DEFAULT_EXPORT_PROFILE):
     """
     Generate field point clouds using GLOBAL embedding
     Colors based on subfield membership using SIMILARITY ordering
+
+    Args:
+        debug: If True, stop after the first field
+        SUBFIELD_ORDERING: 'greedy' chains similar subfields onto neighbouring colors,
+            'tsp' keeps co-occurring subfields on contrasting colors
+        EXPORT_PROFILE: Key of EXPORT_PROFILES
     """
-    from . import fields, project_vectors, MAG
+    from . import fields
 
     # Get field data
     field_names = fields.GetFieldNames(force_include=['Education'])
     top_level_ids = fields.GetTopLevel()
     subfields_map = fields.GetSubFields()
-    paper_to_fields = fields.PaperToFields()
-    field_to_papers = fields.FieldToPapers()
+    membership = fields.GetFieldMembership(MIN_PAPERS=1000)
 
     # Get global embedding
-    logger.info("Getting global UMAP embedding...")
-    global_embedding = project_vectors.GetUmapEmbedding()
-    logger.info(f"Retrieved global embedding for {len(global_embedding)} papers.")
-    
-    paper_years = MAG.GetYears()
+    logger.info("Getting global point attributes...")
+    point_attributes = LoadPointAttributes()
+    table_ids = np.asarray(point_attributes['ids'])
+    logger.info(f"Retrieved global embedding for {len(table_ids)} papers.")
 
     # Setup output directory
     output_dir = DATA_FOLDER / 'potrees'
@@ -516,20 +992,17 @@ def ProduceFieldPointClouds(debug=False):
     computed_fields = 0
 
     # Get fields to process
-    process_ids = set(top_level_ids) & set(field_names.keys()) & set(field_to_papers.keys()) & set(subfields_map.keys())
+    process_ids = set(top_level_ids) & set(field_names.keys()) & set(membership.field_index.keys()) & set(subfields_map.keys())
 
     for field_id in tqdm(process_ids, desc="Generating field point clouds (global embedding)"):
         field_name = field_names[field_id]
-        field_papers_all = field_to_papers[field_id]
         field_subfields_all = subfields_map[field_id]
 
         # Filter valid papers
-        global_embedding_keys_str = set(map(str, global_embedding.keys()))
-        valid_paper_ids_in_field = sorted(
-            set(map(str, field_papers_all)) & global_embedding_keys_str
-        )
+        rows = _table_rows(table_ids, membership.paper_ids_of(field_id))
+        valid_paper_ids_in_field = table_ids[rows]
 
-        if not valid_paper_ids_in_field:
+        if not len(valid_paper_ids_in_field):
             logger.warning(f"No valid papers with global embeddings for field {field_name}. Skipping.")
             continue
 
@@ -538,9 +1011,9 @@ def ProduceFieldPointClouds(debug=False):
             field_id=field_id,
             field_subfields_all=field_subfields_all,
             valid_paper_ids_in_field=valid_paper_ids_in_field,
-            paper_to_fields_map=paper_to_fields,
-            field_to_papers_map=field_to_papers,
-            use_similarity_ordering=True
+            membership=membership,
+            use_similarity_ordering=True,
+            ordering=SUBFIELD_ORDERING
         )
 
         if paper_coloring_data is None:
@@ -555,10 +1028,9 @@ def ProduceFieldPointClouds(debug=False):
         success = _create_field_las(
             output_path=output_las_path,
             field_name=field_name,
-            valid_paper_ids_in_field=valid_paper_ids_in_field,
-            embedding_map=global_embedding,
-            paper_years_map=paper_years,
-            paper_coloring_data=paper_coloring_data
+            field_points=_take_points(point_attributes, rows),
+            paper_coloring_data=paper_coloring_data,
+            profile=EXPORT_PROFILE
         )
 
         if success:
@@ -572,20 +1044,22 @@ def ProduceFieldPointClouds(debug=False):
     return final_field_colors, final_field_orders
 
 @cache
-def ProduceFieldPointCloudsIndependently(debug=False):
+def ProduceFieldPointCloudsIndependently(debug=False, EXPORT_PROFILE=DEFAULT_EXPORT_PROFILE):
     """
     Generate field point clouds using separate UMAP embeddings for each field
     Colors based on subfield membership using size ordering
+
+    Args:
+        debug: If True, stop after the first field
+        EXPORT_PROFILE: Key of EXPORT_PROFILES
     """
     from . import fields, project_vectors, MAG
 
     # Get field data
     field_names = fields.GetFieldNames()
-    top_level_ids = fields.GetTopLevel()
     subfields_map = fields.GetSubFields()
-    paper_to_fields = fields.PaperToFields()
-    field_to_papers = fields.FieldToPapers()
-    paper_years = MAG.GetYears()
+    membership = fields.GetFieldMembership(MIN_PAPERS=1000)
+    year_table = _year_table(MAG.GetYears())
 
     # Setup output directory
     output_dir = DATA_FOLDER / 'potrees_independent'
@@ -605,17 +1079,17 @@ def ProduceFieldPointCloudsIndependently(debug=False):
 
     # Process fields
     for field_id in tqdm(all_field_embeddings.keys(), desc="Generating independent field point clouds"):
-        if field_id not in field_names or field_id not in field_to_papers or field_id not in subfields_map:
+        if field_id not in field_names or field_id not in membership.field_index or field_id not in subfields_map:
             continue
         
         field_name = field_names[field_id]
-        embedding = all_field_embeddings[field_id]
         field_subfields_all = subfields_map[field_id]
 
-        # Filter valid papers
-        valid_paper_ids_in_field = sorted(set(embedding.keys()))
+        # Point attributes of this field's own embedding
+        field_points = _point_table_from_embedding(all_field_embeddings[field_id], year_table)
+        valid_paper_ids_in_field = field_points.pop('ids')
         
-        if not valid_paper_ids_in_field:
+        if not len(valid_paper_ids_in_field):
              logger.warning(f"No valid papers with embeddings for field {field_name}. Skipping.")
              continue
 
@@ -624,8 +1098,7 @@ def ProduceFieldPointCloudsIndependently(debug=False):
             field_id=field_id,
             field_subfields_all=field_subfields_all,
             valid_paper_ids_in_field=valid_paper_ids_in_field,
-            paper_to_fields_map=paper_to_fields,
-            field_to_papers_map=field_to_papers,
+            membership=membership,
             use_similarity_ordering=False
         )
 
@@ -641,10 +1114,9 @@ def ProduceFieldPointCloudsIndependently(debug=False):
         success = _create_field_las(
             output_path=output_las_path,
             field_name=field_name,
-            valid_paper_ids_in_field=valid_paper_ids_in_field,
-            embedding_map=embedding,
-            paper_years_map=paper_years,
-            paper_coloring_data=paper_coloring_data
+            field_points=field_points,
+            paper_coloring_data=paper_coloring_data,
+            profile=EXPORT_PROFILE
         )
 
         if success:
@@ -657,167 +1129,357 @@ def ProduceFieldPointCloudsIndependently(debug=False):
     logger.info(f"Generated {computed_fields} independent field point clouds.")
     return final_field_colors, final_field_orders
 
-@cache
-def ProduceTopLevelPointCloudWithIntersections():
+def _classify_field_memberships(field_memberships, top_fields, intersection_data):
     """
-    Generate point cloud of all papers with classifications for both single fields and field intersections
-    
-    This enhances the standard top-level point cloud with additional classification information
-    to support filtering by field intersections.
+    Classification code for every row of a (papers x top fields) boolean matrix
+
+    Rows without a field get 0, rows with one field get that field's code, and rows
+    with several fields get the code of the intersection of their first two fields
+    (falling back to the first field's code if that pair has none).
+
+    Args:
+        field_memberships: Boolean array of shape (papers, len(top_fields))
+        top_fields: Top-level field names, in column order
+        intersection_data: Output of GenerateFieldIntersectionMapping
+
+    Returns: uint16 array of classification codes
+
+    Raises:
+        ValueError: If a code used by the rows does not fit in a uint16
     """
-    from . import project_vectors, MAG, fields
+    n_fields = len(top_fields)
+    if n_fields == 0:
+        return np.zeros(len(field_memberships), dtype=np.uint16)
+
+    single_field_codes = intersection_data["single_field_codes"]
+    intersection_pairs = intersection_data["intersection_pairs"]
+
+    # Lookup tables indexed by column and by the pair code first * n_fields + second
+    single_lut = np.array([single_field_codes.get(f, 0) for f in top_fields], dtype=np.int64)
+    pair_lut = np.array([
+        intersection_pairs.get(f"{field1} ∩ {field2}", single_lut[i])
+        for i, field1 in enumerate(top_fields)
+        for field2 in top_fields
+    ], dtype=np.int64)
+
+    counts = field_memberships.sum(axis=1)
+    first = np.argmax(field_memberships, axis=1)
+    # The second set bit is the first column where the running count reaches 2
+    running = np.cumsum(field_memberships, axis=1, dtype=np.min_scalar_type(n_fields))
+    second = np.argmax(running >= 2, axis=1)
+    del running
+
+    codes = np.where(counts >= 2, pair_lut[first * n_fields + second], single_lut[first])
+    codes[counts == 0] = 0
+    if len(codes) and codes.max() > np.iinfo(np.uint16).max:
+        raise ValueError(
+            f"Classification code {int(codes.max())} does not fit in a uint16 "
+            f"({n_fields} top-level fields)"
+        )
+    return codes.astype(np.uint16)
+
+def _top_field_memberships(paper_field_matrix, rows, column_of_field, n_fields):
+    """
+    Boolean (papers x top fields) matrix scattered from the sparse membership matrix
+
+    Args:
+        paper_field_matrix: FieldMembership.matrix()
+        rows: Membership rows of the papers (-1 for papers without fields)
+        column_of_field: Top-field column of every membership column (-1 if none)
+        n_fields: Number of top fields
+    """
+    present = np.flatnonzero(rows >= 0)
+    paper_fields = paper_field_matrix[rows[present]].tocoo()
+    columns = column_of_field[paper_fields.col]
+    keep = columns >= 0
+
+    field_memberships = np.zeros((len(rows), n_fields), dtype=bool)
+    field_memberships[present[paper_fields.row[keep]], columns[keep]] = True
+    return field_memberships
+
+def _field_classifications(paper_ids, chunk_size=LAS_CHUNK_SIZE):
+    """
+    Top-level field / intersection classification of every paper, chunk by chunk
+
+    Args:
+        paper_ids: Sorted (memory-mapped) MAG IDs, as in the point attribute table
+
+    Returns:
+        Memory-mapped uint16 classification column, in the order of paper_ids
+    """
+    from numpy.lib.format import open_memmap
+    from . import fields
 
-    # Get embedding and valid paper IDs
-    embedding = project_vectors.GetUmapEmbedding()
-    paper_years = MAG.GetYears()
-    
-    # Get field membership data
     field_names = fields.GetFieldNames()
     top_level = fields.GetTopLevel()
-    paper_to_fields = fields.PaperToFields()
-    
-    # Get top-level field list
     top_fields = [field_names[fid] for fid in top_level if fid in field_names]
+    field_to_idx = {field: idx for idx, field in enumerate(top_fields)}
+    membership = fields.GetFieldMembership(MIN_PAPERS=1000)
+    paper_field_matrix = membership.matrix()
+    column_of_field = np.array(
+        [field_to_idx.get(field_names.get(fid), -1) for fid in membership.field_ids],
+        dtype=np.int64
+    )
+    intersection_data = GenerateFieldIntersectionMapping()
+
+    output_dir = DATA_FOLDER / 'arrays'
+    output_dir.mkdir(exist_ok=True)
+    classifications = open_memmap(
+        output_dir / 'point_field_classifications.npy', mode='w+', dtype=np.uint16, shape=(len(paper_ids),)
+    )
+    for start in tqdm(range(0, len(paper_ids), chunk_size), desc="Classifying field memberships"):
+        chunk_ids = np.asarray(paper_ids[start:start+chunk_size])
+        field_memberships = _top_field_memberships(
+            paper_field_matrix, membership.lookup(chunk_ids), column_of_field, len(top_fields)
+        )
+        classifications[start:start+chunk_size] = _classify_field_memberships(
+            field_memberships, top_fields, intersection_data
+        )
+    classifications.flush()
+    return classifications
+
+POINT_ATTRIBUTE_COLUMNS = {
+    'mag_id': (np.uint32, ()),
+    'year': (np.uint16, ()),
+    'rgb': (np.uint8, (3,)),
+}
+
+@cache
+def GetPointAttributes(SEED=0):
+    """
+    Per-point attribute table of the global embedding, computed once and shared
+    by every LAS producer
+
+    Rows follow LoadUmapEmbeddingArrays (sorted by MAG ID). Each column is
+    written chunk by chunk to its own .npy file:
+
+    * mag_id: uint32 MAG ID
+    * year: uint16 publication year (0 if unknown), from a vectorized join
+    * rgb: Nx3 uint8 position-based colors with noise
+
+    Field classifications are not part of the table; only
+    ProduceTopLevelPointCloudWithIntersections needs them and computes them
+    itself.
+
+    Args:
+        SEED: Seed for the color noise, so rebuilt tables are identical
+
+    Returns:
+        Dictionary of column paths, plus the point count and the scaled
+        coordinate bounds ('mins', 'maxs')
+    """
+    from numpy.lib.format import open_memmap
+    from . import project_vectors, MAG
+
+    paper_ids, coords = project_vectors.LoadUmapEmbeddingArrays()
+    n_points = len(paper_ids)
+    year_table = _year_table(MAG.GetYears())
+
+    mins, maxs = _coordinate_bounds(coords)
+    mins, maxs = mins * COORDINATE_SCALE, maxs * COORDINATE_SCALE
+
+    output_dir = DATA_FOLDER / 'arrays'
+    output_dir.mkdir(exist_ok=True)
+    paths = {name: output_dir / f'point_attributes_{name}.npy' for name in POINT_ATTRIBUTE_COLUMNS}
+    arrays = {
+        name: open_memmap(paths[name], mode='w+', dtype=dtype, shape=(n_points,) + shape)
+        for name, (dtype, shape) in POINT_ATTRIBUTE_COLUMNS.items()
+    }
+
+    rng = np.random.default_rng(SEED)
+    for start in tqdm(range(0, n_points, LAS_CHUNK_SIZE), desc="Building point attributes"):
+        stop = min(start + LAS_CHUNK_SIZE, n_points)
+        chunk_ids = np.asarray(paper_ids[start:stop])
+        point_coordinates = np.asarray(coords[start:stop], dtype=np.float64) * COORDINATE_SCALE
+
+        arrays['mag_id'][start:stop] = chunk_ids.astype(np.uint32)
+        arrays['year'][start:stop] = _lookup_years(year_table, chunk_ids)
+
+        # Red from y, green from z, blue from x
+        colors = _position_colors(point_coordinates, mins, maxs, rng)
+        arrays['rgb'][start:stop] = colors[:, [1, 2, 0]].astype(np.uint8)
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    result = {name: str(path) for name, path in paths.items()}
+    result.update({'count': n_points, 'mins': mins.tolist(), 'maxs': maxs.tolist()})
+    return result
+
+def LoadPointAttributes(mmap_mode='r'):
+    """
+    Open the global point attribute table
+
+    Returns:
+        Dictionary with the memory-mapped 'ids' and 'coords' embedding arrays,
+        every column of GetPointAttributes, and the scaled 'mins' / 'maxs' bounds
+    """
+    from . import project_vectors
+
+    info = GetPointAttributes()
+    ids, coords = project_vectors.LoadUmapEmbeddingArrays(mmap_mode=mmap_mode)
+    table = {'ids': ids, 'coords': coords}
+    for name in POINT_ATTRIBUTE_COLUMNS:
+        table[name] = np.load(info[name], mmap_mode=mmap_mode)
+    table['mins'] = np.array(info['mins'])
+    table['maxs'] = np.array(info['maxs'])
+    return table
+
+def _table_rows(table_ids, paper_ids):
+    """Rows of the sorted table_ids holding paper_ids, dropping papers not in the table"""
+    paper_ids = np.asarray(paper_ids, dtype=np.int64)
+    if not len(table_ids):
+        return np.array([], dtype=np.int64)
+    rows = np.minimum(np.searchsorted(table_ids, paper_ids), len(table_ids) - 1)
+    return np.sort(rows[table_ids[rows] == paper_ids])
+
+def _take_points(table, rows):
+    """Coordinates, MAG IDs and years of the given table rows, read into memory"""
+    return {name: np.asarray(table[name][rows]) for name in ('coords', 'mag_id', 'year')}
+
+def _point_table_from_embedding(embedding, year_table):
+    """
+    Point attribute columns for a {paper_id: coordinates} embedding, sorted by MAG ID
+
+    Returns: Dictionary with ids (int64), coords, mag_id and year columns
+    """
+    import itertools
+
+    n = len(embedding)
+    ids = np.fromiter((int(pid) for pid in embedding), dtype=np.int64, count=n)
+    coords = np.fromiter(
+        itertools.chain.from_iterable(embedding.values()), dtype=np.float64, count=3*n
+    ).reshape((n, 3))
+    order = np.argsort(ids)
+    ids, coords = ids[order], coords[order]
+    return {
+        'ids': ids,
+        'coords': coords,
+        'mag_id': ids.astype(np.uint32),
+        'year': _lookup_years(year_table, ids),
+    }
+
+@cache
+def ProduceTopLevelPointCloudWithIntersections(EXPORT_PROFILE=DEFAULT_EXPORT_PROFILE):
+    """
+    Generate point cloud of all papers with classifications for both single fields and field intersections
     
+    This enhances the standard top-level point cloud with additional classification information
+    to support filtering by field intersections. Classifications are computed
+    chunk by chunk into a memory-mapped column next to the point attribute table.
+
+    Intersection codes (see GenerateFieldIntersectionMapping) run past the 5-bit
+    LAS classification of point formats 2 and 3, so they are stored in the
+    uint16 field_code extra dimension and the LAS classification is left at 0.
+
+    Args:
+        EXPORT_PROFILE: Key of EXPORT_PROFILES
+    """
+    table = LoadPointAttributes()
+
     # Setup output directory
     output_dir = DATA_FOLDER / 'potrees'
     output_dir.mkdir(exist_ok=True)
-    
-    # Filter papers in both MAG and embedding
-    paper_ids = set(embedding)
-    
-    # Extract 3D coordinates
-    x_coords, y_coords, z_coords = (
-        np.array([embedding[paper_id][i]*100 for paper_id in paper_ids])
-        for i in range(3)
-    )
-    
-    # Convert to integers
-    paper_ids_int = [int(x) for x in paper_ids]
-    paper_ids_str = [str(x) for x in paper_ids_int]
-    
-    # Combine coordinates
-    point_coordinates = np.hstack((
-        x_coords.reshape((-1, 1)), 
-        y_coords.reshape((-1, 1)), 
-        z_coords.reshape((-1, 1))
-    ))
-    
-    del x_coords, y_coords, z_coords
-    
-    # Create LAS header
-    header = laspy.LasHeader(point_format=3, version="1.2")
-    header.offsets = np.min(point_coordinates, axis=0)
-    header.scales = np.array([0.001, 0.001, 0.001])
-    
-    las = laspy.LasData(header)
-    
-    # Set coordinates
-    las.x = point_coordinates[:, 0]
-    las.y = point_coordinates[:, 1]
-    las.z = point_coordinates[:, 2]
-    
-    # Add paper ID dimension
-    las.add_extra_dim(laspy.ExtraBytesParams(
-        name="mag_id",
-        type=np.uint32,
-        description="MAG paper ID"
-    ))
-    las.mag_id = paper_ids_int
-    
-    # Store year for filtering
-    las.point_source_id = [paper_years.get(pid, 0) for pid in paper_ids_int]
-    
-    # Calculate field memberships and intersections
-    # Prepare mapping for field indices
-    field_to_idx = {field: idx for idx, field in enumerate(top_fields)}
-    
-    # Create arrays to store field memberships for each paper
-    field_memberships = np.zeros((len(paper_ids_str), len(top_fields)), dtype=bool)
-    
-    # Fill in the memberships
-    for i, paper_id in enumerate(paper_ids_str):
-        if paper_id not in paper_to_fields: 
-            continue
-        
-        paper_fields = paper_to_fields[paper_id]
-        for field_id in paper_fields:
-            if field_id not in field_names: 
-                continue
-                
-            field_name = field_names[field_id]
-            if field_name not in field_to_idx: 
-                continue
-                
-            field_memberships[i, field_to_idx[field_name]] = True
-    
-    # Generate classification codes for papers
-    classifications = np.zeros(len(paper_ids_str), dtype=np.uint8)
-    
-    # Generate intersection mappings
-    intersection_data = GenerateFieldIntersectionMapping()
-    single_field_codes = intersection_data["single_field_codes"]
-    intersection_pairs = intersection_data["intersection_pairs"]
-    
-    # Mapping from field index to field name
-    idx_to_field = {idx: field for field, idx in field_to_idx.items()}
-    
-    # Calculate final classifications
-    for i, memberships in enumerate(field_memberships):
-        if not np.any(memberships):
-            # No field membership
-            classifications[i] = 0
-            continue
-            
-        field_indices = np.where(memberships)[0]
-        
-        if len(field_indices) == 1:
-            # Single field membership - use code from mapping
-            field_name = idx_to_field[field_indices[0]]
-            classifications[i] = single_field_codes.get(field_name, 0)
-        else:
-            # Sort indices for deterministic ordering
-            field_indices = sorted(field_indices)
-            # Get the names of the first two fields
-            field1 = idx_to_field[field_indices[0]]
-            field2 = idx_to_field[field_indices[1]]
-            
-            # Get the intersection code using intersection_pairs
-            intersection_name = f"{field1} ∩ {field2}"
-            if intersection_name in intersection_pairs:
-                classifications[i] = intersection_pairs[intersection_name]
-            else:
-                # Fallback - use first field's code
-                classifications[i] = single_field_codes.get(field1, 0)
-    
-    # Store classification for filtering
-    las.classification = classifications
-    
-    # Color points by their position for better visualization
-    def normalize_to_255(x):
-        """Normalize to 0-255 range"""
-        return 255 * (x - x.min())/ (x.max()-x.min())
-    
-    # Add noise for visual distinction
-    noise = np.random.rand(len(paper_ids_int)+3)
-    
-    def add_noise_to_channel(x, channel_index):
-        """Add noise to color channel for better visualization"""
-        noisy_values = normalize_to_255(normalize_to_255(x) - 25 + 50*noise[channel_index:channel_index+len(x)])
-        return 255/2 + noisy_values/2
-    
-    # Set RGB colors with noise for visual clarity
-    las.blue = add_noise_to_channel(point_coordinates[:, 0], 0)
-    las.red = add_noise_to_channel(point_coordinates[:, 1], 1)
-    las.green = add_noise_to_channel(point_coordinates[:, 2], 2)
-    
+
+    columns = {k: table[k] for k in ('coords', 'mag_id', 'year', 'rgb')}
+    columns['field_code'] = _field_classifications(table['ids'])
+
     # Save and convert
     output_file = output_dir / f"full_with_intersections.las"
-    las.write(output_file)
+    _write_points_las(output_file, columns, mins=table['mins'], profile=EXPORT_PROFILE)
     ConvertPotree(output_file)
     
     return output_file
 
+class _RowSelection:
+    """Row subset of a (memory-mapped) column, read one slice at a time"""
+
+    def __init__(self, column, rows):
+        self.column = column
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return np.asarray(self.column[self.rows[index]])
+
+def _year_buckets(years, bucket_years):
+    """
+    Year ranges of bucket_years each, aligned to multiples of bucket_years
+
+    Returns:
+        List of (name, first year, last year); papers without a year get the
+        ('unknown', 0, 0) bucket
+    """
+    known = years[years > 0]
+    buckets = []
+    if len(known):
+        first = int(known.min()) // bucket_years * bucket_years
+        for start in range(first, int(known.max()) + 1, bucket_years):
+            buckets.append((f"{start}_{start + bucket_years - 1}", start, start + bucket_years - 1))
+    buckets.append(('unknown', 0, 0))
+    return buckets
+
+@cache
+def ProduceYearPartitionedPointClouds(BUCKET_YEARS=10, EXPORT_PROFILE=DEFAULT_EXPORT_PROFILE):
+    """
+    Split the top-level point cloud into one Potree cloud per range of years
+
+    A viewer restricted to a range of years only needs to fetch the buckets
+    that overlap it, instead of streaming the whole cloud and filtering on
+    point_source_id. All buckets share the global coordinate offsets, so they
+    line up exactly with each other and with full.las, and hold the same
+    attributes as full.las (no field classification).
+
+    Writes static/pointclouds_years/index.json listing every bucket's year
+    range, point count and metadata.json path.
+
+    Args:
+        BUCKET_YEARS: Number of years per bucket
+        EXPORT_PROFILE: Key of EXPORT_PROFILES
+
+    Returns:
+        The index written to index.json
+    """
+    import json
+
+    table = LoadPointAttributes()
+    years = np.asarray(table['year'])
+
+    output_dir = DATA_FOLDER / 'potrees_years'
+    output_dir.mkdir(exist_ok=True)
+
+    index = {'bucket_years': BUCKET_YEARS, 'buckets': []}
+    las_files = []
+    for name, first, last in tqdm(_year_buckets(years, BUCKET_YEARS), desc="Writing year buckets"):
+        rows = np.flatnonzero((years >= first) & (years <= last))
+        if not len(rows):
+            continue
+
+        output_file = output_dir / f"full_{name}.las"
+        columns = {k: _RowSelection(table[k], rows) for k in ('coords', 'mag_id', 'year', 'rgb')}
+        _write_points_las(output_file, columns, mins=table['mins'], profile=EXPORT_PROFILE)
+        las_files.append(output_file)
+
+        index['buckets'].append({
+            'name': output_file.stem,
+            'first_year': first,
+            'last_year': last,
+            'points': int(len(rows)),
+            'metadata': f"/data/{POTREE_OUTPUT_DIRS['potrees_years']}/{output_file.stem}/metadata.json",
+        })
+
+    _run_potree_jobs(las_files)
+
+    index_path = DATA_FOLDER / 'static' / POTREE_OUTPUT_DIRS['potrees_years'] / 'index.json'
+    index_path.parent.mkdir(exist_ok=True)
+    with open(index_path, 'w') as f:
+        json.dump(index, f, indent=2)
+
+    return index
+
 if __name__ == '__main__':
     #ProduceFieldPointClouds.make(force=True)
     #ConvertPotreeAll.make(force=True)
@@ -0,0 +1,479 @@
+from .common import *
+import json
+import laspy
+import numpy as np
+
+__all__ = [
+    'BuildPotreeOctree',
+    'SAMPLING_METHODS',
+    'morton_keys',
+    'hilbert_keys'
+]
+
+# Bits per axis of the octree Morton keys (3 * 21 = 63 bits fit in a uint64)
+MORTON_BITS = 21
+
+# Points a node may hold before it is split
+MAX_NODE_POINTS = 20_000
+
+# Subsampling grid per node: 2**7 = 128 cells per axis, as in PotreeConverter
+GRID_BITS = 7
+
+# Hierarchy chunk depth, nodes at multiples of this level start a new chunk
+HIERARCHY_STEP = 4
+
+# Level at which the octree is split into subtrees for the worker processes
+SUBTREE_LEVEL = 2
+
+# Potree 2.0 hierarchy record: type, child mask, point count, byte offset, byte size
+HIERARCHY_DTYPE = np.dtype([
+    ('type', 'u1'),
+    ('childMask', 'u1'),
+    ('numPoints', '<u4'),
+    ('byteOffset', '<i8'),
+    ('byteSize', '<i8'),
+])
+
+NODE_NORMAL, NODE_LEAF, NODE_PROXY = 0, 1, 2
+
+def _spread_bits(values):
+    """Insert two zero bits after each of the lower 21 bits of a uint64 array"""
+    x = values.astype(np.uint64) & np.uint64(0x1fffff)
+    x = (x | (x << np.uint64(32))) & np.uint64(0x1f00000000ffff)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x1f0000ff0000ff)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x100f00f00f00f00f)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x10c30c30c30c30c3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return x
+
+def morton_keys(grid_coordinates):
+    """
+    3D Morton (Z-order) keys of integer grid coordinates
+
+    Bits are interleaved as x, y, z from most to least significant, which is
+    the Potree child index order (x = 4, y = 2, z = 1), so the top 3 * level
+    bits of a key are the octree node containing the point at that level.
+
+    Args:
+        grid_coordinates: Nx3 integer array with values below 2**MORTON_BITS
+
+    Returns:
+        uint64 array of N keys
+    """
+    grid_coordinates = np.asarray(grid_coordinates)
+    return (
+        (_spread_bits(grid_coordinates[:, 0]) << np.uint64(2))
+        | (_spread_bits(grid_coordinates[:, 1]) << np.uint64(1))
+        | _spread_bits(grid_coordinates[:, 2])
+    )
+
+def hilbert_keys(grid_coordinates, bits=MORTON_BITS):
+    """
+    3D Hilbert curve keys of integer grid coordinates
+
+    Skilling's transpose algorithm ("Programming the Hilbert curve", 2004),
+    vectorized over all points: the coordinates are transformed in place into
+    the transposed Hilbert index, whose bits are then interleaved like a
+    Morton key. Unlike Morton order, consecutive keys are always adjacent cells.
+
+    Args:
+        grid_coordinates: Nx3 integer array with values below 2**bits
+        bits: Bits per axis
+
+    Returns:
+        uint64 array of N keys
+    """
+    X = [np.asarray(grid_coordinates)[:, i].astype(np.uint64) for i in range(3)]
+    n = len(X)
+
+    # Inverse undo of the excess work
+    Q = 1 << (bits - 1)
+    while Q > 1:
+        P = np.uint64(Q - 1)
+        for i in range(n):
+            high = (X[i] & np.uint64(Q)) != 0
+            t = (X[0] ^ X[i]) & P
+            X[0] = np.where(high, X[0] ^ P, X[0] ^ t)
+            if i:
+                X[i] = np.where(high, X[i], X[i] ^ t)
+        Q >>= 1
+
+    # Gray encode
+    for i in range(1, n):
+        X[i] ^= X[i - 1]
+    t = np.zeros_like(X[0])
+    Q = 1 << (bits - 1)
+    while Q > 1:
+        t = np.where((X[n - 1] & np.uint64(Q)) != 0, t ^ np.uint64(Q - 1), t)
+        Q >>= 1
+    for i in range(n):
+        X[i] ^= t
+
+    return morton_keys(np.column_stack(X))
+
+def cube_bounds(mins, maxs):
+    """Cubic bounding box with the given minimum and the largest extent on every axis"""
+    mins = np.asarray(mins, dtype=np.float64)
+    size = float(np.max(np.asarray(maxs, dtype=np.float64) - mins))
+    size = size if size > 0 else 1.0
+    return mins, mins + size
+
+def grid_coordinates(positions, cube_min, cube_max, bits=MORTON_BITS):
+    """Quantize positions inside the cube to integer coordinates on a 2**bits grid"""
+    cells = 1 << bits
+    scaled = (np.asarray(positions, dtype=np.float64) - cube_min) / (cube_max - cube_min) * cells
+    return np.clip(scaled, 0, cells - 1).astype(np.uint64)
+
+def _random_priority(keys, grid, shift, rng):
+    """Uniform random priority, so each grid cell keeps a random point"""
+    return rng.random(len(keys))
+
+def _poisson_priority(keys, grid, shift, rng):
+    """
+    Distance to the centre of the sampling cell, so each cell keeps its most central point
+
+    Neighbouring samples then sit roughly one cell apart, a grid approximation
+    of Poisson-disk sampling that needs no neighbour search.
+    """
+    half = 0.5 * (1 << int(shift)) if shift else 0.5
+    cell_origin = (grid >> np.uint64(shift)) << np.uint64(shift)
+    offset = grid.astype(np.float64) - cell_origin.astype(np.float64) - half
+    return np.einsum('ij,ij->i', offset, offset)
+
+SAMPLING_METHODS = {
+    'random': _random_priority,
+    'poisson': _poisson_priority,
+}
+
+def _assign_levels(keys, grid, start_level, stop_level, max_node_points=MAX_NODE_POINTS,
+                   grid_bits=GRID_BITS, sampling='poisson', seed=0):
+    """
+    Octree level at which each point is stored, computed level by level
+
+    A node with at most max_node_points remaining points is a leaf and keeps
+    them all. A larger node keeps one point per cell of a 2**grid_bits grid
+    over its extent and passes the rest down to its children, so every point
+    is stored in exactly one node.
+
+    Args:
+        keys: Morton keys of the points, all inside one node at start_level
+        grid: Nx3 grid coordinates matching keys
+        start_level: Level of the subtree root
+        stop_level: Level at which to stop; points still unassigned keep -1
+        max_node_points: Node size above which a node is split
+        grid_bits: Log2 of the sampling grid resolution per node
+        sampling: Key of SAMPLING_METHODS
+        seed: Seed of the random priorities
+
+    Returns:
+        int8 array with the level of each point (-1 if below stop_level)
+    """
+    priority_of = SAMPLING_METHODS[sampling]
+    rng = np.random.default_rng(seed)
+    levels = np.full(len(keys), -1, dtype=np.int8)
+    remaining = np.arange(len(keys))
+
+    for level in range(start_level, stop_level):
+        if not len(remaining):
+            break
+
+        node_shift = np.uint64(3 * (MORTON_BITS - level))
+        nodes = keys[remaining] >> node_shift
+        _, inverse, counts = np.unique(nodes, return_inverse=True, return_counts=True)
+
+        # Small nodes (and nodes at the finest level) keep all their points
+        leaf = counts[inverse.ravel()] <= max_node_points
+        if level >= MORTON_BITS - grid_bits:
+            leaf[:] = True
+        levels[remaining[leaf]] = level
+        if leaf.all():
+            break
+
+        # Larger nodes keep the best-priority point of each sampling cell
+        inner = remaining[~leaf]
+        shift = MORTON_BITS - level - grid_bits
+        cells = keys[inner] >> np.uint64(3 * shift)
+        priority = priority_of(keys[inner], grid[inner], shift, rng)
+        order = np.lexsort((priority, cells))
+        sorted_cells = cells[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_cells[1:] != sorted_cells[:-1]
+        levels[inner[order[first]]] = level
+
+        kept = np.empty(len(order), dtype=bool)
+        kept[order] = first
+        remaining = inner[~kept]
+
+    return levels
+
+def _assign_subtree(args):
+    """Worker entry point: levels of the points of one subtree"""
+    keys, grid, start_level, stop_level, options = args
+    return _assign_levels(keys, grid, start_level, stop_level, **options)
+
+def _read_las(las_path):
+    """Read the positions and all point attributes of a LAS file into memory"""
+    las = laspy.read(las_path)
+    return las, np.column_stack([las.x, las.y, las.z])
+
+def _attribute_columns(las, attributes=None):
+    """
+    Potree attribute descriptors and value arrays of the LAS dimensions the viewer reads
+
+    Args:
+        las: LasData to read from
+        attributes: Potree attribute names to keep (all if None)
+
+    Returns:
+        List of (name, numpy dtype, number of elements, values) tuples,
+        position excluded
+    """
+    n = len(las.points)
+    columns = [(
+        'rgb', np.dtype('<u2'), 3,
+        np.column_stack([las.red, las.green, las.blue]).astype(np.uint16)
+    )]
+    columns.append(('classification', np.dtype('u1'), 1, np.asarray(las.classification, dtype=np.uint8)))
+    columns.append(('point source id', np.dtype('<u2'), 1, np.asarray(las.point_source_id, dtype=np.uint16)))
+    columns.append(('user data', np.dtype('u1'), 1, np.asarray(las.user_data, dtype=np.uint8)))
+
+    for name in las.point_format.extra_dimension_names:
+        values = np.asarray(las[name])
+        columns.append((name, values.dtype.newbyteorder('<'), 1, values.reshape(n)))
+
+    if attributes is not None:
+        columns = [column for column in columns if column[0] in attributes]
+    return columns
+
+_POTREE_TYPES = {
+    'i1': 'int8', 'i2': 'int16', 'i4': 'int32', 'i8': 'int64',
+    'u1': 'uint8', 'u2': 'uint16', 'u4': 'uint32', 'u8': 'uint64',
+    'f4': 'float', 'f8': 'double',
+}
+
+def _attribute_metadata(name, dtype, n_elements, values):
+    """Potree 2.0 attribute descriptor with the value range"""
+    values = values.reshape(len(values), -1)
+    metadata = {
+        'name': name,
+        'description': '',
+        'size': dtype.itemsize * n_elements,
+        'numElements': n_elements,
+        'elementSize': dtype.itemsize,
+        'type': _POTREE_TYPES[dtype.str.lstrip('<>|=')],
+        'min': values.min(axis=0).tolist() if len(values) else [0] * n_elements,
+        'max': values.max(axis=0).tolist() if len(values) else [0] * n_elements,
+    }
+    return metadata
+
+def _hierarchy_records(node_levels, node_keys, node_counts, point_size, step=HIERARCHY_STEP):
+    """
+    Encode the octree nodes as Potree 2.0 hierarchy chunks
+
+    Nodes are given sorted by (level, key), which is the breadth-first order
+    the viewer expects. The root chunk holds levels 0 to step - 1 plus proxy
+    entries for the nodes at level step; every proxy points to a chunk of its
+    own that starts with the node and continues down another step levels.
+
+    Returns:
+        (bytes of hierarchy.bin, size in bytes of the root chunk)
+    """
+    n_nodes = len(node_keys)
+    node_bytes = node_counts.astype(np.int64) * point_size
+    node_offsets = np.concatenate([[0], np.cumsum(node_bytes)[:-1]])
+
+    # Child masks from the last Morton digit of each non-root node
+    node_index = {(int(l), int(k)): i for i, (l, k) in enumerate(zip(node_levels, node_keys))}
+    child_mask = np.zeros(n_nodes, dtype=np.uint8)
+    for i in range(1, n_nodes):
+        parent = node_index[(int(node_levels[i]) - 1, int(node_keys[i]) >> 3)]
+        child_mask[parent] |= np.uint8(1 << (int(node_keys[i]) & 7))
+
+    # Chunk root of each node and proxy entries for chunk roots below level 0
+    chunk_level = (node_levels // step) * step
+    chunk_of = np.array([
+        node_index[(int(cl), int(k) >> (3 * (int(l) - int(cl))))]
+        for l, k, cl in zip(node_levels, node_keys, chunk_level)
+    ], dtype=np.int64)
+    proxies = np.flatnonzero((node_levels % step == 0) & (node_levels > 0))
+    parent_chunk_of_proxy = chunk_of[[
+        node_index[(int(node_levels[i]) - 1, int(node_keys[i]) >> 3)] for i in proxies
+    ]]
+
+    # Entries: (chunk, node, is proxy); breadth-first inside a chunk is node order
+    entry_chunk = np.concatenate([chunk_of, parent_chunk_of_proxy])
+    entry_node = np.concatenate([np.arange(n_nodes), proxies])
+    entry_proxy = np.concatenate([np.zeros(n_nodes, dtype=bool), np.ones(len(proxies), dtype=bool)])
+    order = np.lexsort((entry_node, entry_chunk))
+    entry_chunk, entry_node, entry_proxy = entry_chunk[order], entry_node[order], entry_proxy[order]
+
+    # Chunk offsets in the order chunks appear (the root chunk first)
+    chunk_ids, chunk_sizes = np.unique(entry_chunk, return_counts=True)
+    chunk_sizes = chunk_sizes * HIERARCHY_DTYPE.itemsize
+    chunk_offsets = np.concatenate([[0], np.cumsum(chunk_sizes)[:-1]])
+    chunk_lookup = dict(zip(chunk_ids.tolist(), range(len(chunk_ids))))
+
+    records = np.zeros(len(entry_node), dtype=HIERARCHY_DTYPE)
+    has_children = child_mask[entry_node] > 0
+    records['type'] = np.where(has_children, NODE_NORMAL, NODE_LEAF)
+    records['childMask'] = child_mask[entry_node]
+    records['numPoints'] = node_counts[entry_node]
+    records['byteOffset'] = node_offsets[entry_node]
+    records['byteSize'] = node_bytes[entry_node]
+
+    # Proxies point to their node's hierarchy chunk instead of its points
+    proxy_chunks = np.array([chunk_lookup[int(n)] for n in entry_node[entry_proxy]], dtype=np.int64)
+    records['type'][entry_proxy] = NODE_PROXY
+    if len(proxy_chunks):
+        records['byteOffset'][entry_proxy] = chunk_offsets[proxy_chunks]
+        records['byteSize'][entry_proxy] = chunk_sizes[proxy_chunks]
+
+    return records.tobytes(), int(chunk_sizes[0])
+
+def BuildPotreeOctree(
+    input_las_path,
+    output_path,
+    sampling='poisson',
+    max_node_points=MAX_NODE_POINTS,
+    grid_bits=GRID_BITS,
+    workers=None,
+    seed=0,
+    chunk_size=1_000_000,
+    attributes=None
+):
+    """
+    Convert a LAS file to a Potree 2.0 octree (metadata.json, hierarchy.bin, octree.bin)
+
+    A numpy replacement for PotreeConverter. Points are keyed by a 3D Morton
+    code inside the cubic bounding box; the levels above SUBTREE_LEVEL are
+    sampled in this process, and each subtree below it is sampled in a
+    separate worker process. Every point is stored in exactly one node and
+    octree.bin holds the nodes' points contiguously, in breadth-first order.
+
+    Args:
+        input_las_path: LAS file to convert
+        output_path: Output directory
+        sampling: LOD sampling, 'poisson' (most central point per cell) or 'random'
+        max_node_points: Node size above which a node is split
+        grid_bits: Log2 of the per-node sampling grid (spacing = node size / 2**grid_bits)
+        workers: Number of worker processes (defaults to the number of cores)
+        seed: Seed of the sampling priorities
+        chunk_size: Number of points encoded at a time when writing octree.bin
+        attributes: Potree attribute names to keep besides position (all if None)
+
+    Returns:
+        Dictionary with the number of points, nodes and the octree depth
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if sampling not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method {sampling!r}, expected one of {list(SAMPLING_METHODS)}")
+
+    output_path = Path(output_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    las, positions = _read_las(input_las_path)
+    n_points = len(positions)
+    if not n_points:
+        raise ValueError(f"{input_las_path} has no points")
+    actual_min = positions.min(axis=0)
+    actual_max = positions.max(axis=0)
+    cube_min, cube_max = cube_bounds(actual_min, actual_max)
+
+    # Octree keys, sorted so every node's points are contiguous
+    grid = grid_coordinates(positions, cube_min, cube_max)
+    keys = morton_keys(grid)
+    order = np.argsort(keys, kind='stable')
+    keys, grid = keys[order], grid[order]
+
+    options = dict(max_node_points=max_node_points, grid_bits=grid_bits, sampling=sampling, seed=seed)
+    top_level = min(SUBTREE_LEVEL, MORTON_BITS - grid_bits)
+    levels = _assign_levels(keys, grid, 0, top_level, **options)
+
+    # Sample the subtrees below top_level in parallel
+    pending = np.flatnonzero(levels < 0)
+    if len(pending):
+        subtree = keys[pending] >> np.uint64(3 * (MORTON_BITS - top_level))
+        bounds = np.flatnonzero(np.diff(subtree)) + 1
+        groups = np.split(pending, bounds)
+        jobs = [(keys[g], grid[g], top_level, MORTON_BITS + 1, options) for g in groups]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+                results = list(executor.map(_assign_subtree, jobs))
+        else:
+            results = [_assign_subtree(job) for job in jobs]
+        for g, result in zip(groups, results):
+            levels[g] = result
+
+    # Node of every point and the breadth-first node order
+    node_keys_per_point = keys >> (np.uint64(3) * (np.uint64(MORTON_BITS) - levels.astype(np.uint64)))
+    point_order = np.lexsort((node_keys_per_point, levels))
+    sorted_levels = levels[point_order]
+    sorted_nodes = node_keys_per_point[point_order]
+    boundary = np.ones(n_points, dtype=bool)
+    boundary[1:] = (sorted_levels[1:] != sorted_levels[:-1]) | (sorted_nodes[1:] != sorted_nodes[:-1])
+    starts = np.flatnonzero(boundary)
+    node_levels = sorted_levels[starts].astype(np.int64)
+    node_keys = sorted_nodes[starts]
+    node_counts = np.diff(np.append(starts, n_points)).astype(np.uint32)
+
+    # Point records: quantized position followed by the viewer's attributes
+    scale = np.asarray(las.header.scales, dtype=np.float64)
+    columns = _attribute_columns(las, attributes)
+    record_dtype = np.dtype(
+        [('position', '<i4', (3,))]
+        + [(name, dtype, (n,)) if n > 1 else (name, dtype) for name, dtype, n, _ in columns]
+    )
+
+    source_rows = order[point_order]
+    with open(output_path / 'octree.bin', 'wb') as f:
+        for start in range(0, n_points, chunk_size):
+            rows = source_rows[start:start + chunk_size]
+            records = np.empty(len(rows), dtype=record_dtype)
+            records['position'] = np.round((positions[rows] - cube_min) / scale).astype(np.int32)
+            for name, _, _, values in columns:
+                records[name] = values[rows]
+            records.tofile(f)
+
+    hierarchy, first_chunk_size = _hierarchy_records(
+        node_levels, node_keys, node_counts, record_dtype.itemsize
+    )
+    with open(output_path / 'hierarchy.bin', 'wb') as f:
+        f.write(hierarchy)
+
+    descriptors = [{
+        'name': 'position',
+        'description': '',
+        'size': 12,
+        'numElements': 3,
+        'elementSize': 4,
+        'type': 'int32',
+        'min': actual_min.tolist(),
+        'max': actual_max.tolist(),
+    }]
+    descriptors += [_attribute_metadata(*column) for column in columns]
+
+    depth = int(node_levels.max())
+    metadata = {
+        'version': '2.0',
+        'name': Path(input_las_path).stem,
+        'description': '',
+        'points': int(n_points),
+        'projection': '',
+        'hierarchy': {
+            'firstChunkSize': first_chunk_size,
+            'stepSize': HIERARCHY_STEP,
+            'depth': depth,
+        },
+        'offset': cube_min.tolist(),
+        'scale': scale.tolist(),
+        'spacing': float(cube_max[0] - cube_min[0]) / (1 << grid_bits),
+        'boundingBox': {'min': cube_min.tolist(), 'max': cube_max.tolist()},
+        'encoding': 'DEFAULT',
+        'attributes': descriptors,
+    }
+    with open(output_path / 'metadata.json', 'w') as f:
+        json.dump(metadata, f, indent='\t')
+
+    return {'points': int(n_points), 'nodes': len(node_keys), 'depth': depth}
@@ -7,6 +7,8 @@ from .MAG import GetNonEnglishIDs
 
 __all__ = [
     'GetUmapEmbedding',
+    'GetUmapEmbeddingArrays',
+    'LoadUmapEmbeddingArrays',
     'FitUmapToSample',
     'SampleForUmap',
     'GetUmapEmbeddingSingleFile',
@@ -18,6 +20,7 @@ __all__ = [
 # ======= BEGIN HELPERS ========
 
 VECTOR_FOLDER = DATA_FOLDER / 'vectors'
+ARRAY_FOLDER = DATA_FOLDER / 'arrays'
 
 def vec_it(limit=None, start=None, filename=None, paper_ids_filter=None):
     if filename is not None:
@@ -251,6 +254,57 @@ def GetUmapEmbedding(
     
     return total_emb_3d
 
+@cache
+def GetUmapEmbeddingArrays():
+    """
+    Columnar copy of GetUmapEmbedding, written as .npy files that can be memory-mapped.
+
+    Papers are sorted by MAG ID. Use LoadUmapEmbeddingArrays to open the arrays.
+
+    Returns:
+        Dictionary with the paths of the 'ids' (int64) and 'coords' (float32, Nx3)
+        arrays and the number of papers
+    """
+    import itertools
+
+    embedding = GetUmapEmbedding()
+    n = len(embedding)
+
+    ids = np.fromiter((int(pid) for pid in embedding), dtype=np.int64, count=n)
+    coords = np.fromiter(
+        itertools.chain.from_iterable(embedding.values()), dtype=np.float32, count=3*n
+    ).reshape((n, 3))
+    del embedding
+
+    order = np.argsort(ids)
+    ids = ids[order]
+    coords = coords[order]
+    del order
+
+    ARRAY_FOLDER.mkdir(exist_ok=True)
+    ids_path = ARRAY_FOLDER / 'umap_embedding_ids.npy'
+    coords_path = ARRAY_FOLDER / 'umap_embedding_coords.npy'
+    np.save(ids_path, ids)
+    np.save(coords_path, coords)
+
+    logger.info(f'Wrote embedding arrays for {n} papers to {ARRAY_FOLDER}')
+    return {'ids': str(ids_path), 'coords': str(coords_path), 'count': n}
+
+def LoadUmapEmbeddingArrays(mmap_mode='r'):
+    """
+    Open the arrays written by GetUmapEmbeddingArrays.
+
+    Args:
+        mmap_mode: Passed to np.load; 'r' memory-maps, None reads into memory
+
+    Returns:
+        Tuple of (ids, coords): sorted int64 MAG IDs and the matching Nx3 float32 coordinates
+    """
+    paths = GetUmapEmbeddingArrays()
+    ids = np.load(paths['ids'], mmap_mode=mmap_mode)
+    coords = np.load(paths['coords'], mmap_mode=mmap_mode)
+    return ids, coords
+
 @cache(ignore=['DEBUG', 'SAMPLE_SIZE'])
 def SampleForFieldUmap(field_id, field_name, SAMPLE_SIZE=100_000, DEBUG=False):
     """Samples vectors specifically for a given field."""
@@ -0,0 +1,235 @@
+"""
+In-process spatial index over the global embedding.
+
+Points are bucketed on a uniform grid over their bounding box and stored in
+cell order, so every grid cell is a contiguous slice of memory-mapped
+arrays. Box and nearest-neighbour queries then read a handful of slices
+instead of going through the database.
+"""
+
+from .common import *
+from tqdm import tqdm
+
+__all__ = [
+    'GetSpatialIndex',
+    'LoadSpatialIndex',
+    'SpatialIndex'
+]
+
+SPATIAL_INDEX_CHUNK_SIZE = 1_000_000
+
+# Largest number of points a query returns
+DEFAULT_QUERY_LIMIT = 200
+
+def _cell_coordinates(points, mins, cell_size, grid_size):
+    """Integer grid cell of each point, clipped to the grid."""
+    cells = np.floor((np.asarray(points, dtype=np.float64) - mins) / cell_size).astype(np.int64)
+    return np.clip(cells, 0, grid_size - 1)
+
+@cache
+def GetSpatialIndex(GRID_SIZE=128):
+    """
+    Build the grid index of the UMAP embedding on disk
+
+    Points are sorted by raveled cell number (x major, z minor), so the cells
+    of one (x, y) column are a single contiguous range. Three arrays are
+    written to DATA_FOLDER/arrays/spatial_index:
+
+    * coords: Nx3 float32 coordinates in cell order
+    * ids: N int64 MAG IDs in cell order
+    * cell_start: GRID_SIZE**3 + 1 offsets; cell k holds rows cell_start[k]:cell_start[k+1]
+
+    Args:
+        GRID_SIZE: Number of cells along each axis
+
+    Returns:
+        Dictionary of array paths, plus 'count', 'grid_size', 'mins' and 'cell_size'
+    """
+    from numpy.lib.format import open_memmap
+    from . import project_vectors
+
+    paper_ids, coords = project_vectors.LoadUmapEmbeddingArrays()
+    n_points = len(paper_ids)
+
+    mins = np.full(3, np.inf)
+    maxs = np.full(3, -np.inf)
+    for start in range(0, n_points, SPATIAL_INDEX_CHUNK_SIZE):
+        chunk = np.asarray(coords[start:start + SPATIAL_INDEX_CHUNK_SIZE], dtype=np.float64)
+        mins = np.minimum(mins, chunk.min(axis=0))
+        maxs = np.maximum(maxs, chunk.max(axis=0))
+    cell_size = (maxs - mins) / GRID_SIZE
+    cell_size[cell_size == 0] = 1.0
+
+    keys = np.empty(n_points, dtype=np.int64)
+    for start in range(0, n_points, SPATIAL_INDEX_CHUNK_SIZE):
+        stop = min(start + SPATIAL_INDEX_CHUNK_SIZE, n_points)
+        cells = _cell_coordinates(coords[start:stop], mins, cell_size, GRID_SIZE)
+        keys[start:stop] = np.ravel_multi_index(cells.T, (GRID_SIZE,) * 3)
+
+    order = np.argsort(keys, kind='stable')
+    cell_start = np.searchsorted(keys[order], np.arange(GRID_SIZE ** 3 + 1))
+    del keys
+
+    output_dir = DATA_FOLDER / 'arrays' / 'spatial_index'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = {
+        'coords': output_dir / 'coords.npy',
+        'ids': output_dir / 'ids.npy',
+        'cell_start': output_dir / 'cell_start.npy',
+    }
+
+    sorted_coords = open_memmap(paths['coords'], mode='w+', dtype=np.float32, shape=(n_points, 3))
+    sorted_ids = open_memmap(paths['ids'], mode='w+', dtype=np.int64, shape=(n_points,))
+    for start in tqdm(range(0, n_points, SPATIAL_INDEX_CHUNK_SIZE), desc="Writing spatial index"):
+        rows = order[start:start + SPATIAL_INDEX_CHUNK_SIZE]
+        # Gather in ascending row order, which reads the memory-mapped input sequentially
+        ascending = np.argsort(rows)
+        gathered = np.empty(len(rows), dtype=np.int64)
+        gathered[ascending] = np.arange(len(rows))
+        rows_sorted = rows[ascending]
+        sorted_coords[start:start + len(rows)] = np.asarray(coords[rows_sorted], dtype=np.float32)[gathered]
+        sorted_ids[start:start + len(rows)] = np.asarray(paper_ids[rows_sorted])[gathered]
+    sorted_coords.flush()
+    sorted_ids.flush()
+    del sorted_coords, sorted_ids
+    np.save(paths['cell_start'], cell_start.astype(np.int64))
+
+    result = {name: str(path) for name, path in paths.items()}
+    result.update({
+        'count': n_points,
+        'grid_size': GRID_SIZE,
+        'mins': mins.tolist(),
+        'cell_size': cell_size.tolist(),
+    })
+    return result
+
+class SpatialIndex:
+    """
+    Box and nearest-neighbour queries on the grid built by GetSpatialIndex
+
+    All arrays may be memory-mapped; a query touches only the rows of the
+    cells it overlaps. Coordinates are in embedding units.
+
+    Attributes:
+        coords: Nx3 coordinates in cell order
+        ids: N MAG IDs in cell order
+        cell_start: Row offset of every cell, plus the total count
+        grid_size: Number of cells along each axis
+        mins: Lower corner of the grid
+        cell_size: Edge lengths of a cell
+    """
+
+    def __init__(self, coords, ids, cell_start, grid_size, mins, cell_size):
+        self.coords = coords
+        self.ids = ids
+        self.cell_start = cell_start
+        self.grid_size = int(grid_size)
+        self.mins = np.asarray(mins, dtype=np.float64)
+        self.cell_size = np.asarray(cell_size, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _candidates(self, low, high):
+        """Rows of every cell overlapping the box [low, high]."""
+        grid_max = self.mins + self.cell_size * self.grid_size
+        if np.any(high < self.mins) or np.any(low > grid_max):
+            return np.empty(0, dtype=np.int64)
+
+        c0 = _cell_coordinates(low, self.mins, self.cell_size, self.grid_size)
+        c1 = _cell_coordinates(high, self.mins, self.cell_size, self.grid_size)
+        # Cells of one (x, y) column are contiguous, so each column is one slice
+        cx, cy = np.meshgrid(np.arange(c0[0], c1[0] + 1), np.arange(c0[1], c1[1] + 1), indexing='ij')
+        column = (cx.ravel() * self.grid_size + cy.ravel()) * self.grid_size
+        starts = self.cell_start[column + c0[2]]
+        stops = self.cell_start[column + c1[2] + 1]
+
+        lengths = stops - starts
+        if not lengths.sum():
+            return np.empty(0, dtype=np.int64)
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return np.arange(lengths.sum()) + offsets
+
+    def _sorted_hits(self, rows, point, limit):
+        """Rows sorted by distance to point, capped at limit."""
+        coords = np.asarray(self.coords[rows], dtype=np.float64)
+        distances = np.linalg.norm(coords - point, axis=1)
+        if limit is not None and len(rows) > limit:
+            keep = np.argpartition(distances, limit)[:limit]
+            rows, coords, distances = rows[keep], coords[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return np.asarray(self.ids[rows[order]]), coords[order], distances[order]
+
+    def box(self, center, size, limit=DEFAULT_QUERY_LIMIT):
+        """
+        Points strictly inside an axis-aligned cube, closest to its center first
+
+        Args:
+            center: (3,) center of the cube
+            size: Edge length of the cube
+            limit: Largest number of points returned, None for all
+
+        Returns:
+            Tuple of (ids, coords, distances to the center)
+        """
+        center = np.asarray(center, dtype=np.float64)
+        half = size / 2
+        rows = self._candidates(center - half, center + half)
+        coords = np.asarray(self.coords[rows], dtype=np.float64)
+        inside = np.all(np.abs(coords - center) < half, axis=1)
+        return self._sorted_hits(rows[inside], center, limit)
+
+    def nearest(self, point, k=10, max_distance=None):
+        """
+        The k points closest to point
+
+        The search cube around point doubles until it holds k points within
+        its half width, which guarantees none closer lies outside it. Once
+        the cube covers the whole grid, the k closest of all points are
+        returned.
+
+        Args:
+            point: (3,) query position
+            k: Number of neighbours
+            max_distance: Optional upper bound on the distance of a neighbour
+
+        Returns:
+            Tuple of (ids, coords, distances), closest first
+        """
+        point = np.asarray(point, dtype=np.float64)
+        k = min(k, len(self))
+        grid_span = float(np.max(self.cell_size)) * self.grid_size
+        half = float(np.min(self.cell_size))
+        while True:
+            if max_distance is not None:
+                half = min(half, max_distance)
+            rows = self._candidates(point - half, point + half)
+            distances = np.linalg.norm(np.asarray(self.coords[rows], dtype=np.float64) - point, axis=1)
+            within = rows[distances <= half]
+            if len(within) >= k or (max_distance is not None and half >= max_distance):
+                return self._sorted_hits(within, point, k)
+            if half >= grid_span + np.max(np.abs(point - self.mins)):
+                # The cube covers the whole grid, so every point is a candidate,
+                # including corners further than half away
+                return self._sorted_hits(rows, point, k)
+            half *= 2
+
+def LoadSpatialIndex(mmap_mode='r'):
+    """
+    Open the grid index built by GetSpatialIndex
+
+    Args:
+        mmap_mode: Passed to np.load; 'r' memory-maps, None reads into memory
+
+    Returns:
+        SpatialIndex
+    """
+    info = GetSpatialIndex()
+    return SpatialIndex(
+        coords=np.load(info['coords'], mmap_mode=mmap_mode),
+        ids=np.load(info['ids'], mmap_mode=mmap_mode),
+        cell_start=np.load(info['cell_start']),
+        grid_size=info['grid_size'],
+        mins=info['mins'],
+        cell_size=info['cell_size'],
+    )
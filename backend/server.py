@@ -1,6 +1,7 @@
 from flask import Flask, request
 
 import psycopg2
+import psycopg2.extras
 from flask_cors import CORS, cross_origin
 
 conn = psycopg2.connect("dbname=MAG user=postgres password=mcgail port=5433")
@@ -14,7 +15,8 @@ import pickle
 from pathlib import Path
 import requests
 
-from scripts import fields
+from scripts import fields, spatial_index
+import papers_api
 
 # Load the field data using the proper functions
 fnames = fields.GetFieldNames()
@@ -23,6 +25,10 @@ subgs = fields.GetSubFields()
 
 fnamesr = {x:y for y,x in fnames.items()}
 
+# Memory-mapped grid index of the embedding, for /location and /nearest.
+# Built on first use, which runs the full UMAP embedding on a cold cache
+spatial = spatial_index.LoadSpatialIndex()
+
 @app.route("/subgroups", methods=['GET'])
 def subgroup():
     a = dict(request.args)
@@ -36,6 +42,18 @@ def subgroup():
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response
 
+def located_papers(ids, coords):
+    """Viewer-scale positions and info_json of index hits, in the order given"""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT mag_id, info_json FROM papers
+        WHERE mag_id = ANY(%s)
+    """, ([int(i) for i in ids],))
+    info = dict(cur.fetchall())
+    cur.close()
+
+    return papers_api.located_papers(ids, coords, info)
+
 @app.route("/location", methods=['GET'])
 def loc():
     a = dict(request.args)
@@ -43,47 +61,45 @@ def loc():
     y = float(a['y']) / 100
     z = float(a['z']) / 100
     delt = float(a['delt']) / 100
-    
-    cur = conn.cursor()
+    try:
+        limit = papers_api.query_limit(
+            a.get('limit'), spatial_index.DEFAULT_QUERY_LIMIT, spatial_index.DEFAULT_QUERY_LIMIT
+        )
+    except papers_api.BadRequest as e:
+        response = flask.Response(json.dumps({'error': str(e)}), status=400)
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
 
-    cur.execute("""
-        SELECT pos_x,pos_y,pos_z,info_json FROM papers
-        WHERE %s < pos_x AND pos_x < %s AND %s < pos_y AND pos_y < %s AND %s < pos_z AND pos_z < %s
-    """, (
-        x-delt/2, x+delt/2,
-        y-delt/2, y+delt/2,
-        z-delt/2, z+delt/2,
-    ),)
+    # Closest papers to the center of the box first
+    ids, coords, _ = spatial.box((x, y, z), delt, limit=limit)
+    res = located_papers(ids, coords)
 
-    res = cur.fetchall()
-    cur.close()
+    response = flask.Response(json.dumps(res))
+    response.headers.add('Access-Control-Allow-Origin', '*')
 
-    res = [
-        dict(zip(['x','y','z','js'], r))
-        for r in res
-    ]
+    return response
 
-    # annoying arbitrary scale factor
-    for r in res:
-        for k in 'xyz':
-            r[k] = r[k]*100
+@app.route("/nearest", methods=['GET'])
+def nearest():
+    a = dict(request.args)
+    x = float(a['x']) / 100
+    y = float(a['y']) / 100
+    z = float(a['z']) / 100
+    try:
+        k = papers_api.query_limit(a.get('k'), 10, spatial_index.DEFAULT_QUERY_LIMIT)
+    except papers_api.BadRequest as e:
+        response = flask.Response(json.dumps({'error': str(e)}), status=400)
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
 
-    print(res)
+    ids, coords, _ = spatial.nearest((x, y, z), k=k)
+    res = located_papers(ids, coords)
 
-    [ x.update({'js':json.loads(x['js'])}) for x in res ]
     response = flask.Response(json.dumps(res))
     response.headers.add('Access-Control-Allow-Origin', '*')
 
     return response
 
-def s2info_extract(doc):
-    out_doc = {}
-    out_doc['abstract'] = doc.get('abstract', 'No abstract available')
-    out_doc['authors'] = [x['name'] for x in doc.get('authors', [])]
-    out_doc['fields'] = [x['category'] for x in doc.get('s2FieldsOfStudy', [])]    
-    out_doc['fields'] = list(set(out_doc['fields']))
-    return out_doc
-
 @app.route("/paper", methods=['GET'])
 def paper():
     a = dict(request.args)
@@ -105,10 +121,10 @@ def paper():
     s2_info = res[0][1]
 
     if not s2_info:
-        s2_url = f'https://api.semanticscholar.org/v1/paper/MAG:{a["id"]}'
+        s2_url = papers_api.S2_PAPER_URL.format(a['id'])
         s2_response = requests.get(s2_url)
         s2_response = s2_response.json()
-        s2_info = s2info_extract(s2_response)
+        s2_info = papers_api.s2info_extract(s2_response)
         cur = conn.cursor()
         # update papers
         cur.execute("""
@@ -130,6 +146,53 @@ def paper():
 
     return response
 
+def s2info_batch(mag_ids):
+    """S2 info of several papers in one upstream call; papers S2 doesn't know are left out"""
+    if not mag_ids:
+        return {}
+    s2_response = requests.post(**papers_api.s2_batch_request(mag_ids), timeout=10)
+    s2_response.raise_for_status()
+    return papers_api.s2info_from_batch(mag_ids, s2_response.json())
+
+@app.route("/papers", methods=['GET', 'POST'])
+def papers():
+    a = dict(request.args)
+    try:
+        body = papers_api.parse_json_body(request.get_data()) if request.is_json else None
+        ids = papers_api.batch_ids(body, a.get('ids', ''))
+    except papers_api.BadRequest as e:
+        response = flask.Response(json.dumps({'error': str(e)}), status=400)
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT mag_id, info_json, s2info_json FROM papers
+    WHERE mag_id = ANY(%s)
+    """, (ids,))
+    res = {mag_id: (info, s2info) for mag_id, info, s2info in cur.fetchall()}
+    cur.close()
+
+    # Missing S2 data for all papers comes from one batched upstream call
+    try:
+        fetched = s2info_batch(papers_api.missing_s2(ids, res))
+    except requests.RequestException:
+        fetched = {}
+    if fetched:
+        cur = conn.cursor()
+        psycopg2.extras.execute_batch(cur, """
+            UPDATE papers
+            SET s2info_json = %s
+            WHERE mag_id = %s
+        """, [(json.dumps(info), i) for i, info in fetched.items()])
+        conn.commit()
+        cur.close()
+
+    response = flask.Response(papers_api.papers_response(ids, res, fetched))
+    response.headers.add('Access-Control-Allow-Origin', '*')
+
+    return response
+
 @app.route("/citations", methods=['GET'])
 def citations():
     a = dict(request.args)
@@ -1,8 +1,8 @@
 """
-Run all cache tests and demonstrations.
+Run all tests and demonstrations.
 
 This script runs:
-1. The unit tests for the current CacheWrapper implementation
+1. The unit tests of every test_*.py module in this directory
 2. The demonstration of the enhanced CacheWrapper with default parameter dependencies
 """
 
@@ -28,11 +28,12 @@ def run_all():
     print("RUNNING TESTS FOR CURRENT IMPLEMENTATION")
     print("="*80)
     
-    # Import and run the tests for the current implementation
-    test_module = import_module_from_path("test_cache", tests_dir / "test_cache.py")
-    
-    # Create and run a test suite
-    test_suite = unittest.TestLoader().loadTestsFromModule(test_module)
+    # Import every test module and run them as one suite
+    loader = unittest.TestLoader()
+    test_suite = unittest.TestSuite()
+    for test_file in sorted(tests_dir.glob("test_*.py")):
+        test_module = import_module_from_path(test_file.stem, test_file)
+        test_suite.addTests(loader.loadTestsFromModule(test_module))
     result = unittest.TextTestRunner(verbosity=2).run(test_suite)
     
     print("\n" + "="*80)
@@ -0,0 +1,325 @@
+"""
+Tests for the field index structures in fields.py.
+
+This script validates, on small hand-built hierarchies, that:
+1. FieldHierarchy builds the right children, parents and transitive closures
+2. FieldMembership maps papers to rows and rolls fields up over their subtrees
+3. _classify_field_memberships gives the same codes as the per-paper loop it replaced
+4. Intersection codes past the 5-bit LAS classification survive a LAS round trip
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import laspy
+import numpy as np
+
+# Add the parent directory to the path so we can import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from scripts.fields import FieldHierarchy, FieldMembership
+from scripts.pointclouds import _classify_field_memberships, _write_points_las, EXPORT_PROFILES
+
+# A -> B -> D, A -> C -> D, C -> E, and a separate root F -> G
+EDGES = [
+    ('A', 'B'), ('A', 'C'), ('B', 'D'), ('C', 'D'), ('C', 'E'),
+    ('F', 'G'),
+    # Duplicates and self-loops are dropped
+    ('A', 'B'), ('E', 'E'),
+]
+PAPER_COUNTS = {'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7}
+
+# Papers and their directly assigned fields; 'X' is not in the hierarchy
+PAPER_FIELDS = {
+    '30': ['D'],
+    '10': ['B', 'E'],
+    '20': ['A'],
+    '50': ['G', 'X'],
+    '40': ['C', 'C'],
+}
+
+class TestFieldHierarchy(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.hierarchy = FieldHierarchy(EDGES, PAPER_COUNTS)
+
+    def test_field_order(self):
+        """Parents are numbered first, then the remaining children, in file order"""
+        self.assertEqual(self.hierarchy.field_ids, ['A', 'B', 'C', 'F', 'E', 'D', 'G'])
+        self.assertEqual(len(self.hierarchy), 7)
+        self.assertIn('E', self.hierarchy)
+        self.assertNotIn('X', self.hierarchy)
+
+    def test_children_and_parents(self):
+        self.assertEqual(self.hierarchy.children('A'), ['B', 'C'])
+        self.assertEqual(self.hierarchy.children('C'), ['D', 'E'])
+        self.assertEqual(self.hierarchy.children('E'), [])
+        self.assertEqual(sorted(self.hierarchy.parents('D')), ['B', 'C'])
+        self.assertEqual(self.hierarchy.parents('A'), [])
+        self.assertEqual(self.hierarchy.children('X'), [])
+
+    def test_closures(self):
+        """Ancestors and descendants are the transitive closures, without duplicates"""
+        self.assertEqual(sorted(self.hierarchy.ancestors('D')), ['A', 'B', 'C'])
+        self.assertEqual(sorted(self.hierarchy.ancestors('E')), ['A', 'C'])
+        self.assertEqual(self.hierarchy.ancestors('A'), [])
+        self.assertEqual(sorted(self.hierarchy.descendants('A')), ['B', 'C', 'D', 'E'])
+        self.assertEqual(sorted(self.hierarchy.descendants('C')), ['D', 'E'])
+        self.assertEqual(self.hierarchy.descendants('G'), [])
+
+    def test_closures_match_csr_arrays(self):
+        """Every (field, ancestor) pair appears once in each direction"""
+        h = self.hierarchy
+        up = {
+            (i, int(j))
+            for i in range(len(h))
+            for j in h.ancestor_idx[h.ancestor_ptr[i]:h.ancestor_ptr[i+1]]
+        }
+        down = {
+            (int(j), i)
+            for i in range(len(h))
+            for j in h.descendant_idx[h.descendant_ptr[i]:h.descendant_ptr[i+1]]
+        }
+        self.assertEqual(up, down)
+        self.assertEqual(len(up), len(h.ancestor_idx))
+
+    def test_cycles_terminate(self):
+        hierarchy = FieldHierarchy([('A', 'B'), ('B', 'C'), ('C', 'A')], {})
+        self.assertEqual(sorted(hierarchy.ancestors('A')), ['B', 'C'])
+        self.assertEqual(hierarchy.top_level, [])
+        self.assertEqual(hierarchy.level('A'), -1)
+
+    def test_levels_and_top_level(self):
+        self.assertEqual(self.hierarchy.top_level, ['A', 'F'])
+        self.assertTrue(self.hierarchy.is_top_level('F'))
+        self.assertFalse(self.hierarchy.is_top_level('B'))
+        self.assertEqual(
+            [self.hierarchy.level(f) for f in 'ABCDEFG'],
+            [0, 1, 1, 2, 2, 0, 1]
+        )
+        self.assertEqual(self.hierarchy.level('X'), -1)
+
+    def test_paper_counts(self):
+        self.assertEqual(self.hierarchy.paper_count('E'), 5)
+        self.assertEqual(self.hierarchy.paper_count('X'), 0)
+
+    def test_subfields(self):
+        """Same parent to children mapping as GetSubFields built"""
+        self.assertEqual(dict(self.hierarchy.subfields()), {
+            'A': ['B', 'C'],
+            'B': ['D'],
+            'C': ['D', 'E'],
+            'F': ['G'],
+        })
+
+class TestFieldMembership(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.hierarchy = FieldHierarchy(EDGES, PAPER_COUNTS)
+        cls.membership = FieldMembership(PAPER_FIELDS, cls.hierarchy)
+
+    def rows(self, *paper_ids):
+        return sorted(self.membership.lookup(list(paper_ids)).tolist())
+
+    def test_sorted_rows(self):
+        self.assertEqual(self.membership.paper_ids.tolist(), [10, 20, 30, 40, 50])
+        self.assertEqual(len(self.membership), 5)
+
+    def test_lookup(self):
+        rows = self.membership.lookup(['30', 10, 99, 5, 60])
+        self.assertEqual(rows.tolist(), [2, 0, -1, -1, -1])
+
+    def test_lookup_empty(self):
+        membership = FieldMembership({}, self.hierarchy)
+        self.assertEqual(membership.lookup([1, 2]).tolist(), [-1, -1])
+
+    def test_fields_of(self):
+        self.assertEqual(sorted(self.membership.fields_of(10)), ['B', 'E'])
+        # Duplicate assignments are stored once
+        self.assertEqual(self.membership.fields_of(40), ['C'])
+        self.assertEqual(sorted(self.membership.fields_of(50)), ['G', 'X'])
+        self.assertEqual(self.membership.fields_of(99), [])
+
+    def test_direct_papers(self):
+        self.assertEqual(self.membership.paper_ids_of('D').tolist(), [30])
+        self.assertEqual(self.membership.paper_ids_of('A').tolist(), [20])
+        self.assertEqual(self.membership.paper_ids_of('X').tolist(), [50])
+        self.assertEqual(self.membership.paper_ids_of('F').tolist(), [])
+        self.assertEqual(self.membership.paper_ids_of('missing').tolist(), [])
+
+    def test_rollup(self):
+        """A field's roll-up holds the papers of its whole subtree"""
+        def rolled_up(field_id):
+            return self.membership.paper_ids_of(field_id, include_descendants=True).tolist()
+
+        self.assertEqual(rolled_up('A'), [10, 20, 30, 40])
+        self.assertEqual(rolled_up('C'), [10, 30, 40])
+        self.assertEqual(rolled_up('B'), [10, 30])
+        self.assertEqual(rolled_up('F'), [50])
+        self.assertEqual(rolled_up('D'), [30])
+
+    def test_union(self):
+        self.assertEqual(self.membership.union(['B', 'F']).tolist(), self.rows(10, 30, 50))
+        self.assertEqual(
+            self.membership.union(['B', 'F'], include_descendants=False).tolist(),
+            self.rows(10)
+        )
+        self.assertEqual(self.membership.union([]).tolist(), [])
+
+    def test_intersection(self):
+        self.assertEqual(self.membership.intersection(['B', 'C']).tolist(), self.rows(10, 30))
+        self.assertEqual(self.membership.intersection(['B', 'E']).tolist(), self.rows(10))
+        self.assertEqual(self.membership.intersection(['A', 'F']).tolist(), [])
+        self.assertEqual(self.membership.intersection([]).tolist(), [])
+
+    def test_mask(self):
+        mask = self.membership.mask('C')
+        self.assertEqual(self.membership.paper_ids[mask].tolist(), [10, 30, 40])
+
+    def test_submatrix(self):
+        rows = self.membership.lookup([40, 99, 10, 50])
+        sub = self.membership.submatrix(rows, ['E', 'C', 'G', 'B', 'missing'])
+        self.assertEqual(sub.shape, (4, 5))
+        self.assertEqual(sub.toarray().astype(int).tolist(), [
+            [0, 1, 0, 0, 0],
+            [0, 0, 0, 0, 0],
+            [1, 0, 0, 1, 0],
+            [0, 0, 1, 0, 0],
+        ])
+
+    def test_matrix(self):
+        direct = self.membership.matrix().toarray()
+        rolled_up = self.membership.matrix(include_descendants=True).toarray()
+        self.assertEqual(direct.shape, (5, len(self.membership.field_ids)))
+        self.assertEqual(int(direct.sum()), 7)
+        # The roll-up only ever adds memberships
+        self.assertTrue(np.all(rolled_up >= direct))
+        column = self.membership.field_index['A']
+        self.assertEqual(self.membership.paper_ids[rolled_up[:, column]].tolist(), [10, 20, 30, 40])
+
+def classify_by_loop(field_memberships, top_fields, intersection_data):
+    """The per-paper loop of ProduceTopLevelPointCloudWithIntersections before vectorization"""
+    single_field_codes = intersection_data["single_field_codes"]
+    intersection_pairs = intersection_data["intersection_pairs"]
+    idx_to_field = dict(enumerate(top_fields))
+
+    classifications = np.zeros(len(field_memberships), dtype=np.uint16)
+    for i, memberships in enumerate(field_memberships):
+        if not np.any(memberships):
+            classifications[i] = 0
+            continue
+
+        field_indices = np.where(memberships)[0]
+        if len(field_indices) == 1:
+            classifications[i] = single_field_codes.get(idx_to_field[field_indices[0]], 0)
+        else:
+            field_indices = sorted(field_indices)
+            field1 = idx_to_field[field_indices[0]]
+            field2 = idx_to_field[field_indices[1]]
+            intersection_name = f"{field1} ∩ {field2}"
+            if intersection_name in intersection_pairs:
+                classifications[i] = intersection_pairs[intersection_name]
+            else:
+                classifications[i] = single_field_codes.get(field1, 0)
+    return classifications
+
+def intersection_mapping(top_fields, pairs):
+    """Codes laid out as GenerateFieldIntersectionMapping does, for the given pairs only"""
+    n_fields = len(top_fields)
+    return {
+        "single_field_codes": {f: i + 1 for i, f in enumerate(top_fields)},
+        "intersection_pairs": {
+            f"{top_fields[i]} ∩ {top_fields[j]}": n_fields + 1 + i * n_fields + j
+            for i, j in pairs
+        },
+    }
+
+class TestClassifyFieldMemberships(unittest.TestCase):
+
+    def test_matches_loop(self):
+        top_fields = ['Art', 'Biology', 'Chemistry', 'Physics', 'Sociology']
+        # Some pairs have no intersection code and fall back to the first field
+        intersection_data = intersection_mapping(top_fields, [(0, 1), (0, 2), (1, 3), (2, 4), (3, 4)])
+        # A field without a code of its own gets 0
+        del intersection_data["single_field_codes"]['Physics']
+
+        rng = np.random.default_rng(0)
+        field_memberships = rng.random((2000, len(top_fields))) < 0.3
+        field_memberships[:5] = False
+        field_memberships[5, 3] = True
+
+        codes = _classify_field_memberships(field_memberships, top_fields, intersection_data)
+        expected = classify_by_loop(field_memberships, top_fields, intersection_data)
+        self.assertEqual(codes.dtype, np.uint16)
+        np.testing.assert_array_equal(codes, expected)
+
+    def test_single_and_pairs(self):
+        top_fields = ['Art', 'Biology', 'Chemistry']
+        intersection_data = intersection_mapping(top_fields, [(0, 2)])
+        field_memberships = np.array([
+            [False, False, False],
+            [False, True, False],
+            [True, False, True],
+            [True, True, True],
+            [False, True, True],
+        ])
+        codes = _classify_field_memberships(field_memberships, top_fields, intersection_data)
+        self.assertEqual(codes.tolist(), [0, 2, 4 + 2, 1, 2])
+
+    def test_code_overflow(self):
+        """Codes past a uint16 raise with the real code instead of wrapping"""
+        top_fields = [f'Field {i}' for i in range(256)]
+        intersection_data = intersection_mapping(top_fields, [(15, 19), (254, 255)])
+        field_memberships = np.zeros((2, len(top_fields)), dtype=bool)
+        field_memberships[0, [15, 19]] = True
+        self.assertEqual(
+            _classify_field_memberships(field_memberships, top_fields, intersection_data).tolist(),
+            [257 + 15 * 256 + 19, 0]
+        )
+
+        field_memberships[1, [254, 255]] = True
+        with self.assertRaisesRegex(ValueError, 'code 65536 '):
+            _classify_field_memberships(field_memberships, top_fields, intersection_data)
+
+    def test_no_top_fields(self):
+        codes = _classify_field_memberships(np.zeros((3, 0), dtype=bool), [], {})
+        self.assertEqual(codes.tolist(), [0, 0, 0])
+
+class TestFieldCodeLas(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Codes of 19 top-level fields (up to 361) are written and read back unchanged"""
+        top_fields = [f'Field {i}' for i in range(19)]
+        pairs = [(i, j) for i in range(19) for j in range(i + 1, 19)]
+        intersection_data = intersection_mapping(top_fields, pairs)
+
+        rng = np.random.default_rng(0)
+        field_memberships = rng.random((3000, len(top_fields))) < 0.15
+        field_memberships[0, [17, 18]] = True
+        codes = _classify_field_memberships(field_memberships, top_fields, intersection_data)
+        self.assertEqual(int(codes.max()), 20 + 17 * 19 + 18)
+        self.assertGreater(len(np.unique(codes)), 31)
+
+        n = len(codes)
+        columns = {
+            'coords': rng.random((n, 3)),
+            'mag_id': np.arange(n, dtype=np.uint32),
+            'year': np.full(n, 2000, dtype=np.uint16),
+            'rgb': rng.integers(0, 256, (n, 3)).astype(np.uint8),
+            'field_code': codes,
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            for profile in EXPORT_PROFILES:
+                output_path = Path(tmp) / f'{profile}.las'
+                _write_points_las(output_path, columns, chunk_size=1000, profile=profile)
+                las = laspy.read(output_path)
+                # Points are written along a space-filling curve; mag_id gives the input row
+                order = np.argsort(np.asarray(las.mag_id))
+                np.testing.assert_array_equal(np.asarray(las.field_code)[order], codes)
+                self.assertEqual(int(np.asarray(las.classification).max()), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for the batched geometry helpers in mesh.py.
+
+This script validates that:
+1. points_inside_mesh agrees with trimesh's own containment test
+2. adjust_centers_if_outside moves only the centers outside their meshes
+3. mesh_summaries skips degenerate meshes without failing the others
+4. AlphaShape gives the convex hull for alpha <= 0
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import trimesh
+
+# Add the parent directory to the path so we can import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from scripts.mesh import AlphaShape, points_inside_mesh, adjust_centers_if_outside, mesh_summaries
+
+def sample_points(mesh, n, seed):
+    """Random points in a box a little larger than the mesh"""
+    rng = np.random.default_rng(seed)
+    low, high = mesh.bounds
+    margin = (high - low) * 0.2
+    return rng.uniform(low - margin, high + margin, (n, 3))
+
+class TestPointsInsideMesh(unittest.TestCase):
+
+    def check_matches_trimesh(self, mesh, seed=0):
+        # Small point sets: trimesh.contains is memory hungry
+        points = sample_points(mesh, 300, seed)
+        inside = points_inside_mesh(mesh, points)
+        np.testing.assert_array_equal(inside, mesh.contains(points))
+        # Both outcomes are exercised
+        self.assertTrue(0 < inside.sum() < len(points))
+
+    def test_icosphere(self):
+        self.check_matches_trimesh(trimesh.creation.icosphere(subdivisions=3))
+
+    def test_box(self):
+        self.check_matches_trimesh(trimesh.creation.box(extents=(2.0, 1.0, 0.5)))
+
+    def test_annulus(self):
+        """A mesh with a hole, so rays cross it four times"""
+        self.check_matches_trimesh(trimesh.creation.annulus(r_min=0.5, r_max=1.0, height=1.0))
+
+    def test_grid_aligned_points(self):
+        """Rays through shared edges and vertices of the box are counted once"""
+        mesh = trimesh.creation.box(extents=(2.0, 2.0, 2.0))
+        grid = np.stack(np.meshgrid(*[np.linspace(-1.5, 1.5, 7)] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+        # Skip points on the surface itself, where containment is a matter of convention
+        grid = grid[np.all(np.abs(np.abs(grid) - 1.0) > 1e-9, axis=1)]
+        expected = np.all(np.abs(grid) < 1.0, axis=1)
+        np.testing.assert_array_equal(points_inside_mesh(mesh, grid), expected)
+
+    def test_empty(self):
+        mesh = trimesh.creation.box()
+        self.assertEqual(points_inside_mesh(mesh, np.zeros((0, 3))).tolist(), [])
+
+class TestAdjustCenters(unittest.TestCase):
+
+    def test_outside_centers_move_to_closest_vertex(self):
+        sphere = trimesh.creation.icosphere(subdivisions=2)
+        annulus = trimesh.creation.annulus(r_min=0.5, r_max=1.0, height=1.0)
+        # The annulus' center of mass is in its hole
+        centers = adjust_centers_if_outside([sphere, annulus], [sphere.center_mass, annulus.center_mass])
+
+        np.testing.assert_allclose(centers[0], sphere.center_mass)
+        distances = np.linalg.norm(annulus.vertices - annulus.center_mass, axis=1)
+        np.testing.assert_allclose(centers[1], annulus.vertices[np.argmin(distances)])
+
+class TestMeshSummaries(unittest.TestCase):
+
+    def test_degenerate_mesh_is_skipped(self):
+        sphere = trimesh.creation.icosphere(subdivisions=2)
+        flat = trimesh.Trimesh(
+            vertices=[[0, 0, 0], [1, 0, 0], [0, 1, 0]], faces=[[0, 1, 2], [0, 2, 1]], process=False
+        )
+        empty = trimesh.Trimesh()
+
+        summaries = mesh_summaries([sphere, flat, empty, sphere])
+        self.assertIsNone(summaries[1])
+        self.assertIsNone(summaries[2])
+        for summary in (summaries[0], summaries[3]):
+            self.assertEqual(summary['vertex_count'], len(sphere.vertices))
+            np.testing.assert_allclose(summary['center'], sphere.center_mass, atol=1e-12)
+
+class TestAlphaShape(unittest.TestCase):
+
+    def test_zero_alpha_is_convex_hull(self):
+        points = np.random.default_rng(0).normal(size=(200, 3))
+        hull = trimesh.convex.convex_hull(points)
+        shape = AlphaShape(points)
+        for alpha in (0, -1):
+            mesh = shape.mesh(alpha)
+            self.assertTrue(mesh.is_watertight)
+            self.assertAlmostEqual(mesh.volume, hull.volume)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for the request helpers in papers_api.py shared by both servers.
+
+This script validates that:
+1. batch_ids reads ids from the query string or a JSON body, deduplicated in order
+2. Malformed input raises BadRequest (answered with 400) rather than another error
+3. papers_response merges stored and freshly fetched S2 info
+4. query_limit clamps result counts and rejects non-positive ones
+"""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the path so we can import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import papers_api
+from papers_api import BadRequest, batch_ids, parse_json_body, papers_response, query_limit
+
+class TestBatchIds(unittest.TestCase):
+
+    def test_query(self):
+        self.assertEqual(batch_ids(None, '3,1,3,,2'), [3, 1, 2])
+        self.assertEqual(batch_ids(None, ''), [])
+
+    def test_body(self):
+        self.assertEqual(batch_ids({'ids': [5, '4', 5]}), [5, 4])
+        self.assertEqual(batch_ids({}), [])
+
+    def test_bad_body(self):
+        for body in ([1, 2], 'ids', 7, {'ids': 5}, {'ids': {'a': 1}}):
+            with self.assertRaises(BadRequest, msg=repr(body)):
+                batch_ids(body)
+
+    def test_bad_ids(self):
+        for ids in (['x'], [1.5], [True], [None], [-1], [2**63], [[1]]):
+            with self.assertRaises(BadRequest, msg=repr(ids)):
+                batch_ids({'ids': ids})
+        with self.assertRaises(BadRequest):
+            batch_ids(None, '1,x')
+
+    def test_limit(self):
+        limit = papers_api.PAPERS_BATCH_LIMIT
+        self.assertEqual(len(batch_ids({'ids': list(range(limit))})), limit)
+        # Duplicates don't count towards the limit
+        self.assertEqual(len(batch_ids({'ids': list(range(limit)) * 2})), limit)
+        with self.assertRaisesRegex(BadRequest, f'at most {limit}'):
+            batch_ids({'ids': list(range(limit + 1))})
+
+    def test_invalid_json(self):
+        self.assertEqual(parse_json_body(b'{"ids": [1]}'), {'ids': [1]})
+        for data in (b'{bad', b'', b'\xff'):
+            with self.assertRaises(BadRequest, msg=repr(data)):
+                parse_json_body(data)
+
+class TestQueryLimit(unittest.TestCase):
+
+    def test_default_and_clamp(self):
+        self.assertEqual(query_limit(None, 10, 200), 10)
+        self.assertEqual(query_limit('25', 10, 200), 25)
+        self.assertEqual(query_limit('1000000', 10, 200), 200)
+
+    def test_invalid(self):
+        for value in ('0', '-5', 'x', '', '2.5'):
+            with self.assertRaises(BadRequest, msg=repr(value)):
+                query_limit(value, 10, 200)
+
+class TestPapersResponse(unittest.TestCase):
+
+    def test_merge(self):
+        rows = {
+            1: ('{"title": "a"}', None),
+            2: ('{"title": "b"}', '{"abstract": "stored"}'),
+        }
+        fetched = {1: {'abstract': 'fetched'}}
+        body = json.loads(papers_response([2, 3, 1], rows, fetched))
+        self.assertEqual(body, {
+            'papers': {
+                '2': {'title': 'b', 'abstract': 'stored'},
+                '1': {'title': 'a', 'abstract': 'fetched'},
+            },
+            'missing': [3],
+        })
+        self.assertEqual(papers_api.missing_s2([2, 3, 1], rows), [1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+Tests for the octree encoding in potree.py.
+
+This script validates that:
+1. morton_keys interleaves the coordinate bits as x, y, z
+2. hilbert_keys visits every cell of a small grid once, through adjacent cells
+3. _hierarchy_records encodes hierarchy.bin chunks that decode back to the
+   input nodes when read the way the Potree 2.0 loader reads them
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to the path so we can import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from scripts.potree import (
+    morton_keys, hilbert_keys, _hierarchy_records,
+    HIERARCHY_DTYPE, MORTON_BITS, NODE_NORMAL, NODE_LEAF, NODE_PROXY
+)
+
+def interleave(x, y, z, bits=MORTON_BITS):
+    """Morton key of one cell, one bit at a time"""
+    key = 0
+    for b in reversed(range(bits)):
+        key = (key << 3) | (((x >> b) & 1) << 2) | (((y >> b) & 1) << 1) | ((z >> b) & 1)
+    return key
+
+def decode_hierarchy(hierarchy, first_chunk_size):
+    """
+    Walk hierarchy.bin as the Potree 2.0 loader does
+
+    A chunk starts with its root node; every non-proxy record adds its
+    children, in child index order, to the queue of nodes still to be read.
+    Proxy records are followed by loading the chunk they point to.
+
+    Returns:
+        Dictionary mapping (level, key) to (type, numPoints, byteOffset, byteSize)
+        of every loaded node, and the number of chunks read
+    """
+    decoded = {}
+    pending = [((0, 0), 0, first_chunk_size)]
+    n_chunks = 0
+    while pending:
+        root, offset, size = pending.pop()
+        records = np.frombuffer(hierarchy[offset:offset + size], dtype=HIERARCHY_DTYPE)
+        n_chunks += 1
+        nodes = [root]
+        for record, (level, key) in zip(records, nodes):
+            if record['type'] == NODE_PROXY:
+                pending.append(((level, key), int(record['byteOffset']), int(record['byteSize'])))
+                continue
+            assert (level, key) not in decoded, f"node {(level, key)} decoded twice"
+            decoded[(level, key)] = (
+                int(record['type']), int(record['numPoints']),
+                int(record['byteOffset']), int(record['byteSize'])
+            )
+            for child in range(8):
+                if record['childMask'] & (1 << child):
+                    nodes.append((level + 1, (key << 3) | child))
+        assert len(nodes) == len(records), "chunk holds a different number of records than nodes"
+    return decoded, n_chunks
+
+def random_octree(depth, rng, keep=0.6):
+    """Nodes of a random octree closed under parents, sorted by (level, key)"""
+    nodes = {(0, 0)}
+    frontier = [0]
+    for level in range(1, depth + 1):
+        children = [(k << 3) | c for k in frontier for c in range(8)]
+        frontier = [k for k in children if rng.random() < keep] or children[:1]
+        nodes.update((level, k) for k in frontier)
+    nodes = sorted(nodes)
+    levels = np.array([l for l, _ in nodes], dtype=np.int64)
+    keys = np.array([k for _, k in nodes], dtype=np.uint64)
+    counts = rng.integers(1, 1000, len(nodes)).astype(np.uint32)
+    return levels, keys, counts
+
+class TestMortonKeys(unittest.TestCase):
+
+    def test_child_index_order(self):
+        """x is the most significant bit of each octal digit, z the least"""
+        cells = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 1]])
+        self.assertEqual(morton_keys(cells).tolist(), [4, 2, 1, 7])
+
+    def test_matches_bitwise_interleave(self):
+        rng = np.random.default_rng(0)
+        cells = rng.integers(0, 1 << MORTON_BITS, (200, 3))
+        cells[0] = (1 << MORTON_BITS) - 1
+        expected = [interleave(int(x), int(y), int(z)) for x, y, z in cells]
+        self.assertEqual(morton_keys(cells).tolist(), expected)
+
+    def test_prefix_is_octree_node(self):
+        """The top 3 * level bits of a key are the key of the containing node"""
+        rng = np.random.default_rng(1)
+        cells = rng.integers(0, 1 << MORTON_BITS, (100, 3)).astype(np.uint64)
+        keys = morton_keys(cells)
+        for level in (1, 5, 12):
+            shift = np.uint64(MORTON_BITS - level)
+            parents = morton_keys(cells >> shift)
+            np.testing.assert_array_equal(keys >> np.uint64(3 * (MORTON_BITS - level)), parents)
+
+class TestHilbertKeys(unittest.TestCase):
+
+    def check_curve(self, bits):
+        side = 1 << bits
+        cells = np.stack(np.meshgrid(*[np.arange(side)] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+        keys = hilbert_keys(cells, bits=bits)
+
+        # Every cell gets a distinct key in 0 .. side**3 - 1
+        self.assertEqual(sorted(keys.tolist()), list(range(side ** 3)))
+
+        # Consecutive keys are unit steps along one axis
+        path = cells[np.argsort(keys)].astype(np.int64)
+        steps = np.abs(np.diff(path, axis=0)).sum(axis=1)
+        self.assertTrue(np.all(steps == 1), f"non-adjacent steps at {np.flatnonzero(steps != 1)}")
+        self.assertEqual(path[0].tolist(), [0, 0, 0])
+
+    def test_adjacent_2_bits(self):
+        self.check_curve(2)
+
+    def test_adjacent_3_bits(self):
+        self.check_curve(3)
+
+    def test_adjacent_4_bits(self):
+        self.check_curve(4)
+
+class TestHierarchyRecords(unittest.TestCase):
+
+    POINT_SIZE = 25
+
+    def check_round_trip(self, levels, keys, counts, step):
+        hierarchy, first_chunk_size = _hierarchy_records(levels, keys, counts, self.POINT_SIZE, step=step)
+        self.assertEqual(HIERARCHY_DTYPE.itemsize, 22)
+        self.assertEqual(len(hierarchy) % 22, 0)
+        self.assertEqual(first_chunk_size % 22, 0)
+
+        decoded, n_chunks = decode_hierarchy(hierarchy, first_chunk_size)
+        node_set = {(int(l), int(k)) for l, k in zip(levels, keys)}
+        self.assertEqual(set(decoded), node_set)
+
+        # Points are laid out contiguously in node order
+        offsets = np.concatenate([[0], np.cumsum(counts.astype(np.int64) * self.POINT_SIZE)[:-1]])
+        for (level, key), count, offset in zip(zip(levels.tolist(), keys.tolist()), counts, offsets):
+            node_type, n_points, byte_offset, byte_size = decoded[(level, key)]
+            has_children = any((level + 1, (key << 3) | c) in node_set for c in range(8))
+            self.assertEqual(node_type, NODE_NORMAL if has_children else NODE_LEAF)
+            self.assertEqual(n_points, count)
+            self.assertEqual(byte_offset, offset)
+            self.assertEqual(byte_size, count * self.POINT_SIZE)
+
+        # One chunk for the root and one for every non-root node at a multiple of step
+        self.assertEqual(n_chunks, 1 + int(np.sum((levels % step == 0) & (levels > 0))))
+        return hierarchy, first_chunk_size
+
+    def test_single_chunk(self):
+        levels, keys, counts = random_octree(2, np.random.default_rng(0))
+        hierarchy, first_chunk_size = self.check_round_trip(levels, keys, counts, step=4)
+        self.assertEqual(first_chunk_size, len(hierarchy))
+        records = np.frombuffer(hierarchy, dtype=HIERARCHY_DTYPE)
+        self.assertFalse(np.any(records['type'] == NODE_PROXY))
+
+    def test_proxy_chunks(self):
+        levels, keys, counts = random_octree(7, np.random.default_rng(1))
+        hierarchy, first_chunk_size = self.check_round_trip(levels, keys, counts, step=2)
+        records = np.frombuffer(hierarchy, dtype=HIERARCHY_DTYPE)
+        proxies = records[records['type'] == NODE_PROXY]
+        self.assertEqual(len(proxies), int(np.sum((levels % 2 == 0) & (levels > 0))))
+        # Proxies point at whole records past the root chunk
+        self.assertTrue(np.all(proxies['byteOffset'] >= first_chunk_size))
+        self.assertTrue(np.all(proxies['byteSize'] % 22 == 0))
+
+    def test_root_only(self):
+        levels = np.array([0], dtype=np.int64)
+        keys = np.array([0], dtype=np.uint64)
+        counts = np.array([10], dtype=np.uint32)
+        hierarchy, _ = self.check_round_trip(levels, keys, counts, step=4)
+        record = np.frombuffer(hierarchy, dtype=HIERARCHY_DTYPE)[0]
+        self.assertEqual(int(record['type']), NODE_LEAF)
+        self.assertEqual(int(record['childMask']), 0)
+
+if __name__ == '__main__':
+    unittest.main()
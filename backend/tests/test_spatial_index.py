@@ -0,0 +1,96 @@
+"""
+Tests for the grid queries in spatial_index.py.
+
+This script validates, against brute force over all points, that:
+1. SpatialIndex.box returns the points strictly inside the cube, closest first,
+   capped at the limit
+2. SpatialIndex.nearest returns the k closest points, with and without
+   max_distance, for query points inside and outside the grid
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to the path so we can import the modules to test
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from scripts.spatial_index import SpatialIndex, _cell_coordinates
+
+def build_index(coords, ids, grid_size):
+    """SpatialIndex over in-memory arrays, laid out in cell order as GetSpatialIndex does"""
+    mins = coords.min(axis=0)
+    cell_size = (coords.max(axis=0) - mins) / grid_size
+    cells = _cell_coordinates(coords, mins, cell_size, grid_size)
+    keys = np.ravel_multi_index(cells.T, (grid_size,) * 3)
+    order = np.argsort(keys, kind='stable')
+    cell_start = np.searchsorted(keys[order], np.arange(grid_size ** 3 + 1))
+    return SpatialIndex(coords[order], ids[order], cell_start, grid_size, mins, cell_size)
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Clustered points, so some cells are dense and many are empty
+        centers = rng.uniform(-5, 5, (8, 3))
+        self.coords = np.concatenate([c + rng.normal(scale=0.6, size=(500, 3)) for c in centers])
+        self.ids = rng.permutation(len(self.coords)).astype(np.int64) + 1000
+        self.index = build_index(self.coords, self.ids, grid_size=16)
+        self.queries = np.concatenate([
+            self.coords[rng.choice(len(self.coords), 10)],
+            rng.uniform(-6, 6, (10, 3)),
+            # Outside the grid
+            [[40.0, 0.0, 0.0], [-20.0, -20.0, 30.0]],
+        ])
+
+    def brute_box(self, center, size, limit):
+        distances = np.linalg.norm(self.coords - center, axis=1)
+        inside = np.flatnonzero(np.all(np.abs(self.coords - center) < size / 2, axis=1))
+        inside = inside[np.argsort(distances[inside], kind='stable')]
+        return self.ids[inside[:limit] if limit is not None else inside]
+
+    def brute_nearest(self, point, k, max_distance=None):
+        distances = np.linalg.norm(self.coords - point, axis=1)
+        order = np.argsort(distances, kind='stable')
+        if max_distance is not None:
+            order = order[distances[order] <= max_distance]
+        return self.ids[order[:k]], distances[order[:k]]
+
+    def test_box(self):
+        for center in self.queries:
+            for size in (0.3, 1.5, 6.0):
+                for limit in (None, 1, 20, 200):
+                    ids, coords, distances = self.index.box(center, size, limit=limit)
+                    expected = self.brute_box(center, size, limit)
+                    np.testing.assert_array_equal(ids, expected, err_msg=f"{center} {size} {limit}")
+                    np.testing.assert_allclose(np.linalg.norm(coords - center, axis=1), distances)
+                    self.assertTrue(np.all(np.diff(distances) >= 0))
+
+    def test_box_covers_everything(self):
+        ids, _, _ = self.index.box(self.coords.mean(axis=0), 100.0, limit=None)
+        self.assertEqual(sorted(ids.tolist()), sorted(self.ids.tolist()))
+
+    def test_nearest(self):
+        for point in self.queries:
+            for k in (1, 10, 200):
+                ids, _, distances = self.index.nearest(point, k=k)
+                expected_ids, expected_distances = self.brute_nearest(point, k)
+                np.testing.assert_array_equal(ids, expected_ids, err_msg=f"{point} {k}")
+                np.testing.assert_allclose(distances, expected_distances)
+
+    def test_nearest_max_distance(self):
+        for point in self.queries:
+            for max_distance in (0.05, 0.5, 2.0):
+                ids, _, distances = self.index.nearest(point, k=50, max_distance=max_distance)
+                expected_ids, _ = self.brute_nearest(point, 50, max_distance)
+                np.testing.assert_array_equal(ids, expected_ids, err_msg=f"{point} {max_distance}")
+                self.assertTrue(np.all(distances <= max_distance))
+
+    def test_nearest_more_than_all(self):
+        ids, _, _ = self.index.nearest(np.zeros(3), k=len(self.coords) + 10)
+        self.assertEqual(len(ids), len(self.coords))
+        self.assertEqual(sorted(ids.tolist()), sorted(self.ids.tolist()))
+
+if __name__ == '__main__':
+    unittest.main()